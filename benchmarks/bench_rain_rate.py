@@ -0,0 +1,80 @@
+"""
+Benchmark of the rain rate computation, masked arrays vs low-allocation kernels
+
+Compare qpe.precip_polar.rate_all with low_memory=False (masked arrays,
+rain_rate.rr_*) and low_memory=True (plain arrays with NaN, rain_rate.rr_*_array)
+on a synthetic volume. The peak of the memory allocated by Python is measured
+with tracemalloc, and the maximum relative difference of the rates is reported.
+
+Usage: PYTHONPATH=. python benchmarks/bench_rain_rate.py [nsweeps nrays ngates] [float32|float64]
+"""
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+from pyart.testing import make_empty_ppi_radar
+from mtorwaradar.qpe.precip_polar import rate_all
+from mtorwaradar.util.precision import set_precision
+
+METHODS = ["RATE_Z", "RATE_ZPOLY", "RATE_Z_ZDR", "RATE_KDP", "RATE_KDP_ZDR", "RATE_HYBRID"]
+
+
+def make_radar(shape):
+    rng = np.random.default_rng(0)
+    radar = make_empty_ppi_radar(shape[2], shape[1], shape[0])
+    size = (radar.nrays, radar.ngates)
+    dbz = np.ma.masked_where(rng.random(size) < 0.3, rng.uniform(0.0, 65.0, size))
+    zdr = rng.uniform(0.2, 4.0, size)
+    kdp = np.ma.masked_where(rng.random(size) < 0.3, rng.uniform(-0.5, 5.0, size))
+    for name, data in [("DBZ_F", dbz), ("ZDR_F", zdr), ("KDP_F", kdp)]:
+        radar.add_field(name, {"data": np.ma.asarray(data, dtype=np.float32)})
+
+    return radar
+
+
+def measure(fun, *args, **kwargs):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fun(*args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return out, elapsed, peak
+
+
+def report(label, elapsed, peak):
+    print("{:<30s} {:8.3f} s {:10.1f} MB".format(label, elapsed, peak / 1e6))
+
+
+def main(shape, precision):
+    set_precision(precision)
+    radar = make_radar(shape)
+    print("volume {} x {} gates, {}".format(radar.nrays, radar.ngates, precision))
+
+    rt_mask, t, m = measure(rate_all, radar, methods=METHODS)
+    report("masked arrays", t, m)
+    rt_low, t, m = measure(rate_all, radar, methods=METHODS, low_memory=True)
+    report("low-allocation kernels", t, m)
+
+    for method in METHODS:
+        a = rt_mask[method].fields["rain_rate"]["data"]
+        b = rt_low[method].fields["rain_rate"]["data"]
+        same_mask = np.array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(b))
+        valid = ~np.ma.getmaskarray(a)
+        rel = np.abs(b.data[valid] - a.data[valid]) / np.abs(a.data[valid])
+        rel = rel.max() if rel.size > 0 else 0.0
+        print("{:<14s} same mask: {}, max rel. difference: {:.2e}".format(method, same_mask, rel))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    precision = "float32"
+    if len(args) > 0 and args[-1] in ["float32", "float64"]:
+        precision = args.pop()
+    if len(args) == 3:
+        shape = tuple(int(x) for x in args)
+    else:
+        shape = (9, 720, 1000)
+    main(shape, precision)
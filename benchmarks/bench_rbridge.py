@@ -0,0 +1,75 @@
+"""
+Benchmark of the conversions between numpy arrays and R vectors
+
+Compare util.utilities.npmDarray_to_rFloatVector and rFloatVector_to_npmDarray
+with the previous implementation (transpose and reshape, FloatVector built
+element by element, robjects.r.array and np.array) on a grid-sized array.
+The peak of the memory allocated by Python is measured with tracemalloc,
+the memory allocated by R is not included.
+
+Usage: python benchmarks/bench_rbridge.py [nz ny nx]
+"""
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+import rpy2.robjects as robjects
+from mtorwaradar.util.utilities import npmDarray_to_rFloatVector, rFloatVector_to_npmDarray
+
+
+def old_to_r(arr):
+    x_1d = arr.transpose().reshape(arr.size)
+    return robjects.FloatVector(x_1d)
+
+
+def old_from_r(vec, shape):
+    dim = robjects.IntVector(shape)
+    arr = robjects.r.array(vec, dim)
+    return np.array(arr)
+
+
+def measure(fun, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fun(*args)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return out, elapsed, peak
+
+
+def report(label, elapsed, peak):
+    print("{:<40s} {:8.3f} s {:10.1f} MB".format(label, elapsed, peak / 1e6))
+
+
+def main(shape):
+    rng = np.random.default_rng(0)
+    arr = rng.normal(size=shape)
+    print("array {} float64, {:.1f} MB".format(shape, arr.nbytes / 1e6))
+
+    vec_old, t, m = measure(old_to_r, arr)
+    report("to R, previous", t, m)
+    vec_new, t, m = measure(npmDarray_to_rFloatVector, arr)
+    report("to R, buffer", t, m)
+    _, t, m = measure(npmDarray_to_rFloatVector, np.asfortranarray(arr))
+    report("to R, buffer (Fortran-ordered input)", t, m)
+
+    out_old, t, m = measure(old_from_r, vec_old, shape)
+    report("from R, previous", t, m)
+    out_new, t, m = measure(rFloatVector_to_npmDarray, vec_new, shape)
+    report("from R, copy", t, m)
+    _, t, m = measure(rFloatVector_to_npmDarray, vec_new, shape, False)
+    report("from R, view", t, m)
+
+    assert np.array_equal(out_old, arr)
+    assert np.array_equal(out_new, arr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        shape = tuple(int(x) for x in sys.argv[1:])
+    else:
+        shape = (35, 800, 800)
+    main(shape)
@@ -1,5 +1,6 @@
 from . import qpe_cappi
 from . import qpe_cappi_loc
+from . import qpe_accumulation
 from . import radarpolar_qpe
 from . import radarpolar_data
 from . import radarpolar_extract
@@ -10,13 +11,19 @@ from . import radargrid_extract
 from . import radargrid_extract_loc
 from . import create_cappi
 from . import create_cappi_loc
+from . import ncdf_series
 from . import create_vad
 from . import create_vad_loc
+from . import create_echotops
+from . import create_echotops_loc
 from . import create_qvp
 from . import create_qvp_loc
 from . import create_qvp
 from . import create_qvp_loc
+from . import qvp_store
 from . import radarpolarV_extract
 from . import radarpolar_extractV_loc
+from . import extract_output
+from . import time_height
 
 __all__ = [s for s in dir() if not s.startswith('_')]
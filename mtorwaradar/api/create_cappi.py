@@ -41,7 +41,11 @@ def create_cappi_data(dirMDV, source, time, pars):
     else:
         param_cappi = pars["cappi"]["pars"]["alt"]
 
-    lon, lat, data = create_cappi_grid(radar, pars["fields"], method, param_cappi)
+    backend = pars.get("backend", "R")
+    grid_mapping = pars.get("grid_mapping", False)
+    lon, lat, data = create_cappi_grid(
+        radar, pars["fields"], method, param_cappi, backend, grid_mapping
+    )
 
     rtime = radarPolarTimeInfo(radar, pars["time_zone"])
 
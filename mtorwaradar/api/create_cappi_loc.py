@@ -1,9 +1,14 @@
 import os
+import copy
 import numpy as np
 import datetime
+import functools
 from dateutil import tz
 from netCDF4 import Dataset as ncdf
 from .create_cappi import create_cappi_data
+from ..util.parallel import run_time_steps
+from ..util.utilities import ArgumentError
+from .ncdf_series import run_time_series
 
 
 def createCAPPI(
@@ -22,7 +27,158 @@ def createCAPPI(
     filter=None,
     filter_fields=None,
     time_zone="Africa/Kigali",
+    backend="R",
+    workers=1,
+    chunksize=1,
+    output="step",
+    nc_chunksizes=None,
+    complevel=6,
+    errors="raise",
+    grid_mapping=False,
 ):
+    if output not in ("step", "series", "daily"):
+        raise ArgumentError("'output' must be 'step', 'series' or 'daily'")
+
+    pars = _cappi_pars(
+        fields,
+        cappi,
+        apply_cmd,
+        pia,
+        dbz_fields,
+        filter,
+        filter_fields,
+        time_zone,
+        backend,
+        grid_mapping,
+    )
+
+    #######
+
+    start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
+    end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
+    start = start.replace(tzinfo=tz.gettz(time_zone))
+    end = end.replace(tzinfo=tz.gettz(time_zone))
+
+    time_range = end - start
+    nb_seconds = time_range.days * 86400 + time_range.seconds + 300
+    seqTime = [start + datetime.timedelta(seconds=x) for x in range(0, nb_seconds, 300)]
+
+    if time_zone != "UTC":
+        seqTime = [x.astimezone(tz.gettz("UTC")) for x in seqTime]
+
+    seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
+
+    if output != "step":
+        start_end = start.strftime("%Y%m%d%H%M") + "_" + end.strftime("%Y%m%d%H%M")
+
+        def out_ncfile(time_format):
+            if output == "daily":
+                return os.path.join(dirOUT, "cappi_" + time_format[:8] + ".nc")
+            else:
+                return os.path.join(dirOUT, "cappi_" + start_end + ".nc")
+
+        fun = functools.partial(_create_cappi_step, dirMdvDate=dirMdvDate, pars=pars)
+        run_time_series(
+            fun,
+            seqTime,
+            out_ncfile,
+            "Constant Altitude Plan Position Indicator",
+            chunksizes=nc_chunksizes,
+            complevel=complevel,
+            workers=workers,
+            chunksize=chunksize,
+            errors=errors,
+        )
+        return None
+
+    #######
+
+    fun = functools.partial(
+        _create_cappi_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        pars=pars,
+        complevel=complevel,
+    )
+    run_time_steps(fun, seqTime, workers=workers, chunksize=chunksize, errors=errors)
+
+
+def cappi_product(
+    dirMdvDate,
+    dirOUT,
+    fields,
+    cappi={
+        "method": "composite_altitude",
+        "pars": {"fun": "maximum", "min_alt": 1.7, "max_alt": 15},
+    },
+    apply_cmd=False,
+    pia=None,
+    dbz_fields=None,
+    filter=None,
+    filter_fields=None,
+    time_zone="Africa/Kigali",
+    backend="R",
+    complevel=6,
+    grid_mapping=False,
+):
+    """
+    Create the step function of the CAPPI, to register to util.watcher.MdvWatcher
+    or to use with util.parallel.run_time_steps
+
+    Parameters
+    ----------
+    dirMdvDate, dirOUT, fields, cappi, apply_cmd, pia, dbz_fields, filter,
+    filter_fields, time_zone, backend, complevel:
+        See createCAPPI
+    grid_mapping: boolean
+        Reuse the gate to grid mapping of the scan geometry for the 'one_altitude'
+        and 'composite_altitude' methods, see qpe.create_cappi.create_cappi_grid. Default False
+
+    Returns
+    -------
+    A picklable function taking the time "yyyy-mm-dd-HH-MM" (UTC) of a volume,
+    writing the file "cappi_<time>.nc" to dirOUT as createCAPPI with output "step"
+    and returning its full path, or None when there is no data
+    """
+    pars = _cappi_pars(
+        fields,
+        cappi,
+        apply_cmd,
+        pia,
+        dbz_fields,
+        filter,
+        filter_fields,
+        time_zone,
+        backend,
+        grid_mapping,
+    )
+
+    return functools.partial(
+        _create_cappi_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        pars=pars,
+        complevel=complevel,
+    )
+
+
+def _cappi_pars(
+    fields,
+    cappi,
+    apply_cmd,
+    pia,
+    dbz_fields,
+    filter,
+    filter_fields,
+    time_zone,
+    backend,
+    grid_mapping=False,
+):
+    # the parameters of create_cappi_data, completed with the default values
+    cappi = copy.deepcopy(cappi)
+    pia = copy.deepcopy(pia)
+    filter = copy.deepcopy(filter)
+
     if pia is not None:
         if pia["method"] == "kdp":
             pia_pars = {"gamma": 0.8}
@@ -176,89 +332,117 @@ def createCAPPI(
         "filter": filter,
         "filter_fields": filter_fields,
         "time_zone": time_zone,
+        "backend": backend,
+        "grid_mapping": grid_mapping,
     }
 
-    #######
-
-    start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
-    end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
-    start = start.replace(tzinfo=tz.gettz(time_zone))
-    end = end.replace(tzinfo=tz.gettz(time_zone))
-
-    time_range = end - start
-    nb_seconds = time_range.days * 86400 + time_range.seconds + 300
-    seqTime = [start + datetime.timedelta(seconds=x) for x in range(0, nb_seconds, 300)]
-
-    if time_zone != "UTC":
-        seqTime = [x.astimezone(tz.gettz("UTC")) for x in seqTime]
-
-    seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
-
-    #######
-
-    for time in seqTime:
-        don = create_cappi_data(dirMdvDate, None, time, pars)
-
-        if not bool(don):
-            print("No data, time:" + time + time_zone)
-            continue
-
-        # open a netCDF file to write
-        out_ncfile = os.path.join(dirOUT, "cappi_" + don["time"]["format"] + ".nc")
-        ncout = ncdf(out_ncfile, mode="w", format="NETCDF4")
-
-        # define axis size
-        ncout.createDimension("time", 1)
-        ncout.createDimension("lat", len(don["lat"]))
-        ncout.createDimension("lon", len(don["lon"]))
-
-        # create time axis
-        time = ncout.createVariable("time", np.float64, ("time",))
-        time.long_name = "time"
-        time.units = don["time"]["unit"]
-        time.calendar = "standard"
-        time.axis = "T"
-        time[:] = don["time"]["value"]
-
-        # create latitude axis
-        lat = ncout.createVariable("lat", np.float32, ("lat"))
-        lat.standard_name = "latitude"
-        lat.long_name = "Latitude"
-        lat.units = "degrees_north"
-        lat.axis = "Y"
-        lat[:] = don["lat"]
-
-        # create longitude axis
-        lon = ncout.createVariable("lon", np.float32, ("lon"))
-        lon.standard_name = "longitude"
-        lon.long_name = "Longitude"
-        lon.units = "degrees_east"
-        lon.axis = "X"
-        lon[:] = don["lon"]
-
-        # create variable
-        for field in fields:
-            var_field = ncout.createVariable(
-                field,
-                np.float32,
-                ("time", "lat", "lon"),
-                zlib=True,
-                complevel=6,
-            )
-            var_field.long_name = field
-            var_field.units = ""
-            var_field.missing_value = -999.0
-            vars_d = don["data"][field]
-            var_field[0, :, :] = vars_d.filled(fill_value=-999.0)
-
-        # global attributes
-        ncout.description = "Constant Altitude Plan Position Indicator"
-        ncout.close()
-
-        print(
-            "Creating CAPPI, time: "
-            + don["time"]["format"]
-            + " "
-            + time_zone
-            + " done."
+    return pars
+
+
+def _create_cappi_time(time, dirMdvDate, dirOUT, pars, complevel=6):
+    fields = pars["fields"]
+    time_zone = pars["time_zone"]
+    don = create_cappi_data(dirMdvDate, None, time, copy.deepcopy(pars))
+
+    if not bool(don):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    # open a netCDF file to write
+    out_ncfile = os.path.join(dirOUT, "cappi_" + don["time"]["format"] + ".nc")
+    ncout = ncdf(out_ncfile, mode="w", format="NETCDF4")
+
+    # define axis size
+    ncout.createDimension("time", 1)
+    ncout.createDimension("lat", len(don["lat"]))
+    ncout.createDimension("lon", len(don["lon"]))
+
+    # create time axis
+    time = ncout.createVariable("time", np.float64, ("time",))
+    time.long_name = "time"
+    time.units = don["time"]["unit"]
+    time.calendar = "standard"
+    time.axis = "T"
+    time[:] = don["time"]["value"]
+
+    # create latitude axis
+    lat = ncout.createVariable("lat", np.float32, ("lat"))
+    lat.standard_name = "latitude"
+    lat.long_name = "Latitude"
+    lat.units = "degrees_north"
+    lat.axis = "Y"
+    lat[:] = don["lat"]
+
+    # create longitude axis
+    lon = ncout.createVariable("lon", np.float32, ("lon"))
+    lon.standard_name = "longitude"
+    lon.long_name = "Longitude"
+    lon.units = "degrees_east"
+    lon.axis = "X"
+    lon[:] = don["lon"]
+
+    # create variable
+    for field in fields:
+        var_field = ncout.createVariable(
+            field,
+            np.float32,
+            ("time", "lat", "lon"),
+            zlib=True,
+            complevel=complevel,
         )
+        var_field.long_name = field
+        var_field.units = ""
+        var_field.missing_value = -999.0
+        vars_d = don["data"][field]
+        var_field[0, :, :] = vars_d.filled(fill_value=-999.0)
+
+    # global attributes
+    ncout.description = "Constant Altitude Plan Position Indicator"
+    ncout.close()
+
+    print(
+        "Creating CAPPI, time: "
+        + don["time"]["format"]
+        + " "
+        + time_zone
+        + " done."
+    )
+
+    return out_ncfile
+
+
+def _create_cappi_step(time, dirMdvDate, pars):
+    fields = pars["fields"]
+    time_zone = pars["time_zone"]
+    don = create_cappi_data(dirMdvDate, None, time, copy.deepcopy(pars))
+
+    if not bool(don):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    variables = list()
+    for field in fields:
+        variables.append(
+            {
+                "name": field,
+                "long_name": field,
+                "units": "",
+                "missing_value": -999.0,
+                "data": don["data"][field].filled(fill_value=-999.0),
+            }
+        )
+
+    print(
+        "Creating CAPPI, time: "
+        + don["time"]["format"]
+        + " "
+        + time_zone
+        + " done."
+    )
+
+    return {
+        "lon": don["lon"],
+        "lat": don["lat"],
+        "time": don["time"],
+        "variables": variables,
+    }
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+
+from .radarpolar_data import readRadarPolar, radarPolarTimeInfo
+from ..qpe.create_cappi import cappi_grid_data
+from ..mdv.echotops import echo_tops_stack
+from ..util.precision import as_precision
+
+
+def create_echotops_data(dirMDV, source, time, pars):
+    if source is None:
+        dirDate = dirMDV
+    else:
+        dirDate = os.path.join(dirMDV, source)
+
+    dbz_field = pars["dbz_field"]
+    radar = readRadarPolar(dirDate, time, [dbz_field])
+    if radar is None:
+        return {}
+
+    # same grid as mdv.creategrid.create_grid_from_radar
+    grid_shape = (35, 800, 800)
+    z_lim = (0.0, 17000.0)
+    lon, lat, grid = cappi_grid_data(
+        radar, [dbz_field], grid_shape, z_lim, 710, pars.get("grid_mapping", False)
+    )
+    alt = np.linspace(z_lim[0], z_lim[1], grid_shape[0]) / 1000
+    tops = echo_tops_stack(grid[dbz_field], alt, pars["thres"], pars["interpolate"])
+
+    data = dict()
+    for j, th in enumerate(pars["thres"]):
+        th_str = ("%f" % th).rstrip("0").rstrip(".")
+        data["Tops" + th_str] = {
+            "long_name": "Echo tops, Threshold " + th_str + "dBZ",
+            "data": as_precision(tops[j]),
+        }
+
+    rtime = radarPolarTimeInfo(radar, pars["time_zone"])
+
+    return {"lon": lon, "lat": lat, "time": rtime, "data": data}
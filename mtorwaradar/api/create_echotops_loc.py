@@ -0,0 +1,199 @@
+import os
+import numpy as np
+import datetime
+import functools
+from dateutil import tz
+from netCDF4 import Dataset as ncdf
+from .create_echotops import create_echotops_data
+from ..util.parallel import run_time_steps
+
+
+def createEchoTops(
+    dirMdvDate,
+    dirOUT,
+    start_time,
+    end_time,
+    thres=[10.0, 15.0, 20.0],
+    dbz_field="DBZ_F",
+    interpolate=False,
+    grid_mapping=False,
+    time_zone="Africa/Kigali",
+    workers=1,
+    chunksize=1,
+    complevel=6,
+    errors="raise",
+):
+    """
+    Compute the echo tops for a period, one netCDF file "echotops_<time>.nc" by volume
+
+    Parameters
+    ----------
+    dirMdvDate: string
+        full path to the folders containing the folders dates of the mdv files
+    dirOUT: string
+        full path to the folder to save the netCDF files
+    start_time: string
+        The start time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    end_time: string
+        The end time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    thres: list
+        The DBZ thresholds. Default [10, 15, 20]
+    dbz_field: string
+        The name of the reflectivity field. Default "DBZ_F"
+    interpolate: boolean
+        Interpolate the echo tops between the levels, see mdv.echotops.echo_tops_stack.
+        Default False
+    grid_mapping: boolean
+        Reuse the gate to grid mapping of the scan geometry, see qpe.create_cappi.create_cappi_grid.
+        Default False
+    time_zone: string
+        The time zone of "start_time", "end_time" and the output.
+        Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    workers: integer or None
+        Number of processes used to compute the time steps. Default 1.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    complevel: integer
+        The compression level of the netCDF variables. Default 6
+    errors: string
+        "raise" to stop at the first time step raising an error, "capture" to print the error
+        and go on with the other time steps. Default "raise"
+    """
+    start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
+    end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
+    start = start.replace(tzinfo=tz.gettz(time_zone))
+    end = end.replace(tzinfo=tz.gettz(time_zone))
+
+    time_range = end - start
+    nb_seconds = time_range.days * 86400 + time_range.seconds + 300
+    seqTime = [start + datetime.timedelta(seconds=x) for x in range(0, nb_seconds, 300)]
+
+    if time_zone != "UTC":
+        seqTime = [x.astimezone(tz.gettz("UTC")) for x in seqTime]
+
+    seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
+
+    fun = echotops_product(
+        dirMdvDate,
+        dirOUT,
+        thres=thres,
+        dbz_field=dbz_field,
+        interpolate=interpolate,
+        grid_mapping=grid_mapping,
+        time_zone=time_zone,
+        complevel=complevel,
+    )
+    run_time_steps(fun, seqTime, workers=workers, chunksize=chunksize, errors=errors)
+
+
+def echotops_product(
+    dirMdvDate,
+    dirOUT,
+    thres=[10.0, 15.0, 20.0],
+    dbz_field="DBZ_F",
+    interpolate=False,
+    grid_mapping=False,
+    time_zone="Africa/Kigali",
+    complevel=6,
+):
+    """
+    Create the step function of the echo tops, to register to util.watcher.MdvWatcher
+    or to use with util.parallel.run_time_steps
+
+    Parameters
+    ----------
+    dirMdvDate, dirOUT, thres, dbz_field, interpolate, grid_mapping, time_zone, complevel:
+        See createEchoTops
+
+    Returns
+    -------
+    A picklable function taking the time "yyyy-mm-dd-HH-MM" (UTC) of a volume,
+    writing the file "echotops_<time>.nc" to dirOUT and returning its full path,
+    or None when there is no data
+    """
+    pars = {
+        "thres": [float(th) for th in thres],
+        "dbz_field": dbz_field,
+        "interpolate": interpolate,
+        "grid_mapping": grid_mapping,
+        "time_zone": time_zone,
+    }
+
+    return functools.partial(
+        _create_echotops_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        pars=pars,
+        complevel=complevel,
+    )
+
+
+def _create_echotops_time(time, dirMdvDate, dirOUT, pars, complevel=6):
+    time_zone = pars["time_zone"]
+    don = create_echotops_data(dirMdvDate, None, time, pars)
+
+    if not bool(don):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    # open a netCDF file to write
+    out_ncfile = os.path.join(dirOUT, "echotops_" + don["time"]["format"] + ".nc")
+    ncout = ncdf(out_ncfile, mode="w", format="NETCDF4")
+
+    # define axis size
+    ncout.createDimension("time", 1)
+    ncout.createDimension("lat", len(don["lat"]))
+    ncout.createDimension("lon", len(don["lon"]))
+
+    # create time axis
+    time = ncout.createVariable("time", np.float64, ("time",))
+    time.long_name = "time"
+    time.units = don["time"]["unit"]
+    time.calendar = "standard"
+    time.axis = "T"
+    time[:] = don["time"]["value"]
+
+    # create latitude axis
+    lat = ncout.createVariable("lat", np.float32, ("lat"))
+    lat.standard_name = "latitude"
+    lat.long_name = "Latitude"
+    lat.units = "degrees_north"
+    lat.axis = "Y"
+    lat[:] = don["lat"]
+
+    # create longitude axis
+    lon = ncout.createVariable("lon", np.float32, ("lon"))
+    lon.standard_name = "longitude"
+    lon.long_name = "Longitude"
+    lon.units = "degrees_east"
+    lon.axis = "X"
+    lon[:] = don["lon"]
+
+    # create variable
+    for name, tops in don["data"].items():
+        var_field = ncout.createVariable(
+            name,
+            np.float32,
+            ("time", "lat", "lon"),
+            zlib=True,
+            complevel=complevel,
+        )
+        var_field.long_name = tops["long_name"]
+        var_field.units = "km"
+        var_field.missing_value = -999.0
+        var_field[0, :, :] = tops["data"].filled(fill_value=-999.0)
+
+    # global attributes
+    ncout.description = "Echo tops"
+    ncout.close()
+
+    print(
+        "Computing echo tops, time: "
+        + don["time"]["format"]
+        + " "
+        + time_zone
+        + " done."
+    )
+
+    return out_ncfile
@@ -1,14 +1,33 @@
 import os
+import warnings
+import numpy as np
 from pyart.core.transforms import antenna_to_cartesian
 from .radarpolar_data import readRadarPolar, radarPolarTimeInfo
+from ..mdv.readmdv import MdvReader
+from ..util.radarDateTime import mdv_end_time_file
 
 
-def create_qvp_data(dirMDV, source, time, fields, desired_angle, time_zone):
+def create_qvp_data(
+    dirMDV,
+    source,
+    time,
+    fields,
+    desired_angle,
+    time_zone,
+    sweep_only=False,
+    percentiles=None,
+    count=False,
+):
     if source is None:
         dirDate = dirMDV
     else:
         dirDate = os.path.join(dirMDV, source)
 
+    if sweep_only:
+        return create_qvp_sweep(
+            dirDate, time, fields, desired_angle, time_zone, percentiles, count
+        )
+
     radar = readRadarPolar(dirDate, time, fields)
     if radar is None:
         return {}
@@ -23,10 +42,92 @@ def create_qvp_data(dirMDV, source, time, fields, desired_angle, time_zone):
         data[field] = radar.get_field(index, field).mean(axis=0)
 
     infoT = radarPolarTimeInfo(radar, time_zone)
+    mdvtime = mdv_end_time_file(dirDate, time)
 
     return {
         "time": infoT["format"],
         "elevation": radar_angle,
         "height": height,
         "data": data,
+        "mdv_time": mdvtime[0] + mdvtime[1],
     }
+
+
+def create_qvp_sweep(
+    dirDate, time, fields, desired_angle, time_zone, percentiles=None, count=False
+):
+    """
+    Compute the QVP reading only the sweep the nearest to "desired_angle"
+
+    Parameters
+    ----------
+    dirDate: string
+        full path to the folders containing the folders dates of the mdv files
+    time: string
+        The time step, format "yyyy-mm-dd-HH-MM" (UTC)
+    fields: list
+        List of the fields
+    desired_angle: float
+        The elevation angle
+    time_zone: string
+        The time zone of the output time
+    percentiles: list or None
+        The percentiles (0 to 100) of the fields to compute, the keys of
+        the data are "<field>_p<percentile>". Default None
+    count: boolean
+        Add the number of valid gates by range, the keys of the data are "<field>_count".
+        Default False
+
+    Returns
+    -------
+    A dictionary as create_qvp_data, with the key "mdv_time", the time of the MDV file
+    """
+    mdvtime = mdv_end_time_file(dirDate, time)
+    if mdvtime is None:
+        return {}
+
+    mdvfile = os.path.join(dirDate, mdvtime[0], mdvtime[1] + ".mdv")
+    with MdvReader(mdvfile) as reader:
+        radar = reader.radar(None)
+
+        index = int(abs(radar.fixed_angle["data"] - desired_angle).argmin())
+        radar_range = radar.range["data"] / 1000.0
+        radar_angle = radar.fixed_angle["data"][index]
+        _, _, height = antenna_to_cartesian(radar_range, 0.0, radar_angle)
+
+        data = dict()
+        for field in fields:
+            sweep = reader.level_data(field, [index])[0]
+            data.update(_qvp_stats(field, sweep, percentiles, count))
+
+    infoT = radarPolarTimeInfo(radar, time_zone)
+
+    return {
+        "time": infoT["format"],
+        "elevation": radar_angle,
+        "height": height,
+        "data": data,
+        "mdv_time": mdvtime[0] + mdvtime[1],
+    }
+
+
+def _qvp_stats(field, sweep, percentiles, count):
+    # azimuthal statistics of a sweep (rays x gates)
+    out = {field: sweep.mean(axis=0)}
+    nvalid = sweep.count(axis=0)
+
+    if percentiles is not None and len(percentiles) > 0:
+        values = sweep.astype(np.float64).filled(np.nan)
+        with warnings.catch_warnings():
+            # gates without valid data
+            warnings.simplefilter("ignore", RuntimeWarning)
+            pct = np.nanpercentile(values, percentiles, axis=0)
+        for p, val in zip(percentiles, pct):
+            out[field + "_p" + "{:g}".format(p)] = np.ma.masked_where(
+                nvalid == 0, val
+            )
+
+    if count:
+        out[field + "_count"] = np.ma.masked_array(nvalid.astype(np.float64))
+
+    return out
@@ -1,8 +1,14 @@
 import numpy as np
+import pandas as pd
 import datetime
+import functools
 from dateutil import tz
-import copy
 from .create_qvp import create_qvp_data
+from .qvp_store import QvpStore
+from ..util.parallel import run_time_steps, iter_time_steps, StepError
+from ..util.radarDateTime import mdv_end_time_file
+from .extract_output import categorical_column, table_output
+from .time_height import time_height_arrays
 
 
 def createQVP(
@@ -12,7 +18,60 @@ def createQVP(
     fields,
     desired_angle=15.0,
     time_zone="Africa/Kigali",
+    workers=1,
+    chunksize=1,
+    sweep_only=False,
+    percentiles=None,
+    count=False,
+    store=None,
+    errors="raise",
 ):
+    """
+    Compute the quasi-vertical profiles for a period
+
+    Parameters
+    ----------
+    dirMdvDate: string
+        full path to the folders containing the folders dates of the mdv files
+    start_time: string
+        The start time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    end_time: string
+        The end time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    fields: list
+        List of the fields
+    desired_angle: float
+        The elevation angle of the sweep to use, the nearest available. Default 15
+    time_zone: string
+        The time zone of "start_time", "end_time" and the output.
+        Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    workers: integer or None
+        Number of processes used to compute the time steps. Default 1.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    sweep_only: boolean
+        Read only the selected sweep of the fields from the MDV files. Default False
+    percentiles: list or None
+        With "sweep_only", the percentiles (0 to 100) of the fields to add to the data,
+        the keys are "<field>_p<percentile>". Default None
+    count: boolean
+        With "sweep_only", add the number of valid gates by range, the keys are "<field>_count".
+        Default False
+    store: string or None
+        Full path to a netCDF file (api.qvp_store.QvpStore) where to append the profiles.
+        The MDV files already in the store are not read again, and the profiles of the
+        period are read from the store. The parameters fields, desired_angle, sweep_only,
+        percentiles and count are recorded in the store, a ValueError is raised if they
+        differ from the ones of an existing store. Default None
+    errors: string
+        "raise" to stop at the first time step raising an error, "capture" to print the error
+        and go on with the other time steps. Default "raise"
+
+    Returns
+    -------
+    A list of dictionaries, one by volume, with keys
+    time, elevation, height, data (dictionary of the fields) and mdv_time
+    """
     start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
     end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
     start = start.replace(tzinfo=tz.gettz(time_zone))
@@ -27,64 +86,109 @@ def createQVP(
 
     seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
 
-    out = list()
-    for time in seqTime:
-        qvp = create_qvp_data(dirMdvDate, None, time, fields, desired_angle, time_zone)
-        if bool(qvp):
-            out = out + [qvp]
-
-    return out
-
-
-def qvpTable(qvp):
-    tab = list()
-    for q in qvp:
-        dat = copy.copy(q["data"])
-        fields = list(dat.keys())
-        for field in fields:
-            tmp = dat[field].filled(-9999)
-            dat[field] = tmp
-
-        for j in range(len(q["height"])):
-            x = {
-                "time": q["time"],
-                "elevation_angle": q["elevation"],
-                "height": q["height"][j],
-            }
-            for field in fields:
-                x[field] = dat[field][j]
-
-            tab = tab + [x]
-
-    return tab
-
-
-def qvpMeshgrid(qvp):
-    time = [q["time"] for q in qvp]
-    time = [datetime.datetime.strptime(x, "%Y%m%d%H%M%S") for x in time]
-    time = np.array(time)
-
-    Z = qvp[0]["height"]
-    dat = copy.copy(qvp[0]["data"])
-    fields = list(dat.keys())
+    fun = functools.partial(
+        _create_qvp_time,
+        dirMdvDate=dirMdvDate,
+        fields=fields,
+        desired_angle=desired_angle,
+        time_zone=time_zone,
+        sweep_only=sweep_only,
+        percentiles=percentiles,
+        count=count,
+    )
+
+    if store is None:
+        out = run_time_steps(
+            fun, seqTime, workers=workers, chunksize=chunksize, errors=errors
+        )
+        out = [qvp for qvp in out if not isinstance(qvp, StepError) and bool(qvp)]
+        return out
+
+    params = {
+        "fields": fields,
+        "desired_angle": desired_angle,
+        "sweep_only": sweep_only,
+        "percentiles": percentiles,
+        "count": count,
+    }
+    with QvpStore(store, time_zone, params=params) as qstore:
+        if qstore.time_zone != time_zone:
+            raise ValueError("The time zone of " + store + " is " + qstore.time_zone)
+
+        # one step by MDV file not yet in the store
+        done = set(qstore.mdv_times)
+        steps = list()
+        for time in seqTime:
+            mdvtime = mdv_end_time_file(dirMdvDate, time)
+            if mdvtime is None or mdvtime[0] + mdvtime[1] in done:
+                continue
+            done.add(mdvtime[0] + mdvtime[1])
+            steps.append(time)
+
+        # the profiles are appended as they are computed by a single pool
+        for qvp in iter_time_steps(
+            fun, steps, workers=workers, chunksize=chunksize, errors=errors
+        ):
+            if not isinstance(qvp, StepError) and bool(qvp):
+                qstore.append([qvp])
+
+        end = end + datetime.timedelta(seconds=300)
+        return qstore.read(start.strftime("%Y%m%d%H%M%S"), end.strftime("%Y%m%d%H%M%S"))
+
+
+def _create_qvp_time(
+    time, dirMdvDate, fields, desired_angle, time_zone, sweep_only, percentiles, count
+):
+    return create_qvp_data(
+        dirMdvDate,
+        None,
+        time,
+        fields,
+        desired_angle,
+        time_zone,
+        sweep_only,
+        percentiles,
+        count,
+    )
+
+
+def qvpTable(qvp, output="dataframe"):
+    """
+    Convert to table the QVP profiles.
+
+    Parameters
+    ----------
+    qvp: list
+        Output from createQVP
+    output: string
+        "dataframe": a pandas DataFrame, "records": a list of dictionaries (one by row).
+        Default "dataframe"
+    Returns
+    -------
+    A pandas DataFrame with the columns time, elevation_angle, height and the fields,
+    the missing values are -9999
+    """
+    nz = [len(q["height"]) for q in qvp]
+    itime = np.repeat(np.arange(len(qvp)), nz)
+    fields = list(qvp[0]["data"].keys()) if len(qvp) > 0 else []
+
+    tab = {
+        "time": categorical_column(itime, [q["time"] for q in qvp]),
+        "elevation_angle": np.array([q["elevation"] for q in qvp])[itime],
+        "height": np.concatenate([q["height"] for q in qvp]) if len(qvp) > 0 else [],
+    }
     for field in fields:
-        dat[field] = dat[field].filled(-9999.0)
+        tab[field] = np.concatenate([q["data"][field].filled(-9999) for q in qvp])
 
-    for tt in range(1, len(qvp)):
-        Z = np.column_stack((Z, qvp[tt]["height"]))
-        tmp = copy.copy(qvp[tt]["data"])
-        for field in fields:
-            tmp[field] = tmp[field].filled(-9999.0)
-            dat[field] = np.column_stack((dat[field], tmp[field]))
+    return table_output(pd.DataFrame(tab), output)
 
-    for field in fields:
-        dat[field] = np.ma.masked_where(dat[field] == -9999.0, dat[field])
 
-    T, _ = np.meshgrid(time, Z[:, 0])
-    Z = Z / 1000
+def qvpMeshgrid(qvp):
+    th = time_height_arrays(qvp, list(qvp[0]["data"].keys()), data_key="data")
+    Z = th.pop("height")
+    T = np.tile(th.pop("time"), (Z.shape[0], 1))
 
-    out = {"time": T, "height": Z}
-    for field in fields:
-        out[field] = dat[field]
+    out = {"time": T, "height": Z / 1000}
+    out.update(th)
 
     return out
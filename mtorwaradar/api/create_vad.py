@@ -2,10 +2,16 @@ import os
 # from pyart.retrieve import velocity_azimuth_display
 from pyart.retrieve import vad_michelson
 from .radarpolar_data import readRadarPolar, radarPolarTimeInfo
-from ..util.utilities import suppress_stdout
+from ..util.utilities import ArgumentError, suppress_stdout
+from ..mdv.vad import vad_batch
 
 
-def create_vad_data(dirMDV, source, time, z_want, vel_field, time_zone):
+def create_vad_data(
+    dirMDV, source, time, z_want, vel_field, time_zone, engine="pyart"
+):
+    if engine not in ["pyart", "batch"]:
+        raise ArgumentError("'engine' must be 'pyart' or 'batch'")
+
     if source is None:
         dirDate = dirMDV
     else:
@@ -15,11 +21,15 @@ def create_vad_data(dirMDV, source, time, z_want, vel_field, time_zone):
     if radar is None:
         return {}
 
+    infoT = radarPolarTimeInfo(radar, time_zone)
+
+    if engine == "batch":
+        vad = vad_batch(radar, vel_field, z_want)
+        return {"time": infoT["format"], **vad}
+
     with suppress_stdout():
         vad = vad_michelson(radar, vel_field, z_want)
 
-    infoT = radarPolarTimeInfo(radar, time_zone)
-
     return {
         "time": infoT["format"],
         "height": vad.height,
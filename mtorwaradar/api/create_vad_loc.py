@@ -1,8 +1,15 @@
+import os
 import numpy as np
+import pandas as pd
 import datetime
+import functools
 from dateutil import tz
 import matplotlib.pyplot as plt
 from .create_vad import create_vad_data
+from ..util.parallel import run_time_steps, StepError
+from .extract_output import categorical_column, table_output
+from .time_height import time_height_arrays
+from ..util.utilities import ArgumentError
 
 
 def createVAD(
@@ -12,7 +19,53 @@ def createVAD(
     heights=None,
     vel_field="VEL_F",
     time_zone="Africa/Kigali",
+    workers=1,
+    chunksize=1,
+    engine="pyart",
+    errors="raise",
 ):
+    """
+    Compute the velocity azimuth display for a period
+
+    Parameters
+    ----------
+    dirMdvDate: string
+        full path to the folders containing the folders dates of the mdv files
+    start_time: string
+        The start time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    end_time: string
+        The end time same time zone as "time_zone", format "YYYY-mm-dd HH:MM"
+    heights: list
+        A list of the start, end and step of heights in meters,
+        Default None equivalents to [0, 10000, 100]
+    vel_field: string
+        The name of the radial velocity field. Default "VEL_F"
+    time_zone: string
+        The time zone of "start_time", "end_time" and the output.
+        Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    workers: integer or None
+        Number of processes used to compute the time steps. Default 1.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    engine: string
+        "pyart": pyart.retrieve.vad_michelson for each volume.
+        "batch": mdv.vad.VadEngine, the sweep geometry and the height intervals are
+        computed once for the volumes with the same scan strategy, the masked gates
+        are left out of the fit. Default "pyart"
+    errors: string
+        "raise" to stop at the first time step raising an error, "capture" to print the error
+        and go on with the other time steps. Default "raise"
+
+    Returns
+    -------
+    A list of dictionaries, one by volume, with keys
+    time, height, speed, direction, u_wind and v_wind
+    """
+    # checked before the time steps, the errors of which may be captured
+    if engine not in ["pyart", "batch"]:
+        raise ArgumentError("'engine' must be 'pyart' or 'batch'")
+
     start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
     end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
     start = start.replace(tzinfo=tz.gettz(time_zone))
@@ -32,30 +85,110 @@ def createVAD(
         heights = [0, 10000, 100]
     z_want = np.arange(heights[0], heights[1] + 0.001, heights[2])
 
-    out = list()
-    for time in seqTime:
-        vad = create_vad_data(dirMdvDate, None, time, z_want, vel_field, time_zone)
-        if bool(vad):
-            out = out + [vad]
+    fun = functools.partial(
+        _create_vad_time,
+        dirMdvDate=dirMdvDate,
+        z_want=z_want,
+        vel_field=vel_field,
+        time_zone=time_zone,
+        engine=engine,
+    )
+    out = run_time_steps(
+        fun, seqTime, workers=workers, chunksize=chunksize, errors=errors
+    )
+    out = [vad for vad in out if not isinstance(vad, StepError) and bool(vad)]
 
     return out
 
 
-def vadTable(vad):
-    tab = list()
-    for v in vad:
-        for j in range(len(v["height"])):
-            x = {
-                "time": v["time"],
-                "height": v["height"][j],
-                "speed": v["speed"][j],
-                "direction": v["direction"][j],
-                "u_wind": v["u_wind"][j],
-                "v_wind": v["v_wind"][j],
-            }
-            tab = tab + [x]
+def vad_product(
+    dirMdvDate,
+    dirOUT,
+    heights=None,
+    vel_field="VEL_F",
+    time_zone="Africa/Kigali",
+    engine="pyart",
+):
+    """
+    Create the step function of the VAD, to register to util.watcher.MdvWatcher
+    or to use with util.parallel.run_time_steps
+
+    Parameters
+    ----------
+    dirMdvDate, heights, vel_field, time_zone, engine:
+        See createVAD
+    dirOUT: string
+        full path to the folder to save the CSV files
+
+    Returns
+    -------
+    A picklable function taking the time "yyyy-mm-dd-HH-MM" (UTC) of a volume,
+    writing the profile (see vadTable) to the file "vad_<time>.csv" in dirOUT
+    and returning its full path, or None when there is no data
+    """
+    if heights is None:
+        heights = [0, 10000, 100]
+    z_want = np.arange(heights[0], heights[1] + 0.001, heights[2])
+
+    return functools.partial(
+        _write_vad_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        z_want=z_want,
+        vel_field=vel_field,
+        time_zone=time_zone,
+        engine=engine,
+    )
+
+
+def _create_vad_time(time, dirMdvDate, z_want, vel_field, time_zone, engine):
+    return create_vad_data(
+        dirMdvDate, None, time, z_want, vel_field, time_zone, engine
+    )
+
+
+def _write_vad_time(time, dirMdvDate, dirOUT, z_want, vel_field, time_zone, engine):
+    vad = _create_vad_time(time, dirMdvDate, z_want, vel_field, time_zone, engine)
+    if not bool(vad):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    out_file = os.path.join(dirOUT, "vad_" + vad["time"] + ".csv")
+    vadTable([vad]).to_csv(out_file, index=False)
+
+    print("Computing VAD, time: " + vad["time"] + " " + time_zone + " done.")
+
+    return out_file
+
+
+def vadTable(vad, output="dataframe"):
+    """
+    Convert to table the VAD profiles.
 
-    return tab
+    Parameters
+    ----------
+    vad: list
+        Output from createVAD
+    output: string
+        "dataframe": a pandas DataFrame, "records": a list of dictionaries (one by row).
+        Default "dataframe"
+    Returns
+    -------
+    A pandas DataFrame with the columns time, height, speed, direction, u_wind and v_wind
+    """
+    nz = [len(v["height"]) for v in vad]
+    itime = np.repeat(np.arange(len(vad)), nz)
+
+    tab = {
+        "time": categorical_column(itime, [v["time"] for v in vad]),
+    }
+    for key in ["height", "speed", "direction", "u_wind", "v_wind"]:
+        if len(vad) == 0:
+            tab[key] = np.array([], dtype=np.float64)
+            continue
+        tab[key] = np.concatenate([np.ma.filled(v[key], np.nan) for v in vad])
+
+    return table_output(pd.DataFrame(tab), output)
 
 
 def vadProfile(vad, index_time, sample=None):
@@ -95,35 +228,11 @@ def vadProfile(vad, index_time, sample=None):
 
 
 def vadBarb(vad, sample=None):
-    time = [v["time"] for v in vad]
-    time = [datetime.datetime.strptime(x, "%Y%m%d%H%M%S") for x in time]
-    time = np.array(time)
-
-    Z = vad[0]["height"]
-    U = vad[0]["u_wind"]
-    V = vad[0]["v_wind"]
-
-    if sample is None:
-        step = 1
-    else:
-        step = sample
-
-    iz = np.arange(0, len(Z), step)
-
-    Z = Z[iz]
-    U = U[iz]
-    V = V[iz]
-    for tt in range(1, len(vad)):
-        # Z = np.vstack((Z, vad[tt]['height'][iz]))
-        # U = np.vstack((U, vad[tt]['u_wind'][iz]))
-        # V = np.vstack((V, vad[tt]['v_wind'][iz]))
-        Z = np.column_stack((Z, vad[tt]["height"][iz]))
-        U = np.column_stack((U, vad[tt]["u_wind"][iz]))
-        V = np.column_stack((V, vad[tt]["v_wind"][iz]))
-
-    T, _ = np.meshgrid(time, Z[:, 0])
-
-    Z = Z / 1000
+    th = time_height_arrays(vad, ["u_wind", "v_wind"], sample=sample)
+    U = th["u_wind"]
+    V = th["v_wind"]
+    T = np.tile(th["time"], (U.shape[0], 1))
+    Z = th["height"] / 1000
 
     fig, ax = plt.subplots()
     ax.barbs(T, Z, U, V)
@@ -134,32 +243,11 @@ def vadBarb(vad, sample=None):
 
 
 def vadQuiver(vad, sample=None, color=False):
-    time = [v["time"] for v in vad]
-    time = [datetime.datetime.strptime(x, "%Y%m%d%H%M%S") for x in time]
-    time = np.array(time)
-
-    Z = vad[0]["height"]
-    U = vad[0]["u_wind"]
-    V = vad[0]["v_wind"]
-
-    if sample is None:
-        step = 1
-    else:
-        step = sample
-
-    iz = np.arange(0, len(Z), step)
-
-    Z = Z[iz]
-    U = U[iz]
-    V = V[iz]
-    for tt in range(1, len(vad)):
-        Z = np.column_stack((Z, vad[tt]["height"][iz]))
-        U = np.column_stack((U, vad[tt]["u_wind"][iz]))
-        V = np.column_stack((V, vad[tt]["v_wind"][iz]))
-
-    T, _ = np.meshgrid(time, Z[:, 0])
-
-    Z = Z / 1000
+    th = time_height_arrays(vad, ["u_wind", "v_wind"], sample=sample)
+    U = th["u_wind"]
+    V = th["v_wind"]
+    T = np.tile(th["time"], (U.shape[0], 1))
+    Z = th["height"] / 1000
 
     fig, ax = plt.subplots()
     if color:
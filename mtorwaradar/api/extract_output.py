@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+from ..util.precision import get_precision
+from ..util.utilities import ArgumentError, write_to_parquet
+
+########
+## Columnar form of the extracted data
+## The extraction functions fill preallocated arrays (date x level x point),
+## the missing values being NaN, and convert them to the requested output:
+## "list": the nested lists, the missing values being -9999 (default)
+## "array": the numpy arrays
+## "xarray": a xarray Dataset
+
+LEVEL_KEYS = ["altitude", "elevation_angle", "height"]
+COORDS_KEYS = ["longitude", "latitude", "altitude"]
+
+
+def new_extracted_arrays(names, ndate, nlevel, npoint, output="list"):
+    """
+    Allocate the arrays (date x level x point) of the extracted data, filled with NaN
+
+    Parameters
+    ----------
+    names: list
+        The names of the arrays
+    ndate, nlevel, npoint: integer
+        The maximum number of dates, the number of levels and points
+    output: string
+        The output of the extraction, "list", "array" or "xarray".
+        The fields are in the precision of util.precision for "array" and "xarray",
+        in double precision for "list" and for the coordinates.
+
+    Returns
+    -------
+    A dictionary of the arrays, the keys are the names
+    """
+    out = dict()
+    for name in names:
+        if output == "list" or name in COORDS_KEYS:
+            dtype = np.float64
+        else:
+            dtype = get_precision()
+        out[name] = np.full((ndate, nlevel, npoint), np.nan, dtype=dtype)
+
+    return out
+
+
+def _level_key(x):
+    for key in LEVEL_KEYS:
+        if key in x:
+            return key
+
+    raise ArgumentError("No level (" + ", ".join(LEVEL_KEYS) + ") in the extracted data")
+
+
+def extracted_output(ext_data, ndate, output="list"):
+    """
+    Convert the extracted arrays to the requested output
+
+    Parameters
+    ----------
+    ext_data: dictionary
+        The extracted data, "date" and "data" (arrays allocated by new_extracted_arrays)
+    ndate: integer
+        The number of dates filled, the arrays are truncated to this number
+    output: string
+        "list", "array" or "xarray"
+
+    Returns
+    -------
+    The extracted data in the requested output
+    """
+    if output not in ["list", "array", "xarray"]:
+        raise ArgumentError("'output' must be 'list', 'array' or 'xarray'")
+
+    level = _level_key(ext_data)
+    ext_data["date"] = list(ext_data["date"][:ndate])
+    ext_data["data"] = dict(
+        (name, arr[:ndate]) for name, arr in ext_data["data"].items()
+    )
+
+    if output == "list":
+        ext_data[level] = np.asarray(ext_data[level]).tolist()
+        for name, arr in ext_data["data"].items():
+            arr = np.where(np.isnan(arr), -9999.0, arr)
+            ext_data["data"][name] = arr.tolist()
+        return ext_data
+
+    ext_data["date"] = np.array(ext_data["date"])
+    ext_data[level] = np.asarray(ext_data[level])
+
+    if output == "xarray":
+        return extracted_to_xarray(ext_data)
+
+    return ext_data
+
+
+def _as_arrays(x):
+    level = _level_key(x)
+    dates = np.asarray(x["date"])
+    levels = np.asarray(x[level])
+    data = dict()
+    for name, val in x["data"].items():
+        val = np.asarray(val)
+        if not np.issubdtype(val.dtype, np.floating):
+            val = val.astype(np.float64)
+        if val.size == 0:
+            val = val.reshape(len(dates), len(levels), len(x["coords"]))
+        data[name] = val
+
+    return level, dates, levels, data
+
+
+def extracted_to_xarray(x):
+    """
+    Convert extracted data to a xarray Dataset
+
+    Parameters
+    ----------
+    x: dictionary
+        Output from extractRadarPolar, extractRadarGrid or extractRadarPolarV,
+        with output "list" or "array"
+
+    Returns
+    -------
+    A xarray Dataset with dimensions (date, level, point), the level being "altitude",
+    "elevation_angle" or "height". The missing values are NaN.
+    """
+    import xarray as xr
+
+    level, dates, levels, data = _as_arrays(x)
+
+    data_vars = dict()
+    for name, val in data.items():
+        val = np.where(val == -9999, np.nan, val)
+        data_vars[name] = (("date", level, "point"), val)
+
+    coords = {
+        "date": dates,
+        level: levels,
+        "point": [pt["id"] for pt in x["coords"]],
+        "point_longitude": ("point", [pt["longitude"] for pt in x["coords"]]),
+        "point_latitude": ("point", [pt["latitude"] for pt in x["coords"]]),
+    }
+
+    return xr.Dataset(data_vars, coords=coords)
+
+
+def categorical_column(codes, values):
+    """
+    Dictionary encoded column of a table, the values are stored once
+
+    Parameters
+    ----------
+    codes: 1d numpy array of integer
+        The index of the values for each row
+    values: list
+        The values
+
+    Returns
+    -------
+    A pandas Categorical, or an object array if the values are not unique
+    """
+    values = list(values)
+    if len(set(values)) == len(values):
+        return pd.Categorical.from_codes(codes, categories=values)
+
+    return np.array(values, dtype=object)[codes]
+
+
+def table_output(df, output="dataframe"):
+    """
+    Return a table as a DataFrame or as a list of dictionaries (one by row)
+    """
+    if output == "dataframe":
+        return df
+    if output == "records":
+        return df.to_dict("records")
+
+    raise ArgumentError("'output' must be 'dataframe' or 'records'")
+
+
+def extracted_to_dataframe(x):
+    """
+    Convert extracted data to a long table
+
+    Parameters
+    ----------
+    x: dictionary
+        Output from extractRadarPolar, extractRadarGrid or extractRadarPolarV,
+        with output "list" or "array"
+
+    Returns
+    -------
+    A pandas DataFrame, one row by point, level and date (in this order),
+    the columns are the id, longitude and latitude of the points, "dates", the level
+    and the fields. The columns of the points are prefixed by "points_" when the
+    data contain the longitude and latitude of the gates (extractRadarPolar).
+    The points id and the dates are categorical columns.
+    The missing values are kept as in "x".
+    """
+    level, dates, levels, data = _as_arrays(x)
+    ndate, nlevel, npoint = len(dates), len(levels), len(x["coords"])
+
+    # the table is ordered by point, level and date,
+    # as the arrays (date x level x point) transposed
+    ip, il, idt = np.meshgrid(
+        np.arange(npoint), np.arange(nlevel), np.arange(ndate), indexing="ij"
+    )
+    ip, il, idt = ip.ravel(), il.ravel(), idt.ravel()
+
+    prefix = "points_" if "longitude" in data else ""
+    pt_lon = np.array([pt["longitude"] for pt in x["coords"]])
+    pt_lat = np.array([pt["latitude"] for pt in x["coords"]])
+
+    table = {
+        prefix + "id": categorical_column(ip, [pt["id"] for pt in x["coords"]]),
+        prefix + "longitude": pt_lon[ip],
+        prefix + "latitude": pt_lat[ip],
+        "dates": categorical_column(idt, dates),
+        level: levels[il],
+    }
+    for name, val in data.items():
+        table[name] = val.transpose(2, 1, 0).ravel()
+
+    return pd.DataFrame(table)
+
+
+def extracted_to_arrow(x):
+    """
+    Convert extracted data to a long pyarrow Table, see extracted_to_dataframe
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(extracted_to_dataframe(x), preserve_index=False)
+
+
+def write_extracted_parquet(x, path, **kwargs):
+    """
+    Write extracted data to Parquet, partitioned by day
+
+    Parameters
+    ----------
+    x: dictionary
+        Output from extractRadarPolar, extractRadarGrid or extractRadarPolarV
+    path: string
+        Full path to the root folder of the dataset
+    kwargs:
+        The other arguments of util.utilities.write_to_parquet
+    """
+    write_to_parquet(extracted_to_dataframe(x), path, **kwargs)
@@ -0,0 +1,240 @@
+import os
+import numpy as np
+from netCDF4 import Dataset as ncdf
+from ..util.parallel import iter_time_steps, StepError
+
+
+class NcTimeSeries:
+    """
+    NetCDF file containing a time series of 2d fields on a fixed lon/lat grid,
+    the time steps are appended along an unlimited "time" dimension.
+
+    Parameters
+    ----------
+    ncfile: string
+        Full path to the netCDF file. If the file exists, the time steps are appended to it,
+        its grid, time unit and variables must be the same as the data.
+    lon, lat: 1d numpy arrays
+        The longitude and latitude of the grid
+    time_unit: string
+        The unit of the time axis
+    variables: list of dictionary
+        The variables to write, format
+        [{"name": "rate", "long_name": "Precipitation rate", "units": "mm/hr",
+          "missing_value": -999.0}, {...}, ...]
+        "missing_value" is optional.
+    description: string
+        The global attribute description
+    chunksizes: tuple or None
+        The chunk shape (time, lat, lon) of the variables. Default None, (1, nlat, nlon)
+    complevel: integer
+        The zlib compression level, 0 to disable the compression. Default 6
+    """
+
+    def __init__(
+        self,
+        ncfile,
+        lon,
+        lat,
+        time_unit,
+        variables,
+        description="",
+        chunksizes=None,
+        complevel=6,
+    ):
+        self.ncfile = ncfile
+
+        if os.path.exists(ncfile):
+            self.ncout = ncdf(ncfile, mode="a")
+            nlon = len(self.ncout.dimensions["lon"])
+            nlat = len(self.ncout.dimensions["lat"])
+            nc_vars = set(self.ncout.variables) - {"time", "lat", "lon"}
+            msg = None
+            if nlon != len(lon) or nlat != len(lat):
+                msg = "The grid of " + ncfile + " differs from the data"
+            elif self.ncout.variables["time"].units != time_unit:
+                msg = "The time unit of " + ncfile + " differs from the data"
+            elif nc_vars != set(var["name"] for var in variables):
+                msg = "The variables of " + ncfile + " differ from the data"
+            if msg is not None:
+                self.ncout.close()
+                raise ValueError(msg)
+
+            times = self.ncout.variables["time"][:]
+            self.times = dict((t, it) for it, t in enumerate(times.tolist()))
+            self.last_time = times[-1] if len(times) > 0 else None
+            return
+
+        if chunksizes is None:
+            chunksizes = (1, len(lat), len(lon))
+
+        self.ncout = ncdf(ncfile, mode="w", format="NETCDF4")
+
+        # define axis size
+        self.ncout.createDimension("time", None)
+        self.ncout.createDimension("lat", len(lat))
+        self.ncout.createDimension("lon", len(lon))
+
+        # create time axis
+        time = self.ncout.createVariable("time", np.float64, ("time",))
+        time.long_name = "time"
+        time.units = time_unit
+        time.calendar = "standard"
+        time.axis = "T"
+
+        # create latitude axis
+        nc_lat = self.ncout.createVariable("lat", np.float32, ("lat"))
+        nc_lat.standard_name = "latitude"
+        nc_lat.long_name = "Latitude"
+        nc_lat.units = "degrees_north"
+        nc_lat.axis = "Y"
+        nc_lat[:] = lat
+
+        # create longitude axis
+        nc_lon = self.ncout.createVariable("lon", np.float32, ("lon"))
+        nc_lon.standard_name = "longitude"
+        nc_lon.long_name = "Longitude"
+        nc_lon.units = "degrees_east"
+        nc_lon.axis = "X"
+        nc_lon[:] = lon
+
+        # create variable
+        for var in variables:
+            var_field = self.ncout.createVariable(
+                var["name"],
+                np.float32,
+                ("time", "lat", "lon"),
+                zlib=complevel > 0,
+                complevel=max(complevel, 1),
+                chunksizes=chunksizes,
+            )
+            var_field.long_name = var["long_name"]
+            var_field.units = var["units"]
+            if "missing_value" in var:
+                var_field.missing_value = var["missing_value"]
+
+        # global attributes
+        self.ncout.description = description
+        self.times = dict()
+        self.last_time = None
+
+    def append(self, time_value, data):
+        """
+        Write one time step
+
+        Parameters
+        ----------
+        time_value: float
+            The value of the time
+        data: dictionary
+            The 2d numpy arrays (lat x lon) to write, the keys are the names of the variables.
+            A time step already in the file is overwritten.
+
+        The time axis is kept sorted, a ValueError is raised for a new time step
+        earlier than the last time step of the file.
+        """
+        it = self.times.get(time_value)
+        if it is None:
+            if self.last_time is not None and time_value < self.last_time:
+                raise ValueError(
+                    "The time " + str(time_value) + " is earlier than the last time of " + self.ncfile
+                )
+            it = len(self.times)
+            self.times[time_value] = it
+            self.last_time = time_value
+            self.ncout.variables["time"][it] = time_value
+
+        for name in data:
+            self.ncout.variables[name][it, :, :] = data[name]
+
+    def close(self):
+        self.ncout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def run_time_series(
+    fun,
+    seqTime,
+    out_ncfile,
+    description,
+    chunksizes=None,
+    complevel=6,
+    workers=1,
+    chunksize=1,
+    errors="raise",
+):
+    """
+    Compute the time steps and append them to aggregated netCDF files
+
+    Parameters
+    ----------
+    fun: callable
+        A function taking one time step as argument and returning None (no data) or a dictionary
+        {"lon": 1d array, "lat": 1d array, "time": {"format": .., "value": .., "unit": ..},
+         "variables": [{"name": .., "long_name": .., "units": .., "data": 2d array (lat x lon)}, ...]}
+    seqTime: list
+        List of the time steps
+    out_ncfile: callable
+        A function taking the time format "%Y%m%d%H%M%S" of a step and returning
+        the full path to the netCDF file where to write it
+    description: string
+        The global attribute description of the netCDF files
+    chunksizes: tuple or None
+        The chunk shape (time, lat, lon) of the variables. Default None, (1, nlat, nlon)
+    complevel: integer
+        The zlib compression level. Default 6
+    workers, chunksize: integer
+        See util.parallel.run_time_steps
+    errors: string
+        See util.parallel.run_time_steps, the time steps with an error are not written
+
+    Returns
+    -------
+    The list of the netCDF files written.
+    """
+    writer = None
+    ncfiles = []
+
+    try:
+        # the steps are computed by a single pool and written
+        # in the current process in the order of seqTime
+        for res in iter_time_steps(
+            fun, seqTime, workers=workers, chunksize=chunksize, errors=errors
+        ):
+            if isinstance(res, StepError) or not bool(res):
+                continue
+
+            ncfile = out_ncfile(res["time"]["format"])
+            if writer is None or writer.ncfile != ncfile:
+                if writer is not None:
+                    writer.close()
+
+                variables = [
+                    dict((k, v) for k, v in var.items() if k != "data")
+                    for var in res["variables"]
+                ]
+                writer = NcTimeSeries(
+                    ncfile,
+                    res["lon"],
+                    res["lat"],
+                    res["time"]["unit"],
+                    variables,
+                    description,
+                    chunksizes,
+                    complevel,
+                )
+                if ncfile not in ncfiles:
+                    ncfiles.append(ncfile)
+
+            data = dict((var["name"], var["data"]) for var in res["variables"])
+            writer.append(res["time"]["value"], data)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return ncfiles
@@ -0,0 +1,327 @@
+import os
+import re
+import numpy as np
+
+_BUCKET_FILE = re.compile(r"^w\d+_b\d+_g\d+\.npz$")
+
+
+class _RollingSum:
+    """
+    Rolling sum of grids over a time window, the grids are added to buckets
+    of a ring buffer and the expired buckets are subtracted from the total.
+    """
+
+    def __init__(self, window, bucket, shape):
+        self.window = window
+        self.bucket = bucket
+        self.nbucket = int(window // bucket)
+        self.ring = np.zeros((self.nbucket,) + shape, dtype=np.float32)
+        self.ids = np.full(self.nbucket, -1, dtype=np.int64)
+        self.seconds = np.zeros(self.nbucket, dtype=np.float64)
+        self.total = np.zeros(shape, dtype=np.float64)
+        self.last_id = -1
+        self.nupdate = 0
+        # buckets modified since the last checkpoint
+        self.dirty = set()
+
+    def _clear(self, i):
+        self.total -= self.ring[i]
+        self.ring[i] = 0.0
+        self.seconds[i] = 0.0
+        self.ids[i] = -1
+        self.dirty.add(i)
+
+    def add(self, time, amount, dt):
+        bid = int(time // self.bucket)
+        if bid <= self.last_id - self.nbucket:
+            # older than the window
+            return
+
+        if bid > self.last_id:
+            # expire the buckets between the last one and the new one
+            nexp = min(bid - self.last_id, self.nbucket)
+            for b in range(bid - nexp + 1, bid + 1):
+                i = b % self.nbucket
+                if self.ids[i] != -1:
+                    self._clear(i)
+            self.last_id = bid
+
+        i = bid % self.nbucket
+        self.ids[i] = bid
+        self.ring[i] += amount
+        self.seconds[i] += dt
+        self.total += amount
+        self.dirty.add(i)
+
+        # recompute the total from the ring from time to time,
+        # to remove the rounding errors of the additions and subtractions
+        self.nupdate += 1
+        if self.nupdate >= self.nbucket:
+            self.total = self.ring.sum(axis=0, dtype=np.float64)
+            self.nupdate = 0
+
+    def state(self, prefix):
+        # the state without the ring, saved separately by bucket
+        return {
+            prefix + "ids": self.ids,
+            prefix + "seconds": self.seconds,
+            prefix + "last_id": np.array(self.last_id),
+        }
+
+    def set_state(self, state, prefix):
+        self.ids = state[prefix + "ids"]
+        self.seconds = state[prefix + "seconds"]
+        self.last_id = int(state[prefix + "last_id"])
+
+    def update_total(self):
+        self.total = self.ring.sum(axis=0, dtype=np.float64)
+        self.nupdate = 0
+        self.dirty = set()
+
+
+class PrecipAccumulator:
+    """
+    Running precipitation accumulations over several time windows
+
+    The accumulations are updated incrementally for each new scan, the precipitation
+    of the scan is added and the precipitation older than the window is removed.
+    The precipitation of a scan is its rate multiplied by the time since the previous
+    scan, up to "max_gap" seconds, so the missing scans are filled by the rate of the
+    next available scan and the longer gaps are left out of the accumulation.
+
+    Parameters
+    ----------
+    windows: list
+        The accumulation windows in seconds. Default [3600, 10800, 86400], 1h, 3h and 24h
+    step: integer
+        The nominal time between two scans in seconds. Default 300
+    max_gap: integer
+        The maximum time in seconds filled by the rate of one scan. Default 900
+    bucket: dictionary or None
+        The time resolution in seconds of the ring buffer of each window, the keys are the windows.
+        Default None, "step" for all the windows. A coarser bucket uses less memory, e.g. {86400: 3600}
+        keeps 24 grids instead of 288 for the 24h window, but the window then moves by whole buckets,
+        the 24h accumulation covers the last 23 hours and the current hour.
+    checkpoint: string or None
+        Full path to a folder where to save the state, and from which the state
+        is restored if it exists. Default None
+    checkpoint_every: integer
+        Number of scans between two saves of the state. Default 1, after each scan.
+        After a restart, the scans following the last save can be added again.
+
+    Each bucket of the ring buffers is saved in its own compressed file, and only
+    the buckets modified since the last save are written, one bucket per window and scan
+    instead of the whole ring buffers (336 grids with the default windows and step).
+    The files of a save are listed in the file "state.npz", replaced once all
+    the buckets are written, the state is restored from the last complete save.
+    """
+
+    def __init__(
+        self,
+        windows=[3600, 10800, 86400],
+        step=300,
+        max_gap=900,
+        bucket=None,
+        checkpoint=None,
+        checkpoint_every=1,
+    ):
+        self.windows = list(windows)
+        self.step = step
+        self.max_gap = max_gap
+        self.bucket = dict()
+        for w in self.windows:
+            if bucket is not None and w in bucket:
+                self.bucket[w] = bucket[w]
+            else:
+                self.bucket[w] = step
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+
+        self.lon = None
+        self.lat = None
+        self.last_time = None
+        self._sums = None
+        # the folder and the files of the last save or load
+        self._saved_to = None
+        self._files = dict()
+        self._generation = 0
+        self._unsaved = 0
+
+        if checkpoint is not None and os.path.exists(
+            os.path.join(checkpoint, "state.npz")
+        ):
+            self.load(checkpoint)
+
+    def _init_grid(self, lon, lat):
+        self.lon = np.asarray(lon)
+        self.lat = np.asarray(lat)
+        shape = (len(self.lat), len(self.lon))
+        self._sums = dict(
+            (w, _RollingSum(w, self.bucket[w], shape)) for w in self.windows
+        )
+
+    def add(self, time, rate, lon, lat):
+        """
+        Add the precipitation rate of one scan
+
+        Parameters
+        ----------
+        time: float
+            The time of the scan, seconds since 1970-01-01
+        rate: 2d numpy (masked) array
+            The precipitation rate in mm/hr (lat x lon), the masked values are set to 0
+        lon, lat: 1d numpy arrays
+            The coordinates of the grid
+        """
+        if self._sums is None:
+            self._init_grid(lon, lat)
+
+        if self.last_time is None:
+            dt = self.step
+        else:
+            dt = time - self.last_time
+            if dt <= 0:
+                print("Scan time not after the last scan, skipped.")
+                return
+            dt = min(dt, self.max_gap)
+
+        rate = np.ma.filled(np.ma.masked_invalid(rate), 0.0)
+        amount = rate.astype(np.float32) * np.float32(dt / 3600.0)
+
+        for w in self.windows:
+            self._sums[w].add(time, amount, dt)
+
+        self.last_time = time
+        self._unsaved += 1
+
+        if self.checkpoint is not None and self._unsaved >= self.checkpoint_every:
+            self.save(self.checkpoint)
+
+    def add_qpe(self, qpe):
+        """
+        Add the output of api.qpe_cappi.compute_cappi_qpe
+        """
+        if not bool(qpe):
+            return
+
+        self.add(
+            qpe["time"]["value"], qpe["qpe"]["rate"]["data"], qpe["lon"], qpe["lat"]
+        )
+
+    def accumulation(self, window):
+        """
+        Get the accumulation over a window
+
+        Returns
+        -------
+        A dictionary
+            data: 2d numpy array, the precipitation accumulation in mm (lat x lon)
+            coverage: float, the fraction of the window covered by the scans
+        """
+        rsum = self._sums[window]
+        data = np.maximum(rsum.total, 0.0).astype(np.float32)
+        coverage = min(rsum.seconds.sum() / window, 1.0)
+
+        return {"data": data, "coverage": coverage}
+
+    def save(self, checkpoint=None):
+        """
+        Save the state of the accumulator to a folder, only the buckets modified
+        since the last save to this folder are written
+
+        Parameters
+        ----------
+        checkpoint: string or None
+            Full path to the folder. Default None, the folder given at the creation
+        """
+        if checkpoint is None:
+            checkpoint = self.checkpoint
+        if self._sums is None or checkpoint is None:
+            return
+
+        os.makedirs(checkpoint, exist_ok=True)
+        full = self._saved_to != os.path.abspath(checkpoint)
+        generation = self._generation + 1
+
+        # new files for the modified buckets, the previous files are
+        # still listed in the current state file until it is replaced
+        files = dict(self._files) if not full else dict()
+        for w in self.windows:
+            rsum = self._sums[w]
+            slots = range(rsum.nbucket) if full else sorted(rsum.dirty)
+            for i in slots:
+                if rsum.ids[i] == -1:
+                    files.pop((w, i), None)
+                    continue
+                name = "w{}_b{}_g{}.npz".format(w, i, generation)
+                np.savez_compressed(os.path.join(checkpoint, name), ring=rsum.ring[i])
+                files[(w, i)] = name
+
+        state = {
+            "windows": np.array(self.windows),
+            "buckets": np.array([self.bucket[w] for w in self.windows]),
+            "lon": self.lon,
+            "lat": self.lat,
+            "last_time": np.array(self.last_time),
+            "generation": np.array(generation),
+        }
+        for w in self.windows:
+            prefix = "w" + str(w) + "_"
+            state.update(self._sums[w].state(prefix))
+            state[prefix + "files"] = np.array(
+                [files.get((w, i), "") for i in range(self._sums[w].nbucket)]
+            )
+
+        # write to a temporary file first, a crash while writing
+        # must not destroy the last checkpoint
+        state_file = os.path.join(checkpoint, "state.npz")
+        tmp = state_file + "." + str(os.getpid()) + ".tmp.npz"
+        np.savez_compressed(tmp, **state)
+        os.replace(tmp, state_file)
+
+        self._remove_unused(checkpoint, files)
+        for w in self.windows:
+            self._sums[w].dirty = set()
+        self._saved_to = os.path.abspath(checkpoint)
+        self._files = files
+        self._generation = generation
+        self._unsaved = 0
+
+    def _remove_unused(self, checkpoint, files):
+        used = set(files.values())
+        for name in os.listdir(checkpoint):
+            if _BUCKET_FILE.match(name) and name not in used:
+                os.remove(os.path.join(checkpoint, name))
+
+    def load(self, checkpoint):
+        """
+        Restore the state of the accumulator from a folder
+        """
+        with np.load(os.path.join(checkpoint, "state.npz")) as state:
+            windows = state["windows"].tolist()
+            buckets = state["buckets"].tolist()
+            if windows != self.windows or buckets != [
+                self.bucket[w] for w in self.windows
+            ]:
+                raise ValueError("The windows of " + checkpoint + " differ")
+
+            self._init_grid(state["lon"], state["lat"])
+            self.last_time = state["last_time"].item()
+            generation = int(state["generation"])
+            files = dict()
+            for w in self.windows:
+                prefix = "w" + str(w) + "_"
+                rsum = self._sums[w]
+                rsum.set_state(state, prefix)
+                for i, name in enumerate(state[prefix + "files"].tolist()):
+                    if name == "":
+                        continue
+                    with np.load(os.path.join(checkpoint, name)) as bucket:
+                        rsum.ring[i] = bucket["ring"]
+                    files[(w, i)] = name
+                rsum.update_total()
+
+        self._saved_to = os.path.abspath(checkpoint)
+        self._files = files
+        self._generation = generation
+        self._unsaved = 0
@@ -44,7 +44,12 @@ def compute_cappi_qpe(dirDate, time, pars):
     if pars["apply_cmd"]:
         radar = applyCMDQPE(radar)
 
-    rlon, rlat, data = createCAPPIQPE(radar, pars["cappi"])
+    rlon, rlat, data = createCAPPIQPE(
+        radar,
+        pars["cappi"],
+        pars.get("backend", "R"),
+        pars.get("grid_mapping", False),
+    )
     rtime = radarPolarTimeInfo(radar, pars["time_zone"])
 
     if pars["qpe"]["method"] in ["RATE_Z", "RATE_ZPOLY", "RATE_Z_ZDR"]:
@@ -115,7 +120,7 @@ def computeQPE(data, pars_qpe):
     return qpe
 
 
-def createCAPPIQPE(radar, pars_cappi):
+def createCAPPIQPE(radar, pars_cappi, backend="R", grid_mapping=False):
     """
     pars_cappi = {
                 'method': 'ppi_ranges',
@@ -135,7 +140,9 @@ def createCAPPIQPE(radar, pars_cappi):
     else:
         param_cappi = pars_cappi["pars"]["alt"]
 
-    return create_cappi_grid(radar, fields_u, method, param_cappi)
+    return create_cappi_grid(
+        radar, fields_u, method, param_cappi, backend, grid_mapping
+    )
 
 
 def maskDBZthres(data, dbz_thres):
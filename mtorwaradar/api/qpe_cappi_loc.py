@@ -1,9 +1,14 @@
 import os
+import copy
 import numpy as np
 import datetime
+import functools
 from dateutil import tz
 from netCDF4 import Dataset as ncdf
 from .qpe_cappi import compute_cappi_qpe
+from ..util.parallel import run_time_steps
+from ..util.utilities import ArgumentError
+from .ncdf_series import run_time_series
 
 
 def computeCAPPIQPE(
@@ -21,7 +26,139 @@ def computeCAPPIQPE(
     pia=None,
     filter=None,
     time_zone="Africa/Kigali",
+    backend="R",
+    workers=1,
+    chunksize=1,
+    output="step",
+    nc_chunksizes=None,
+    complevel=6,
+    errors="raise",
+    grid_mapping=False,
 ):
+    if output not in ("step", "series", "daily"):
+        raise ArgumentError("'output' must be 'step', 'series' or 'daily'")
+
+    pars = _qpe_pars(
+        cappi, qpe, dbz_thres, apply_cmd, pia, filter, time_zone, backend, grid_mapping
+    )
+
+    #######
+
+    start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
+    end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
+    start = start.replace(tzinfo=tz.gettz(time_zone))
+    end = end.replace(tzinfo=tz.gettz(time_zone))
+
+    time_range = end - start
+    nb_seconds = time_range.days * 86400 + time_range.seconds + 300
+    seqTime = [start + datetime.timedelta(seconds=x) for x in range(0, nb_seconds, 300)]
+
+    if time_zone != "UTC":
+        seqTime = [x.astimezone(tz.gettz("UTC")) for x in seqTime]
+
+    seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
+
+    if output != "step":
+        start_end = start.strftime("%Y%m%d%H%M") + "_" + end.strftime("%Y%m%d%H%M")
+
+        def out_ncfile(time_format):
+            if output == "daily":
+                return os.path.join(dirOUT, "precip_" + time_format[:8] + ".nc")
+            else:
+                return os.path.join(dirOUT, "precip_" + start_end + ".nc")
+
+        fun = functools.partial(
+            _compute_cappi_qpe_step, dirMdvDate=dirMdvDate, pars=pars
+        )
+        run_time_series(
+            fun,
+            seqTime,
+            out_ncfile,
+            "Quantitative Precipitation Estimation",
+            chunksizes=nc_chunksizes,
+            complevel=complevel,
+            workers=workers,
+            chunksize=chunksize,
+            errors=errors,
+        )
+        return None
+
+    fun = functools.partial(
+        _compute_cappi_qpe_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        pars=pars,
+        complevel=complevel,
+    )
+    run_time_steps(fun, seqTime, workers=workers, chunksize=chunksize, errors=errors)
+
+
+def qpe_product(
+    dirMdvDate,
+    dirOUT,
+    cappi={
+        "method": "composite_altitude",
+        "pars": {"fun": "maximum", "min_alt": 1.7, "max_alt": 15},
+    },
+    qpe={"method": "RATE_Z", "pars": {"alpha": 300, "beta": 1.4, "invCoef": False}},
+    dbz_thres={"min": 20, "max": 65},
+    apply_cmd=True,
+    pia=None,
+    filter=None,
+    time_zone="Africa/Kigali",
+    backend="R",
+    complevel=6,
+    grid_mapping=False,
+):
+    """
+    Create the step function of the QPE, to register to util.watcher.MdvWatcher
+    or to use with util.parallel.run_time_steps
+
+    Parameters
+    ----------
+    dirMdvDate, dirOUT, cappi, qpe, dbz_thres, apply_cmd, pia, filter,
+    time_zone, backend, complevel:
+        See computeCAPPIQPE
+    grid_mapping: boolean
+        Reuse the gate to grid mapping of the scan geometry for the 'one_altitude'
+        and 'composite_altitude' methods, see qpe.create_cappi.create_cappi_grid. Default False
+
+    Returns
+    -------
+    A picklable function taking the time "yyyy-mm-dd-HH-MM" (UTC) of a volume,
+    writing the file "precip_<time>.nc" to dirOUT as computeCAPPIQPE with output "step"
+    and returning its full path, or None when there is no data
+    """
+    pars = _qpe_pars(
+        cappi, qpe, dbz_thres, apply_cmd, pia, filter, time_zone, backend, grid_mapping
+    )
+
+    return functools.partial(
+        _compute_cappi_qpe_time,
+        dirMdvDate=dirMdvDate,
+        dirOUT=dirOUT,
+        pars=pars,
+        complevel=complevel,
+    )
+
+
+def _qpe_pars(
+    cappi,
+    qpe,
+    dbz_thres,
+    apply_cmd,
+    pia,
+    filter,
+    time_zone,
+    backend,
+    grid_mapping=False,
+):
+    # the parameters of compute_cappi_qpe, completed with the default values
+    cappi = copy.deepcopy(cappi)
+    qpe = copy.deepcopy(qpe)
+    pia = copy.deepcopy(pia)
+    filter = copy.deepcopy(filter)
+
     #######
     if pia is not None:
         if pia["method"] == "kdp":
@@ -180,104 +317,130 @@ def computeCAPPIQPE(
 
     qpe["pars"] = qpe_pars
 
-    #######
-
-    start = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M")
-    end = datetime.datetime.strptime(end_time, "%Y-%m-%d %H:%M")
-    start = start.replace(tzinfo=tz.gettz(time_zone))
-    end = end.replace(tzinfo=tz.gettz(time_zone))
-
-    time_range = end - start
-    nb_seconds = time_range.days * 86400 + time_range.seconds + 300
-    seqTime = [start + datetime.timedelta(seconds=x) for x in range(0, nb_seconds, 300)]
-
-    if time_zone != "UTC":
-        seqTime = [x.astimezone(tz.gettz("UTC")) for x in seqTime]
-
-    seqTime = [x.strftime("%Y-%m-%d-%H-%M") for x in seqTime]
-
-    for time in seqTime:
-        pars = {
-            "cappi": cappi,
-            "qpe": qpe,
-            "dbz_thres": dbz_thres,
-            "pia": pia,
-            "filter": filter,
-            "apply_cmd": apply_cmd,
-            "time_zone": time_zone,
-        }
-
-        data = compute_cappi_qpe(dirMdvDate, time, pars)
-        if not bool(data):
-            print("No data, time:" + time + time_zone)
-            continue
-
-        # open a netCDF file to write
-        out_ncfile = os.path.join(dirOUT, "precip_" + data["time"]["format"] + ".nc")
-        ncout = ncdf(out_ncfile, mode="w", format="NETCDF4")
-
-        # define axis size
-        ncout.createDimension("time", 1)
-        ncout.createDimension("lat", len(data["lat"]))
-        ncout.createDimension("lon", len(data["lon"]))
-
-        # create time axis
-        time = ncout.createVariable("time", np.float64, ("time",))
-        time.long_name = "time"
-        time.units = data["time"]["unit"]
-        time.calendar = "standard"
-        time.axis = "T"
-        time[:] = data["time"]["value"]
-
-        # create latitude axis
-        lat = ncout.createVariable("lat", np.float32, ("lat"))
-        lat.standard_name = "latitude"
-        lat.long_name = "Latitude"
-        lat.units = "degrees_north"
-        lat.axis = "Y"
-        lat[:] = data["lat"]
-
-        # create longitude axis
-        lon = ncout.createVariable("lon", np.float32, ("lon"))
-        lon.standard_name = "longitude"
-        lon.long_name = "Longitude"
-        lon.units = "degrees_east"
-        lon.axis = "X"
-        lon[:] = data["lon"]
-
-        # create variable
-        rate = ncout.createVariable(
-            data["qpe"]["rate"]["name"],
-            np.float32,
-            ("time", "lat", "lon"),
-            zlib=True,
-            complevel=6,
-        )
-        rate.long_name = data["qpe"]["rate"]["long_name"]
-        rate.units = data["qpe"]["rate"]["unit"]
-        rr_rate = data["qpe"]["rate"]["data"]
-        rate[0, :, :] = rr_rate.filled(fill_value=0.0)
-
-        precip = ncout.createVariable(
-            data["qpe"]["precip"]["name"],
-            np.float32,
-            ("time", "lat", "lon"),
-            zlib=True,
-            complevel=6,
-        )
-        precip.long_name = data["qpe"]["precip"]["long_name"]
-        precip.units = data["qpe"]["precip"]["unit"]
-        rr_precip = data["qpe"]["precip"]["data"]
-        precip[0, :, :] = rr_precip.filled(fill_value=0.0)
-
-        # global attributes
-        ncout.description = "Quantitative Precipitation Estimation"
-        ncout.close()
-
-        print(
-            "Computing QPE, time: "
-            + data["time"]["format"]
-            + " "
-            + time_zone
-            + " done."
+    pars = {
+        "cappi": cappi,
+        "qpe": qpe,
+        "dbz_thres": dbz_thres,
+        "pia": pia,
+        "filter": filter,
+        "apply_cmd": apply_cmd,
+        "time_zone": time_zone,
+        "backend": backend,
+        "grid_mapping": grid_mapping,
+    }
+
+    return pars
+
+
+def _compute_cappi_qpe_time(time, dirMdvDate, dirOUT, pars, complevel=6):
+    time_zone = pars["time_zone"]
+    data = compute_cappi_qpe(dirMdvDate, time, copy.deepcopy(pars))
+    if not bool(data):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    # open a netCDF file to write
+    out_ncfile = os.path.join(dirOUT, "precip_" + data["time"]["format"] + ".nc")
+    ncout = ncdf(out_ncfile, mode="w", format="NETCDF4")
+
+    # define axis size
+    ncout.createDimension("time", 1)
+    ncout.createDimension("lat", len(data["lat"]))
+    ncout.createDimension("lon", len(data["lon"]))
+
+    # create time axis
+    time = ncout.createVariable("time", np.float64, ("time",))
+    time.long_name = "time"
+    time.units = data["time"]["unit"]
+    time.calendar = "standard"
+    time.axis = "T"
+    time[:] = data["time"]["value"]
+
+    # create latitude axis
+    lat = ncout.createVariable("lat", np.float32, ("lat"))
+    lat.standard_name = "latitude"
+    lat.long_name = "Latitude"
+    lat.units = "degrees_north"
+    lat.axis = "Y"
+    lat[:] = data["lat"]
+
+    # create longitude axis
+    lon = ncout.createVariable("lon", np.float32, ("lon"))
+    lon.standard_name = "longitude"
+    lon.long_name = "Longitude"
+    lon.units = "degrees_east"
+    lon.axis = "X"
+    lon[:] = data["lon"]
+
+    # create variable
+    rate = ncout.createVariable(
+        data["qpe"]["rate"]["name"],
+        np.float32,
+        ("time", "lat", "lon"),
+        zlib=True,
+        complevel=complevel,
+    )
+    rate.long_name = data["qpe"]["rate"]["long_name"]
+    rate.units = data["qpe"]["rate"]["unit"]
+    rr_rate = data["qpe"]["rate"]["data"]
+    rate[0, :, :] = rr_rate.filled(fill_value=0.0)
+
+    precip = ncout.createVariable(
+        data["qpe"]["precip"]["name"],
+        np.float32,
+        ("time", "lat", "lon"),
+        zlib=True,
+        complevel=complevel,
+    )
+    precip.long_name = data["qpe"]["precip"]["long_name"]
+    precip.units = data["qpe"]["precip"]["unit"]
+    rr_precip = data["qpe"]["precip"]["data"]
+    precip[0, :, :] = rr_precip.filled(fill_value=0.0)
+
+    # global attributes
+    ncout.description = "Quantitative Precipitation Estimation"
+    ncout.close()
+
+    print(
+        "Computing QPE, time: "
+        + data["time"]["format"]
+        + " "
+        + time_zone
+        + " done."
+    )
+
+    return out_ncfile
+
+
+def _compute_cappi_qpe_step(time, dirMdvDate, pars):
+    time_zone = pars["time_zone"]
+    data = compute_cappi_qpe(dirMdvDate, time, copy.deepcopy(pars))
+    if not bool(data):
+        print("No data, time:" + time + time_zone)
+        return None
+
+    variables = list()
+    for qpe in ["rate", "precip"]:
+        variables.append(
+            {
+                "name": data["qpe"][qpe]["name"],
+                "long_name": data["qpe"][qpe]["long_name"],
+                "units": data["qpe"][qpe]["unit"],
+                "data": data["qpe"][qpe]["data"].filled(fill_value=0.0),
+            }
         )
+
+    print(
+        "Computing QPE, time: "
+        + data["time"]["format"]
+        + " "
+        + time_zone
+        + " done."
+    )
+
+    return {
+        "lon": data["lon"],
+        "lat": data["lat"],
+        "time": data["time"],
+        "variables": variables,
+    }
@@ -0,0 +1,256 @@
+import os
+import json
+import datetime
+import numpy as np
+from dateutil import tz
+from netCDF4 import Dataset as ncdf
+
+
+def qvp_params(
+    fields, desired_angle=15.0, sweep_only=False, percentiles=None, count=False
+):
+    """
+    The parameters of the profiles of a QvpStore, in a comparable form.
+    The percentiles and the count are only computed with "sweep_only".
+
+    Returns
+    -------
+    A dictionary with keys fields (sorted), desired_angle, sweep_only,
+    percentiles (sorted or None) and count
+    """
+    if isinstance(fields, str):
+        fields = [fields]
+    sweep_only = bool(sweep_only)
+    if not sweep_only or percentiles is None or len(percentiles) == 0:
+        percentiles = None
+    else:
+        percentiles = sorted(float(p) for p in percentiles)
+
+    return {
+        "fields": sorted(fields),
+        "desired_angle": float(desired_angle),
+        "sweep_only": sweep_only,
+        "percentiles": percentiles,
+        "count": sweep_only and bool(count),
+    }
+
+
+class QvpStore:
+    """
+    NetCDF file containing a time-height series of QVP profiles,
+    the profiles are appended along an unlimited "time" dimension.
+
+    Parameters
+    ----------
+    ncfile: string
+        Full path to the netCDF file. If the file exists, the profiles are appended to it.
+    time_zone: string
+        The time zone of the times of the profiles. Default "Africa/Kigali"
+    complevel: integer
+        The zlib compression level, 0 to disable the compression. Default 6
+    params: dictionary or None
+        The parameters of the profiles, keys "fields", "desired_angle", "sweep_only",
+        "percentiles" and "count" (see createQVP). They are written as global attributes
+        of a new file, and a ValueError is raised if they differ from the parameters of
+        an existing file. Default None, not checked
+    """
+
+    def __init__(self, ncfile, time_zone="Africa/Kigali", complevel=6, params=None):
+        self.ncfile = ncfile
+        self.time_zone = time_zone
+        self.complevel = complevel
+        self.params = None if params is None else qvp_params(**params)
+        self.ncout = None
+        self.times = []
+        self.mdv_times = []
+        # index of the profiles in the file by time
+        self._index = dict()
+
+        if os.path.exists(ncfile):
+            self.ncout = ncdf(ncfile, mode="a")
+            self.time_zone = self.ncout.time_zone
+            self.times = [self._format(t) for t in self.ncout.variables["time"][:]]
+            self.mdv_times = list(self.ncout.variables["mdv_time"][:])
+            self._index = dict((t, i) for i, t in enumerate(self.times))
+            self._check_params()
+
+    def _format(self, value):
+        t = datetime.datetime.fromtimestamp(float(value), tz.gettz(self.time_zone))
+        return t.strftime("%Y%m%d%H%M%S")
+
+    def _value(self, time_format):
+        t = datetime.datetime.strptime(time_format, "%Y%m%d%H%M%S")
+        return t.replace(tzinfo=tz.gettz(self.time_zone)).timestamp()
+
+    def _check_params(self):
+        if self.params is None:
+            return
+
+        stored = dict()
+        for key in self.params:
+            attr = "qvp_" + key
+            if attr in self.ncout.ncattrs():
+                stored[key] = json.loads(self.ncout.getncattr(attr))
+
+        if len(stored) == 0 and len(self.times) == 0:
+            self._write_params()
+            return
+
+        differ = [k for k in self.params if stored.get(k) != self.params[k]]
+        if len(differ) > 0:
+            msg = ", ".join(
+                k
+                + " "
+                + json.dumps(stored.get(k))
+                + " (requested "
+                + json.dumps(self.params[k])
+                + ")"
+                for k in differ
+            )
+            raise ValueError("The parameters of " + self.ncfile + " differ: " + msg)
+
+    def _write_params(self):
+        if self.params is None:
+            return
+
+        for key, val in self.params.items():
+            self.ncout.setncattr("qvp_" + key, json.dumps(val))
+
+    def _create(self, nrange):
+        self.ncout = ncdf(self.ncfile, mode="w", format="NETCDF4")
+        self.ncout.createDimension("time", None)
+        self.ncout.createDimension("range", nrange)
+
+        time = self.ncout.createVariable("time", np.float64, ("time",))
+        time.long_name = "time"
+        time.units = "seconds since 1970-01-01 00:00:00"
+        time.calendar = "standard"
+        time.axis = "T"
+
+        mdv_time = self.ncout.createVariable("mdv_time", str, ("time",))
+        mdv_time.long_name = "Time of the MDV file, format %Y%m%d%H%M%S (UTC)"
+
+        elev = self.ncout.createVariable("elevation", np.float32, ("time",))
+        elev.long_name = "Elevation angle"
+        elev.units = "degrees"
+
+        self._create_variable("height", "Height of the gates above the radar", "m")
+
+        self.ncout.description = "Quasi-vertical profiles"
+        self.ncout.time_zone = self.time_zone
+        self._write_params()
+
+    def _create_variable(self, name, long_name, units):
+        var = self.ncout.createVariable(
+            name,
+            np.float32,
+            ("time", "range"),
+            zlib=self.complevel > 0,
+            complevel=max(self.complevel, 1),
+            chunksizes=(1, len(self.ncout.dimensions["range"])),
+            fill_value=-9999.0,
+        )
+        var.long_name = long_name
+        var.units = units
+
+    def append(self, qvp):
+        """
+        Write profiles, a profile already in the file is overwritten
+
+        Parameters
+        ----------
+        qvp: dictionary or list of dictionaries
+            Output from createQVP or create_qvp_data
+        """
+        if isinstance(qvp, dict):
+            qvp = [qvp]
+
+        for q in qvp:
+            if not bool(q):
+                continue
+
+            nrange = len(q["height"])
+            if self.ncout is None:
+                self._create(nrange)
+            elif len(self.ncout.dimensions["range"]) != nrange:
+                raise ValueError("The number of gates of " + self.ncfile + " differs")
+
+            it = self._index.get(q["time"])
+            if it is None:
+                it = len(self.times)
+                self._index[q["time"]] = it
+                self.times.append(q["time"])
+                self.mdv_times.append(q.get("mdv_time", ""))
+                self.ncout.variables["time"][it] = self._value(q["time"])
+                self.ncout.variables["mdv_time"][it] = q.get("mdv_time", "")
+
+            self.ncout.variables["elevation"][it] = q["elevation"]
+            self.ncout.variables["height"][it, :] = q["height"]
+            for name, val in q["data"].items():
+                if name not in self.ncout.variables:
+                    self._create_variable(name, name, "")
+                self.ncout.variables[name][it, :] = val
+
+        self.ncout.sync()
+
+    def read(self, start=None, end=None):
+        """
+        Read the profiles
+
+        Parameters
+        ----------
+        start, end: string or None
+            The first and last times to read, format "%Y%m%d%H%M%S". Default None, all the profiles
+
+        Returns
+        -------
+        A list of dictionaries sorted by time, as the output of createQVP
+        """
+        if self.ncout is None:
+            return []
+
+        exclude = ["time", "mdv_time", "elevation", "height"]
+        names = [v for v in self.ncout.variables if v not in exclude]
+
+        index = [
+            i
+            for i, t in enumerate(self.times)
+            if (start is None or t >= start) and (end is None or t <= end)
+        ]
+        index = sorted(index, key=lambda i: self.times[i])
+        if len(index) == 0:
+            return []
+
+        # read only the block of the file containing the profiles
+        i0 = min(index)
+        i1 = max(index) + 1
+        elev = self.ncout.variables["elevation"][i0:i1]
+        height = self.ncout.variables["height"][i0:i1, :]
+        data = dict((name, self.ncout.variables[name][i0:i1, :]) for name in names)
+
+        out = list()
+        for i in index:
+            q = {
+                "time": self.times[i],
+                "elevation": float(elev[i - i0]),
+                "height": np.ma.filled(height[i - i0], np.nan),
+                "data": dict(
+                    (name, np.ma.masked_array(data[name][i - i0])) for name in names
+                ),
+            }
+            if self.mdv_times[i] != "":
+                q["mdv_time"] = self.mdv_times[i]
+            out.append(q)
+
+        return out
+
+    def close(self):
+        if self.ncout is not None:
+            self.ncout.close()
+            self.ncout = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
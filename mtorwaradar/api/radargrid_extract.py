@@ -5,13 +5,8 @@ from dateutil import tz
 import pyart
 
 from .radargrid_data import *
-from ..util.utilities import rFloatVector_to_npmDarray
-
-import rpy2.robjects as robjects
-import rpy2.robjects.vectors as rvect
-from rpy2.robjects.packages import importr
-
-mtrwdata = importr("mtorwdata")
+from ..util.interpolation import extract_3DGridData
+from .extract_output import new_extracted_arrays, extracted_output
 
 
 def extract_grid_data(
@@ -25,6 +20,8 @@ def extract_grid_data(
     padxyz=[0, 0, 0],
     fun_sp="mean",
     time_zone="Africa/Kigali",
+    backend="R",
+    output="list",
 ):
     """
     Extract radar Cartesian data over a given points.
@@ -54,6 +51,13 @@ def extract_grid_data(
     time_zone: string
         The time zone of "start_time", "end_time" and the output extracted data.
         Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    backend: string
+        Extraction backend, "R" (package mtorwdata) or "python". Default "R"
+    output: string
+        "list": the fields are 3d lists, the missing values are -9999.
+        "array": the fields are 3d numpy arrays, the missing values are NaN.
+        "xarray": a xarray Dataset, see api.extract_output.extracted_to_xarray.
+        Default "list"
 
     Returns
     -------
@@ -117,59 +121,36 @@ def extract_grid_data(
     )
     alt = grid0.z["data"]
 
-    r_coords = rvect.ListVector(
-        {
-            "lon": robjects.FloatVector(lon),
-            "lat": robjects.FloatVector(lat),
-            "alt": robjects.FloatVector(alt),
-        }
-    )
-
-    r_points = robjects.DataFrame(points[0])
-    for pt in points[1:]:
-        r_points = r_points.rbind(robjects.DataFrame(pt))
-
-    r_padxyz = robjects.FloatVector(padxyz)
-    r_levels = robjects.FloatVector(levels)
-
-    npt = len(points)
-    nlev = len(levels)
-
     ext_data = dict()
     ext_data["coords"] = points
-    ext_data["altitude"] = alt[levels].tolist()
+    ext_data["altitude"] = alt[levels]
     ext_data["date"] = list()
-    ext_data["data"] = dict()
-    for field in fields:
-        ext_data["data"][field] = list()
+    ext_data["data"] = new_extracted_arrays(
+        fields, len(seqTime), len(levels), len(points), output
+    )
 
+    nd = 0
     for time in seqTime:
         grid = readRadarGrid(dirDate, time, fields)
         if grid is None:
             continue
 
-        r_data = dict()
+        g_data = dict()
         for field in fields:
             xdat = grid.fields[field]["data"]
-            xdat = xdat.filled(np.nan)
-            r_data[field] = robjects.FloatVector(xdat.flatten())
-
-        r_data = rvect.ListVector(r_data)
+            g_data[field] = xdat.filled(np.nan)
 
-        out = mtrwdata.extract_3DGridData(
-            r_coords, r_data, r_points, r_levels, r_padxyz, fun_sp
+        out = extract_3DGridData(
+            lon, lat, alt, g_data, points, levels, padxyz, fun_sp, backend=backend
         )
-        out = dict(zip(out.names, out))
 
         for field in fields:
-            xdat = out[field]
-            xdat = rFloatVector_to_npmDarray(xdat, (npt, nlev))
-            xdat = xdat.transpose()
-            xdat = np.ma.masked_invalid(xdat)
-            xdat = xdat.filled(-9999).tolist()
-            ext_data["data"][field] = ext_data["data"][field] + [xdat]
+            xdat = out[field].transpose()
+            xdat = np.where(np.isfinite(xdat), xdat, np.nan)
+            ext_data["data"][field][nd] = xdat
 
         temps = radarCartTimeInfo(grid, time_zone)
-        ext_data["date"] = ext_data["date"] + [temps["format"]]
+        ext_data["date"].append(temps["format"])
+        nd += 1
 
-    return ext_data
+    return extracted_output(ext_data, nd, output)
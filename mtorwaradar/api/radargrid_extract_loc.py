@@ -1,4 +1,5 @@
 from .radargrid_extract import extract_grid_data
+from .extract_output import extracted_to_dataframe, table_output
 
 
 def extractRadarGrid(
@@ -11,6 +12,8 @@ def extractRadarGrid(
     padxyz=[0, 0, 0],
     fun_sp="mean",
     time_zone="Africa/Kigali",
+    backend="R",
+    output="list",
 ):
     """
     Extract radar Cartesian data over a given points.
@@ -38,6 +41,13 @@ def extractRadarGrid(
     time_zone: string
         The time zone of "start_time", "end_time" and the output extracted data.
         Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    backend: string
+        Extraction backend, "R" (package mtorwdata) or "python". Default "R"
+    output: string
+        "list": the fields are 3d lists, the missing values are -9999.
+        "array": the fields are 3d numpy arrays, the missing values are NaN.
+        "xarray": a xarray Dataset, see api.extract_output.extracted_to_xarray.
+        Default "list"
 
     Returns
     -------
@@ -60,10 +70,12 @@ def extractRadarGrid(
         padxyz=padxyz,
         fun_sp=fun_sp,
         time_zone=time_zone,
+        backend=backend,
+        output=output,
     )
 
 
-def gridExtractedTable(x):
+def gridExtractedTable(x, output="dataframe"):
     """
     Convert to table extracted radar Cartesian data.
 
@@ -71,25 +83,11 @@ def gridExtractedTable(x):
     ----------
     x: dictionary
         Output from extractRadarGrid
+    output: string
+        "dataframe": a pandas DataFrame, "records": a list of dictionaries (one by row).
+        Default "dataframe"
     Returns
     -------
-    A list of dictionaries
+    A pandas DataFrame or a list of dictionaries
     """
-    var = list(x['data'].keys())
-
-    out = list()
-    for p in range(len(x['coords'])):
-        for e in range(len(x['altitude'])):
-            for d in range(len(x['date'])):
-                pt = x['coords'][p]
-                tab = {'id': pt['id'],
-                    'longitude': pt['longitude'],
-                    'latitude': pt['latitude'],
-                    'dates': x['date'][d],
-                    'altitude': x['altitude'][e]
-                 }
-                for v in var:
-                    tab[v] = x['data'][v][d][e][p]
-                out = out + [tab]
-
-    return out
+    return table_output(extracted_to_dataframe(x), output)
@@ -5,13 +5,8 @@ from dateutil import tz
 import pyart
 
 from .radarpolar_data import *
-from ..util.utilities import rFloatVector_to_npmDarray
-
-import rpy2.robjects as robjects
-import rpy2.robjects.vectors as rvect
-from rpy2.robjects.packages import importr
-
-mtrwdata = importr("mtorwdata")
+from ..util.interpolation import extract_3DPolarData
+from .extract_output import new_extracted_arrays, extracted_output
 
 
 def extract_polar_vertical(
@@ -30,6 +25,8 @@ def extract_polar_vertical(
     filter=None,
     filter_fields=None,
     time_zone="Africa/Kigali",
+    backend="R",
+    output="list",
 ):
     if source is None:
         dirDate = dirMDV
@@ -88,23 +85,13 @@ def extract_polar_vertical(
     r_x, r_y = np.meshgrid(r_x, r_y)
     r_lon, r_lat = pyart.core.cartesian_to_geographic(r_x, r_y, projparams)
 
-    r_interp = rvect.ListVector(
-        {
-            "x": robjects.FloatVector(r_x[0, :]),
-            "y": robjects.FloatVector(r_y[:, 0]),
-            "z": robjects.FloatVector(r_heights),
-            "lon": robjects.FloatVector(r_lon[0, :]),
-            "lat": robjects.FloatVector(r_lat[:, 0]),
-        }
-    )
-
-    #######
-
-    r_points = robjects.DataFrame(points[0])
-    for pt in points[1:]:
-        r_points = r_points.rbind(robjects.DataFrame(pt))
-
-    r_padxy = robjects.FloatVector(padxy)
+    r_interp = {
+        "x": r_x[0, :],
+        "y": r_y[:, 0],
+        "z": r_heights,
+        "lon": r_lon[0, :],
+        "lat": r_lat[:, 0],
+    }
 
     #####
 
@@ -114,19 +101,17 @@ def extract_polar_vertical(
 
     #####
 
-    npt = len(points)
-    nlev = len(r_heights)
-
     ext_data = dict()
     ext_data["coords"] = points
-    ext_data["height"] = r_heights.tolist()
+    ext_data["height"] = r_heights
     ext_data["date"] = list()
-    ext_data["data"] = dict()
-    for field in fields:
-        ext_data["data"][field] = list()
+    ext_data["data"] = new_extracted_arrays(
+        fields, len(seqTime), len(r_heights), len(points), output
+    )
 
     #####
 
+    nd = 0
     for time in seqTime:
         radar = readRadarPolar(dirDate, time, fields_read)
         if radar is None:
@@ -146,38 +131,23 @@ def extract_polar_vertical(
         y_r = radar.gate_y["data"]
         z_r = radar.gate_z["data"]
 
-        r_coords = rvect.ListVector(
-            {
-                "x": robjects.FloatVector(x_r.flatten()),
-                "y": robjects.FloatVector(y_r.flatten()),
-                "z": robjects.FloatVector(z_r.flatten()),
-            }
-        )
-
         #####
         r_data = dict()
         for field in fields:
             xdat = radar.fields[field]["data"]
-            xdat = xdat.filled(np.nan)
-            r_data[field] = robjects.FloatVector(xdat.flatten())
-
-        r_data = rvect.ListVector(r_data)
+            r_data[field] = xdat.filled(np.nan)
 
-        out = mtrwdata.extract_3DPolarData(
-            r_coords, r_data, r_interp, r_points, r_padxy, fun_sp
+        out = extract_3DPolarData(
+            x_r, y_r, z_r, r_data, r_interp, points, padxy, fun_sp, backend=backend
         )
 
-        out = dict(zip(out.names, out))
-
         for field in fields:
-            xdat = out[field]
-            xdat = rFloatVector_to_npmDarray(xdat, (npt, nlev))
-            xdat = xdat.transpose()
-            xdat = np.ma.masked_invalid(xdat)
-            xdat = xdat.filled(-9999).tolist()
-            ext_data["data"][field] = ext_data["data"][field] + [xdat]
+            xdat = out[field].transpose()
+            xdat = np.where(np.isfinite(xdat), xdat, np.nan)
+            ext_data["data"][field][nd] = xdat
 
         temps = radarPolarTimeInfo(radar, time_zone)
-        ext_data["date"] = ext_data["date"] + [temps["format"]]
+        ext_data["date"].append(temps["format"])
+        nd += 1
 
-    return ext_data
+    return extracted_output(ext_data, nd, output)
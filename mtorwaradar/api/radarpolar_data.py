@@ -8,7 +8,7 @@ from ..util.filter import apply_filter
 from ..util.pia import calculate_pia_dict_args
 
 
-def readRadarPolar(dirRadar, time, fields="all"):
+def readRadarPolar(dirRadar, time, fields="all", sweeps=None):
     """
     Read radar polar
 
@@ -21,6 +21,10 @@ def readRadarPolar(dirRadar, time, fields="all"):
         The approximation time to be read in the form "yyyy-mm-dd-HH-MM".
     fields: string or list
         The list of the fields to read or a value "all" to read all fields
+    sweeps: list or None
+        The index of the sweeps to read, only these sweeps are decompressed.
+        The sweeps of the returned radar are numbered from 0 in the order of "sweeps".
+        Default None, all the sweeps
 
     Returns
     -------
@@ -32,7 +36,7 @@ def readRadarPolar(dirRadar, time, fields="all"):
         return None
 
     mdvfile = os.path.join(dirRadar, mdvtime[0], mdvtime[1] + ".mdv")
-    radar = radarPolar(mdvfile, fields)
+    radar = radarPolar(mdvfile, fields, sweeps)
     return radar
 
 
@@ -1,8 +1,15 @@
 import os
+import copy
 import numpy as np
 import datetime
+import functools
 from dateutil import tz
 from .radarpolar_data import *
+from ..mdv.readmdv import MdvReader
+from ..util.radarDateTime import mdv_end_time_file
+from ..mdv.polargeom import sweep_lat_lon_alt, points_gate_index
+from ..util.parallel import run_time_steps, StepError
+from .extract_output import new_extracted_arrays, extracted_output
 
 
 def extract_polar_data(
@@ -19,6 +26,10 @@ def extract_polar_data(
     filter_fields=None,
     apply_cmd=False,
     time_zone="Africa/Kigali",
+    workers=1,
+    chunksize=1,
+    output="list",
+    errors="raise",
 ):
     """
     Extract radar polar data over a given points.
@@ -56,6 +67,19 @@ def extract_polar_data(
     time_zone: string
         The time zone of "start_time", "end_time" and the output extracted data.
         Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    workers: integer or None
+        Number of processes used to extract the time steps. Default 1.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    output: string
+        "list": the data are 3d lists, the missing values are -9999.
+        "array": the data are 3d numpy arrays, the missing values are NaN.
+        "xarray": a xarray Dataset, see api.extract_output.extracted_to_xarray.
+        Default "list"
+    errors: string
+        "raise" to stop at the first time step raising an error, "capture" to print the error
+        and go on with the other time steps. Default "raise"
 
     Returns
     -------
@@ -117,80 +141,117 @@ def extract_polar_data(
 
     ext_data = dict()
     ext_data["coords"] = points
-    ext_data["elevation_angle"] = radar0.fixed_angle["data"][sweeps].tolist()
+    ext_data["elevation_angle"] = radar0.fixed_angle["data"][sweeps]
     ext_data["date"] = list()
-    ext_data["data"] = dict()
-    ext_data["data"]["longitude"] = list()
-    ext_data["data"]["latitude"] = list()
-    ext_data["data"]["altitude"] = list()
-    for field in fields:
-        ext_data["data"][field] = list()
 
     fields_pars = getFieldsPiaFilterCmd(pia, filter, apply_cmd)
     fields_read = fields + fields_pars
     fields_read = list(dict.fromkeys(fields_read))
 
-    for time in seqTime:
+    fun = functools.partial(
+        _extract_polar_time,
+        dirDate=dirDate,
+        fields=fields,
+        fields_read=fields_read,
+        points=points,
+        sweeps=sweeps,
+        read_sweeps=sweeps != list(range(radar0.nsweeps)),
+        pia=pia,
+        dbz_fields=dbz_fields,
+        filter=filter,
+        filter_fields=filter_fields,
+        apply_cmd=apply_cmd,
+        time_zone=time_zone,
+    )
+    out = run_time_steps(
+        fun, seqTime, workers=workers, chunksize=chunksize, errors=errors
+    )
+
+    out = [res for res in out if not (isinstance(res, StepError) or res is None)]
+
+    names = ["longitude", "latitude", "altitude"] + fields
+    ext_data["data"] = new_extracted_arrays(
+        names, len(out), len(sweeps), len(points), output
+    )
+
+    for nd, res in enumerate(out):
+        for name in names:
+            ext_data["data"][name][nd] = res["data"][name]
+        ext_data["date"].append(res["date"])
+
+    return extracted_output(ext_data, len(out), output)
+
+
+def _extract_polar_time(
+    time,
+    dirDate,
+    fields,
+    fields_read,
+    points,
+    sweeps,
+    read_sweeps,
+    pia,
+    dbz_fields,
+    filter,
+    filter_fields,
+    apply_cmd,
+    time_zone,
+):
+    if read_sweeps:
+        # decompress only the requested sweeps, the time is taken
+        # from the whole volume as when all the sweeps are read
+        mdvtime = mdv_end_time_file(dirDate, time)
+        if mdvtime is None:
+            return None
+
+        mdvfile = os.path.join(dirDate, mdvtime[0], mdvtime[1] + ".mdv")
+        with MdvReader(mdvfile) as reader:
+            radar = reader.radar(fields_read)
+            temps = radarPolarTimeInfo(radar, time_zone)
+            radar = reader.extract_sweeps(radar, sweeps)
+
+        # the sweeps of the extracted radar
+        radar_sweeps = list(range(len(sweeps)))
+    else:
         radar = readRadarPolar(dirDate, time, fields_read)
         if radar is None:
-            continue
+            return None
 
-        if bool(filter) & bool(filter_fields):
-            radar = applyFilter(radar, filter, filter_fields)
+        temps = radarPolarTimeInfo(radar, time_zone)
+        radar_sweeps = sweeps
 
-        if bool(pia) & bool(dbz_fields):
-            radar = correctAttenuation(radar, pia, dbz_fields)
+    if bool(filter) & bool(filter_fields):
+        radar = applyFilter(radar, copy.deepcopy(filter), filter_fields)
 
-        if apply_cmd:
-            radar = applyCMD(radar, fields)
+    if bool(pia) & bool(dbz_fields):
+        radar = correctAttenuation(radar, pia, dbz_fields)
 
-        fill_fields = dict()
-        for field in fields:
-            v_field = radar.fields[field]["data"]
-            fill_fields[field] = v_field.filled(-9999)
+    if apply_cmd:
+        radar = applyCMD(radar, fields)
 
-        s_lon = list()
-        s_lat = list()
-        s_alt = list()
-        s_fields = dict()
-        for field in fields:
-            s_fields[field] = list()
-
-        for swp in sweeps:
-            sweep_slice = radar.get_slice(swp)
-            lat, lon, alt = radar.get_gate_lat_lon_alt(swp, filter_transitions=True)
-
-            p_lon = list()
-            p_lat = list()
-            p_alt = list()
-            p_fields = dict()
-            for field in fields:
-                p_fields[field] = list()
-
-            for pxy in points:
-                ixy = (
-                    np.square(lon - pxy["longitude"]) + np.square(lat - pxy["latitude"])
-                ).argmin()
-                p_lon = p_lon + [lon.flatten()[ixy]]
-                p_lat = p_lat + [lat.flatten()[ixy]]
-                p_alt = p_alt + [alt.flatten()[ixy]]
-                for field in fields:
-                    v_field = fill_fields[field][sweep_slice].flatten()[ixy]
-                    p_fields[field] = p_fields[field] + [v_field]
-
-            s_lon = s_lon + [p_lon]
-            s_lat = s_lat + [p_lat]
-            s_alt = s_alt + [p_alt]
-            for field in fields:
-                s_fields[field] = s_fields[field] + [p_fields[field]]
-
-        ext_data["data"]["longitude"] = ext_data["data"]["longitude"] + [s_lon]
-        ext_data["data"]["latitude"] = ext_data["data"]["latitude"] + [s_lat]
-        ext_data["data"]["altitude"] = ext_data["data"]["altitude"] + [s_alt]
-        for field in fields:
-            ext_data["data"][field] = ext_data["data"][field] + [s_fields[field]]
+    fill_fields = dict()
+    for field in fields:
+        v_field = radar.fields[field]["data"]
+        fill_fields[field] = np.ma.filled(v_field.astype(np.float64), np.nan)
 
-        temps = radarPolarTimeInfo(radar, time_zone)
-        ext_data["date"] = ext_data["date"] + [temps["format"]]
+    # arrays (sweep x point)
+    npts = len(points)
+    s_data = dict()
+    for name in ["longitude", "latitude", "altitude"] + fields:
+        s_data[name] = np.empty((len(sweeps), npts), dtype=np.float64)
+
+    # index of the nearest gates, computed once per scan geometry
+    index = points_gate_index(radar, radar_sweeps, points, filter_transitions=True)
+
+    for i, swp in enumerate(radar_sweeps):
+        sweep_slice = radar.get_slice(swp)
+        lat, lon, alt = sweep_lat_lon_alt(radar, swp, filter_transitions=True)
+        ixy = index[swp]
+
+        s_data["longitude"][i] = lon.ravel()[ixy]
+        s_data["latitude"][i] = lat.ravel()[ixy]
+        s_data["altitude"][i] = alt.ravel()[ixy]
+        for field in fields:
+            s_data[field][i] = fill_fields[field][sweep_slice].ravel()[ixy]
 
-    return ext_data
+    return {"date": temps["format"], "data": s_data}
@@ -1,4 +1,5 @@
 from .radarpolarV_extract import extract_polar_vertical
+from .extract_output import extracted_to_dataframe, table_output
 
 
 def extractRadarPolarV(
@@ -16,6 +17,8 @@ def extractRadarPolarV(
     filter=None,
     filter_fields=None,
     time_zone="Africa/Kigali",
+    backend="R",
+    output="list",
 ):
     """
     Interpolate and extract radar polar data over a given points.
@@ -57,6 +60,13 @@ def extractRadarPolarV(
     time_zone: string
         The time zone of "start_time", "end_time" and the output extracted data.
         Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    backend: string
+        Interpolation backend, "R" (package mtorwdata) or "python". Default "R"
+    output: string
+        "list": the fields are 3d lists, the missing values are -9999.
+        "array": the fields are 3d numpy arrays, the missing values are NaN.
+        "xarray": a xarray Dataset, see api.extract_output.extracted_to_xarray.
+        Default "list"
 
     Returns
     -------
@@ -194,9 +204,11 @@ def extractRadarPolarV(
         filter=filter,
         filter_fields=filter_fields,
         time_zone=time_zone,
+        backend=backend,
+        output=output,
     )
 
-def polarVExtractedTable(x):
+def polarVExtractedTable(x, output="dataframe"):
     """
     Convert to table extracted radar polar data.
 
@@ -204,25 +216,11 @@ def polarVExtractedTable(x):
     ----------
     x: dictionary
         Output from extractRadarPolarV
+    output: string
+        "dataframe": a pandas DataFrame, "records": a list of dictionaries (one by row).
+        Default "dataframe"
     Returns
     -------
-    A list of dictionaries
+    A pandas DataFrame or a list of dictionaries
     """
-    var = list(x['data'].keys())
-
-    out = list()
-    for p in range(len(x['coords'])):
-        for e in range(len(x['height'])):
-            for d in range(len(x['date'])):
-                pt = x['coords'][p]
-                tab = {'id': pt['id'],
-                    'longitude': pt['longitude'],
-                    'latitude': pt['latitude'],
-                    'dates': x['date'][d],
-                    'height': x['height'][e]
-                 }
-                for v in var:
-                    tab[v] = x['data'][v][d][e][p]
-                out = out + [tab]
-
-    return out
+    return table_output(extracted_to_dataframe(x), output)
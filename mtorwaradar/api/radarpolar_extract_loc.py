@@ -1,4 +1,5 @@
 from .radarpolar_extract import extract_polar_data
+from .extract_output import extracted_to_dataframe, table_output
 
 
 def extractRadarPolar(
@@ -14,6 +15,9 @@ def extractRadarPolar(
     filter_fields=None,
     apply_cmd=False,
     time_zone="Africa/Kigali",
+    workers=1,
+    chunksize=1,
+    output="list",
 ):
     """
     Extract radar polar data over a given points.
@@ -49,6 +53,16 @@ def extractRadarPolar(
     time_zone: string
         The time zone of "start_time", "end_time" and the output extracted data.
         Options: "Africa/Kigali" or "UTC". Default "Africa/Kigali"
+    workers: integer or None
+        Number of processes used to extract the time steps. Default 1.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    output: string
+        "list": the data are 3d lists, the missing values are -9999.
+        "array": the data are 3d numpy arrays, the missing values are NaN.
+        "xarray": a xarray Dataset, see api.extract_output.extracted_to_xarray.
+        Default "list"
 
     Returns
     -------
@@ -184,10 +198,13 @@ def extractRadarPolar(
         filter_fields=filter_fields,
         apply_cmd=apply_cmd,
         time_zone=time_zone,
+        workers=workers,
+        chunksize=chunksize,
+        output=output,
     )
 
 
-def polarExtractedTable(x):
+def polarExtractedTable(x, output="dataframe"):
     """
     Convert to table extracted radar polar data.
 
@@ -195,26 +212,11 @@ def polarExtractedTable(x):
     ----------
     x: dictionary
         Output from extractRadarPolar
+    output: string
+        "dataframe": a pandas DataFrame, "records": a list of dictionaries (one by row).
+        Default "dataframe"
     Returns
     -------
-    A list of dictionaries
+    A pandas DataFrame or a list of dictionaries
     """
-    var = list(x["data"].keys())
-
-    out = list()
-    for p in range(len(x["coords"])):
-        for e in range(len(x["elevation_angle"])):
-            for d in range(len(x["date"])):
-                pt = x["coords"][p]
-                tab = {
-                    "points_id": pt["id"],
-                    "points_longitude": pt["longitude"],
-                    "points_latitude": pt["latitude"],
-                    "dates": x["date"][d],
-                    "elevation_angle": x["elevation_angle"][e],
-                }
-                for v in var:
-                    tab[v] = x["data"][v][d][e][p]
-                out = out + [tab]
-
-    return out
+    return table_output(extracted_to_dataframe(x), output)
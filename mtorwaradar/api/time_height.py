@@ -0,0 +1,73 @@
+import datetime
+import numpy as np
+
+
+def time_height_arrays(profiles, variables=None, data_key=None, sample=None):
+    """
+    Assemble a list of vertical profiles (VAD, QVP) into time-height arrays
+
+    The arrays (height x time) are allocated once. The profiles are aligned by the
+    index of the heights, not by their values: the row k contains the k-th height
+    of each profile, the heights of a row may differ between the profiles (use the
+    "height" array). The profiles with fewer heights than the longest profile are
+    padded at the top, with NaN for the height and masked values for the variables.
+
+    Parameters
+    ----------
+    profiles: list of dictionary
+        The profiles, output from createVAD or createQVP, each profile has the keys
+        "time" (format "%Y%m%d%H%M%S"), "height" (1d array) and the variables
+    variables: list or None
+        The names of the variables to assemble.
+        Default None, all the variables in the first profile (1d arrays as the height)
+    data_key: string or None
+        The key of the dictionary containing the variables in each profile,
+        "data" for QVP. Default None, the variables are in the profile (VAD)
+    sample: integer or None
+        Take one height out of "sample". Default None, all the heights
+
+    Returns
+    -------
+    A dictionary
+        time: 1d numpy array of datetime (time)
+        height: 2d numpy array (height x time) of the heights in meters
+        and the variables: 2d numpy masked arrays (height x time)
+    """
+    if len(profiles) == 0:
+        return {}
+
+    def _source(p):
+        return p if data_key is None else p[data_key]
+
+    if variables is None:
+        p0 = profiles[0]
+        variables = [
+            k
+            for k, v in _source(p0).items()
+            if k != "height"
+            and isinstance(v, np.ndarray)
+            and v.shape == np.shape(p0["height"])
+        ]
+
+    step = 1 if sample is None else sample
+    nt = len(profiles)
+    nz = max(len(p["height"]) for p in profiles)
+    iz = np.arange(0, nz, step)
+
+    time = [datetime.datetime.strptime(p["time"], "%Y%m%d%H%M%S") for p in profiles]
+    out = {
+        "time": np.array(time),
+        "height": np.full((len(iz), nt), np.nan, dtype=np.float64),
+    }
+    for var in variables:
+        out[var] = np.ma.masked_all((len(iz), nt), dtype=np.float64)
+
+    for it, p in enumerate(profiles):
+        kz = iz[iz < len(p["height"])]
+        nk = len(kz)
+        out["height"][:nk, it] = np.asarray(p["height"])[kz]
+        src = _source(p)
+        for var in variables:
+            out[var][:nk, it] = src[var][kz]
+
+    return out
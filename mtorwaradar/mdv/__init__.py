@@ -5,5 +5,7 @@ from . import cartxsec
 from . import windctrec
 from . import echotops
 from . import creategrid
+from . import polargeom
+from . import vad
 
 __all__ = [s for s in dir() if not s.startswith('_')]
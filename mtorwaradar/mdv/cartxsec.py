@@ -1,17 +1,14 @@
 import numpy as np
 import pyart
-import rpy2.robjects as robjects
-from rpy2.robjects.packages import importr
 
-from ..util.utilities import npmDarray_to_rFloatVector, rFloatVector_to_npmDarray
+from ..util.interpolation import interp3d_xsec
 
-mtrwdata = importr('mtorwdata')
-
-def cart_xsec_data(grid, field, points, res = 500):
+def cart_xsec_data(grid, field, points, res = 500, backend = "R"):
     """
     grid: radar grid
     points: [[start_alt, start_lon], [end_lat, end_lon]]
     res: resolution of the input data (in meter)
+    backend: interpolation backend, "R" (package mtorwdata) or "python"
     """
     xr = grid.y['data']
     yr = grid.y['data']
@@ -57,11 +54,6 @@ def cart_xsec_data(grid, field, points, res = 500):
     x, z = np.meshgrid(xr[ix, iy], zr)
     y, z = np.meshgrid(yr[ix, iy], zr)
 
-    x = npmDarray_to_rFloatVector(x)
-    y = npmDarray_to_rFloatVector(y)
-    z = npmDarray_to_rFloatVector(z)
-    v = npmDarray_to_rFloatVector(v)
-
     #####
     x_g = np.linspace(xmin, xmax, nbx)
     x_g = x_g.flatten()
@@ -76,13 +68,8 @@ def cart_xsec_data(grid, field, points, res = 500):
     x_g, z_g = np.meshgrid(x_g, zr)
     y_g, z_g = np.meshgrid(y_g, zr)
 
-    x_g = npmDarray_to_rFloatVector(x_g)
-    y_g = npmDarray_to_rFloatVector(y_g)
-    z_g = npmDarray_to_rFloatVector(z_g)
-
     #####
-    v_out = mtrwdata.interp3d_xsec(x, y, z, v, x_g, y_g, z_g)
-    v_out = rFloatVector_to_npmDarray(v_out, dst.shape)
+    v_out = interp3d_xsec(x, y, z, v, x_g, y_g, z_g, backend = backend)
     v_out = np.ma.masked_where(np.isnan(v_out), v_out)
 
     if xpt1 > xpt2:
@@ -1,4 +1,12 @@
+import os
+import hashlib
+import threading
+import collections
+import numpy as np
 import pyart
+from scipy import ndimage
+from scipy.spatial import cKDTree
+from .polargeom import geometry_key
 
 def create_grid_from_radar(radar, field_names = ['DBZ_F'],
                            grid_shape = (35, 800, 800),
@@ -31,3 +39,335 @@ def create_grid_from_radar(radar, field_names = ['DBZ_F'],
                                       roi_func = roi_func, constant_roi = constant_roi,
                                       **kwargs)
     return grid
+
+############################
+
+class GridMappingCache:
+    """
+    Cache of the mapping between the gates of a radar polar volume and the points of a Cartesian grid
+
+    The mapping reproduces pyart.map.grid_from_radars with the 'map_gates_to_grid' algorithm,
+    the 'Nearest' weighting function and a constant radius of influence. For each grid point,
+    the nearest gates within the radius of influence are found once per scan geometry and grid,
+    the volumes with the same geometry are then gridded by taking the nearest valid gate.
+
+    Memory: a mapping stores nneighbors int32 indices per grid point, i.e. 16 bytes
+    per point with the default 4 neighbors, about 10 MB for the 1 x 800 x 800 grid of
+    the 'one_altitude' CAPPI and 280 MB for the 27 x 800 x 800 grid of a 'composite_altitude'
+    CAPPI from 1.7 to 15 km. The mapping is built by blocks of grid points, the build needs
+    about 100 MB besides the mapping and the KD-tree of the gates. The cache is held by
+    each process, a pool of workers keeps one cache per worker.
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of mappings kept in memory, the least recently used
+        mapping is removed first. Default 4
+    maxbytes: integer
+        Maximum total size in bytes of the mappings kept in memory, the least recently used
+        mappings are removed first, the last mapping is always kept. Default 512 MB
+    cache_dir: string or None
+        Full path to a folder where to save the mappings as .npy files,
+        None to keep them only in memory. Default None
+    nneighbors: integer
+        Number of the nearest gates stored for each grid point. The grid points where
+        all the stored gates are invalid are searched among the valid gates of the volume
+        in the cells around them, so the result does not depend on this number, only
+        the speed. Default 4
+    toa: float
+        Top of the atmosphere in meter, the gates above are not used. Default 17000
+    """
+
+    def __init__(self, maxsize = 4, cache_dir = None, nneighbors = 4, toa = 17000.,
+                 maxbytes = 512 * 2**20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.cache_dir = cache_dir
+        self.nneighbors = nneighbors
+        self.toa = toa
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, radar, grid_shape, grid_limits, constant_roi):
+        """
+        Get the index of the nearest gates of each grid point
+
+        Parameters
+        ----------
+        radar: pyart radar polar object
+        grid_shape: tuple
+            Number of points in the grid (z, y, x)
+        grid_limits: tuple
+            Minimum and maximum grid location in meter ((z0, z1), (y0, y1), (x0, x1))
+        constant_roi: float
+            Radius of influence in meter
+
+        Returns
+        -------
+        A 2d read-only numpy array (number of grid points x nneighbors) containing the index
+        of the gates in the flattened volume sorted by distance, radar.nrays * radar.ngates
+        when there are less than nneighbors gates within the radius of influence.
+        """
+        key = _mapping_key(radar, grid_shape, grid_limits, constant_roi,
+                           self.nneighbors, self.toa)
+
+        with self._lock:
+            index = self._cache.get(key)
+            if index is not None:
+                self._cache.move_to_end(key)
+                return index
+
+        index = self._read_npy(key)
+        if index is None:
+            index = _compute_grid_mapping(radar, grid_shape, grid_limits, constant_roi,
+                                          self.nneighbors, self.toa)
+            self._write_npy(key, index)
+
+        index.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = index
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last = False)
+            while len(self._cache) > 1 and self.nbytes > self.maxbytes:
+                self._cache.popitem(last = False)
+
+        return index
+
+    @property
+    def nbytes(self):
+        """
+        Total size in bytes of the mappings kept in memory
+        """
+        return sum(index.nbytes for index in self._cache.values())
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _npy_file(self, key):
+        return os.path.join(self.cache_dir, 'gridmap_' + key + '.npy')
+
+    def _read_npy(self, key):
+        if self.cache_dir is None:
+            return None
+
+        npy_file = self._npy_file(key)
+        if not os.path.isfile(npy_file):
+            return None
+
+        return np.load(npy_file)
+
+    def _write_npy(self, key, index):
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+        npy_file = self._npy_file(key)
+        tmp = npy_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as fl:
+            np.save(fl, index)
+        os.replace(tmp, npy_file)
+
+def _mapping_key(radar, grid_shape, grid_limits, constant_roi, nneighbors, toa):
+    sha = hashlib.sha1()
+    sha.update(geometry_key(radar).encode())
+    sha.update(str((tuple(grid_shape), tuple(map(tuple, grid_limits)),
+                    float(constant_roi), nneighbors, float(toa))).encode())
+
+    return sha.hexdigest()
+
+def _grid_points(grid_shape, grid_limits):
+    nz, ny, nx = grid_shape
+    (z0, z1), (y0, y1), (x0, x1) = grid_limits
+    z = np.linspace(z0, z1, nz)
+    y = np.linspace(y0, y1, ny)
+    x = np.linspace(x0, x1, nx)
+
+    return z, y, x
+
+def _gate_points(radar, igates = None):
+    # Cartesian coordinates of the gates in the grid, the grid origin
+    # is the radar location and the grid origin altitude is 0
+    # igates: index of the gates in the flattened volume, None for all the gates
+    if igates is None:
+        igates = slice(None)
+    x = radar.gate_x['data'].ravel()[igates]
+    y = radar.gate_y['data'].ravel()[igates]
+    z = radar.gate_z['data'].ravel()[igates] + radar.altitude['data'][0]
+
+    return np.column_stack((z, y, x))
+
+def _compute_grid_mapping(radar, grid_shape, grid_limits, constant_roi, nneighbors, toa,
+                          block_size = 2**20):
+    gates = _gate_points(radar)
+    ngates = gates.shape[0]
+    in_toa = np.where(gates[:, 0] <= toa)[0]
+    tree = cKDTree(gates[in_toa])
+    # the missing neighbors are returned as len(in_toa)
+    in_toa = np.append(in_toa, ngates)
+
+    z, y, x = _grid_points(grid_shape, grid_limits)
+    npoints = int(np.prod(grid_shape))
+    dtype = np.int32 if ngates < np.iinfo(np.int32).max else np.int64
+    index = np.empty((npoints, nneighbors), dtype = dtype)
+
+    # query by blocks of grid points, the distances and the indices
+    # returned by the KD-tree are float64 and int64
+    for i0 in range(0, npoints, block_size):
+        i1 = min(i0 + block_size, npoints)
+        iz, iy, ix = np.unravel_index(np.arange(i0, i1), grid_shape)
+        points = np.column_stack((z[iz], y[iy], x[ix]))
+        _, ig = tree.query(points, k = nneighbors, distance_upper_bound = constant_roi)
+        index[i0:i1] = in_toa[ig.reshape(i1 - i0, nneighbors)]
+
+    return index
+
+def valid_gates(radar, field_names):
+    """
+    Get the gates used to grid a volume, i.e. not in antenna transition
+    and valid (not masked and finite) for all the fields
+
+    Returns
+    -------
+    A 2d boolean numpy array (nrays x ngates)
+    """
+    valid = np.ones((radar.nrays, radar.ngates), dtype = bool)
+    if radar.antenna_transition is not None:
+        valid[radar.antenna_transition['data'] != 0, :] = False
+
+    for field in field_names:
+        data = radar.fields[field]['data']
+        valid &= ~np.ma.getmaskarray(data)
+        valid &= np.isfinite(np.ma.getdata(data))
+
+    return valid
+
+def _nearest_valid_gates(gates, search, grid_shape, grid_limits, constant_roi):
+    # nearest gate within the radius of influence of the grid points "search",
+    # the index of the gate or -1. The points without any gate in the cells
+    # around them are discarded first, only the gates in the cells around the
+    # remaining points are put in the KD-tree.
+    out = np.full(search.size, -1, dtype = np.int64)
+    coords = _grid_points(grid_shape, grid_limits)
+
+    # gates within the radius of influence of the grid extent
+    igates = np.where(np.all((gates >= [c[0] - constant_roi for c in coords]) &
+                             (gates <= [c[-1] + constant_roi for c in coords]), axis = 1))[0]
+    if igates.size == 0:
+        return out
+    gates = gates[igates]
+
+    # cell of the grid containing each gate, the gates outside the grid
+    # are moved to the nearest cell on the border; a gate within the radius
+    # of influence of a grid point is at most "nbox" cells away on each axis
+    cells = np.zeros(gates.shape, dtype = np.int64)
+    nbox = [0, 0, 0]
+    for k in range(3):
+        if coords[k].size > 1:
+            delta = coords[k][1] - coords[k][0]
+            cells[:, k] = np.rint((gates[:, k] - coords[k][0]) / delta)
+            np.clip(cells[:, k], 0, grid_shape[k] - 1, out = cells[:, k])
+            nbox[k] = int(np.ceil(constant_roi / delta)) + 1
+    size = [2 * n + 1 for n in nbox]
+
+    occupied = np.zeros(grid_shape, dtype = np.uint8)
+    occupied[cells[:, 0], cells[:, 1], cells[:, 2]] = 1
+    occupied = ndimage.maximum_filter(occupied, size = size, mode = 'constant')
+    isearch = np.where(occupied.ravel()[search])[0]
+    if isearch.size == 0:
+        return out
+
+    points = np.zeros(grid_shape, dtype = np.uint8)
+    points.ravel()[search[isearch]] = 1
+    points = ndimage.maximum_filter(points, size = size, mode = 'constant')
+    inear = np.where(points[cells[:, 0], cells[:, 1], cells[:, 2]])[0]
+
+    iz, iy, ix = np.unravel_index(search[isearch], grid_shape)
+    tree = cKDTree(gates[inear])
+    _, ig = tree.query(np.column_stack((coords[0][iz], coords[1][iy], coords[2][ix])),
+                       distance_upper_bound = constant_roi)
+    ok = ig < inear.size
+    out[isearch[ok]] = igates[inear[ig[ok]]]
+
+    return out
+
+def grid_data_from_radar(radar, field_names = ['DBZ_F'],
+                         grid_shape = (35, 800, 800),
+                         z_lim = (0., 17000.),
+                         y_lim = (-199750., 199750.),
+                         x_lim = (-199750., 199750.),
+                         constant_roi = 710):
+    """
+    Map the gates of a radar polar volume to a Cartesian grid using the cached gate to grid mapping.
+    Equivalent to create_grid_from_radar with the default gridding parameters
+    ('map_gates_to_grid', 'Nearest', constant radius of influence).
+
+    Parameters
+    ----------
+    radar: pyart radar polar object
+    field_names: list
+        List of the fields to grid
+    grid_shape: tuple
+        Number of points in the grid (z, y, x)
+    z_lim, y_lim, x_lim: tuple
+        Minimum and maximum grid location in meter
+    constant_roi: float
+        Radius of influence parameter in meter. Default 500 * sqrt(2) ~ 707
+
+    Returns
+    -------
+    A dictionary with keys 'z', 'y', 'x' and 'fields'
+        'z', 'y', 'x': 1d numpy arrays, the grid coordinates in meter, the origin is the radar location
+        'fields': dictionary of the fields containing the data, 3d numpy masked array (z, y, x)
+    """
+    grid_limits = (z_lim, y_lim, x_lim)
+    index = _grid_mapping_cache.get(radar, grid_shape, grid_limits, constant_roi)
+    ngates = radar.nrays * radar.ngates
+    npoints = index.shape[0]
+
+    valid = valid_gates(radar, field_names).ravel()
+    valid = np.append(valid, False)
+
+    # nearest valid gate among the stored neighbors
+    vnbr = valid[index]
+    inbr = np.argmax(vnbr, axis = 1)
+    gate = index[np.arange(npoints), inbr]
+    found = vnbr[np.arange(npoints), inbr]
+
+    # when all the stored neighbors are invalid, search a valid gate
+    # further within the radius of influence
+    # (the missing neighbors are at the end)
+    search = np.where(~found & (index[:, -1] < ngates))[0]
+    if search.size > 0:
+        ivalid = np.where(valid[:-1])[0]
+        gates = _gate_points(radar, ivalid)
+        in_toa = gates[:, 0] <= _grid_mapping_cache.toa
+        ivalid = ivalid[in_toa]
+        ig = _nearest_valid_gates(gates[in_toa], search, grid_shape, grid_limits, constant_roi)
+        ok = ig >= 0
+        gate[search[ok]] = ivalid[ig[ok]]
+        found[search[ok]] = True
+
+    gate[~found] = 0
+
+    z, y, x = _grid_points(grid_shape, grid_limits)
+    fields = dict()
+    for field in field_names:
+        xdat = np.ma.asarray(radar.fields[field]['data'])
+        xdat = np.ma.masked_array(xdat.data.ravel()[gate], mask = ~found,
+                                  fill_value = xdat.fill_value)
+        fields[field] = xdat.reshape(grid_shape)
+
+    return {'z': z, 'y': y, 'x': x, 'fields': fields}
+
+_grid_mapping_cache = GridMappingCache()
+
+def configure_grid_mapping_cache(maxsize = 4, cache_dir = None, nneighbors = 4, toa = 17000.,
+                                 maxbytes = 512 * 2**20):
+    """
+    Replace the default gate to grid mapping cache, see GridMappingCache
+    """
+    global _grid_mapping_cache
+    _grid_mapping_cache = GridMappingCache(maxsize, cache_dir, nneighbors, toa, maxbytes)
@@ -2,6 +2,65 @@
 import pyart
 import numpy as np
 
+def echo_tops_stack(data, alt, thres, interpolate = False):
+    """
+    Compute echo tops from reflectivity data for several thresholds at once
+
+    The cumulative maximum of the reflectivity from the top of the volume is computed once,
+    the echo top index for a threshold is then the number of levels where this maximum
+    exceeds the threshold minus one.
+
+    Parameters
+    ----------
+    data: array
+        The DBZ field data. A 3D numpy masked array
+        With shape (z, y, x)
+    alt: list
+        List of the altitude in km. Same length of the first dimension of data
+    thres: list
+        List of the DBZ thresholds to be used
+    interpolate: boolean
+        If True, the echo top is linearly interpolated between the highest level
+        exceeding the threshold and the level above. Default False
+
+    Returns
+    -------
+    echo_tops: array
+        A 3D numpy masked array (len(thres), y, x) containing the echo tops. Units: km
+    """
+
+    alt = np.asarray(alt, dtype = np.float64)
+    thres = np.atleast_1d(np.asarray(thres, dtype = np.float64))
+    nz = data.shape[0]
+
+    dbz = np.ma.filled(np.ma.masked_invalid(data), -np.inf)
+    dbz = dbz.astype(np.float64, copy = False)
+    # reverse cumulative maximum: cmax[k] = max(dbz[k:])
+    cmax = np.maximum.accumulate(dbz[::-1], axis = 0)[::-1]
+
+    echo_tops = np.empty((len(thres),) + dbz.shape[1:], dtype = np.float64)
+    mask = np.empty(echo_tops.shape, dtype = bool)
+    iy, ix = np.indices(dbz.shape[1:])
+
+    for j, th in enumerate(thres):
+        index = np.count_nonzero(cmax >= th, axis = 0) - 1
+        mask[j] = index < 0
+        index[mask[j]] = 0
+        top = alt[index]
+
+        if interpolate:
+            above = np.minimum(index + 1, nz - 1)
+            z0 = dbz[index, iy, ix]
+            z1 = dbz[above, iy, ix]
+            ok = (above > index) & np.isfinite(z1)
+            frac = np.zeros(top.shape)
+            frac[ok] = (z0[ok] - th) / (z0[ok] - z1[ok])
+            top = top + frac * (alt[above] - alt[index])
+
+        echo_tops[j] = top
+
+    return np.ma.masked_array(echo_tops, mask = mask)
+
 def echo_tops_array(data, alt, thres):
     """
     Compute echo tops from reflectivity data
@@ -25,25 +84,10 @@ def echo_tops_array(data, alt, thres):
         A 2D numpy masked array containing the echo top. Units: km
     """
 
-    arr_thres = data >= thres
-    arr_index = np.empty(arr_thres.shape)
-    arr_index[:]= -1
-
-    for lev in range(arr_thres.shape[0]):
-        arr_index[lev, arr_thres[lev, :, :]] = lev
-
-    arr_index = np.ma.masked_where(arr_index == -1, arr_index)
-    arr_mask = np.logical_and.reduce(arr_index.mask)
-    index = np.argmax(arr_index, axis=0)
+    return echo_tops_stack(data, alt, [thres])[0]
 
-    lev = list(range(len(alt)))
-    ix = np.digitize(index.ravel(), lev, right=True)
-    echo_tops = alt[ix].reshape(index.shape)
-    echo_tops = np.ma.masked_where(arr_mask, echo_tops)
-
-    return echo_tops
-
-def compute_echo_tops(grid, thres = [10., 15., 20.], field_name = "DBZ_F"):
+def compute_echo_tops(grid, thres = [10., 15., 20.], field_name = "DBZ_F",
+                      interpolate = False):
     """
     Compute echo tops from reflectivity data
 
@@ -59,6 +103,8 @@ def compute_echo_tops(grid, thres = [10., 15., 20.], field_name = "DBZ_F"):
         List of the DBZ thresholds to be used.
     field_name : str
         Name of the reflectivity to be used.
+    interpolate: boolean
+        Interpolate the echo tops between the levels. Default False
 
     Returns
     -------
@@ -82,8 +128,10 @@ def compute_echo_tops(grid, thres = [10., 15., 20.], field_name = "DBZ_F"):
     alt = grid.z['data']/1000
     data = grid.fields[field_name]['data']
 
-    for th in thres:
-        echo_tops = echo_tops_array(data, alt, th)
+    tops = echo_tops_stack(data, alt, thres, interpolate)
+
+    for j, th in enumerate(thres):
+        echo_tops = tops[j]
 
         th_str = ('%f' % th).rstrip('0').rstrip('.')
         echo_dict = {
@@ -0,0 +1,241 @@
+import os
+import hashlib
+import threading
+import collections
+import numpy as np
+import pyart
+from scipy.spatial import cKDTree
+
+class GateGeometryCache:
+    """
+    Cache of the geographic coordinates of the gates of a radar polar volume
+
+    The gate coordinates only depend on the scan geometry, the volumes
+    with the same radar location, fixed angles, azimuth and elevation tables
+    and range gates share the same longitude, latitude and altitude arrays.
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of scan geometries kept in memory, the least recently
+        used geometry is removed first. Default 8
+    cache_dir: string or None
+        Full path to a folder where to save the coordinates as .npy files,
+        None to keep them only in memory. Default None
+    """
+
+    def __init__(self, maxsize = 8, cache_dir = None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._cache = collections.OrderedDict()
+        self._index = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, radar):
+        """
+        Get the coordinates of the gates of a radar volume
+
+        Parameters
+        ----------
+        radar: pyart radar polar object
+
+        Returns
+        -------
+        A dictionary with keys 'lon', 'lat' and 'z', 2d read-only numpy arrays
+        (nrays x ngates), 'z' is the height of the gates above the radar in meter.
+        """
+        key = geometry_key(radar)
+
+        with self._lock:
+            geom = self._cache.get(key)
+            if geom is not None:
+                self._cache.move_to_end(key)
+                return geom
+
+        geom = self._read_npy(key)
+        if geom is None:
+            geom = _compute_gate_geometry(radar)
+            self._write_npy(key, geom)
+
+        for v in geom.values():
+            v.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = geom
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last = False)
+
+        return geom
+
+    def points_index(self, radar, sweeps, points, filter_transitions = True):
+        """
+        Get the index of the nearest gates to a set of points
+
+        Parameters
+        ----------
+        radar: pyart radar polar object
+        sweeps: list
+            List of the index of the sweeps
+        points: list of dictionary
+            A list of the dictionary of the points, format
+            [{"id": "id_point1", "longitude": value_lon, "latitude": value_lat}, {...}, ...]
+        filter_transitions: boolean
+            Exclude the gates in antenna transition. Default True
+
+        Returns
+        -------
+        A dictionary with the sweeps as keys and a 1d numpy array of length len(points) as values,
+        containing the index of the nearest gates in the flattened sweep coordinates
+        returned by sweep_lat_lon_alt.
+        """
+        crds = np.array([[p['longitude'], p['latitude']] for p in points], dtype = np.float64)
+        trans = _transitions_key(radar) if filter_transitions else None
+        key = (geometry_key(radar), tuple(sweeps), trans, crds.tobytes())
+
+        with self._lock:
+            index = self._index.get(key)
+            if index is not None:
+                self._index.move_to_end(key)
+                return index
+
+        index = dict()
+        for swp in sweeps:
+            lat, lon, _ = self.sweep_lat_lon_alt(radar, swp, filter_transitions)
+            tree = cKDTree(np.column_stack((lon.ravel(), lat.ravel())))
+            _, ixy = tree.query(crds)
+            index[swp] = ixy
+
+        with self._lock:
+            self._index[key] = index
+            self._index.move_to_end(key)
+            while len(self._index) > self.maxsize:
+                self._index.popitem(last = False)
+
+        return index
+
+    def sweep_lat_lon_alt(self, radar, sweep, filter_transitions = True):
+        """
+        Cached equivalent of radar.get_gate_lat_lon_alt
+        """
+        geom = self.get(radar)
+        sweep_slice = radar.get_slice(sweep)
+        lat = geom['lat'][sweep_slice]
+        lon = geom['lon'][sweep_slice]
+        alt = geom['z'][sweep_slice] + radar.altitude['data']
+
+        if filter_transitions and radar.antenna_transition is not None:
+            in_trans = radar.antenna_transition['data'][sweep_slice]
+            lat = lat[in_trans == 0]
+            lon = lon[in_trans == 0]
+            alt = alt[in_trans == 0]
+
+        return lat, lon, alt
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._index.clear()
+
+    def _npy_files(self, key):
+        return dict((v, os.path.join(self.cache_dir, key + '_' + v + '.npy'))
+                    for v in ['lon', 'lat', 'z'])
+
+    def _read_npy(self, key):
+        if self.cache_dir is None:
+            return None
+
+        files = self._npy_files(key)
+        if not all([os.path.isfile(f) for f in files.values()]):
+            return None
+
+        return dict((v, np.load(f)) for v, f in files.items())
+
+    def _write_npy(self, key, geom):
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+        for v, f in self._npy_files(key).items():
+            # write to a temporary file first, the cache folder can be
+            # shared by several processes
+            tmp = f + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp, 'wb') as fl:
+                np.save(fl, geom[v])
+            os.replace(tmp, f)
+
+def geometry_key(radar):
+    """
+    Hash of the scan geometry of a radar volume
+    """
+    sha = hashlib.sha1()
+    for x in [radar.latitude, radar.longitude, radar.altitude, radar.fixed_angle,
+              radar.azimuth, radar.elevation, radar.range]:
+        arr = np.ascontiguousarray(x['data'], dtype = np.float64)
+        sha.update(str(arr.shape).encode())
+        sha.update(arr.tobytes())
+
+    proj = radar.projection.copy()
+    sha.update(str(sorted(proj.items())).encode())
+
+    return sha.hexdigest()
+
+def _transitions_key(radar):
+    # hash of the antenna transition flags, the gates in transition
+    # are left out of the nearest gates search
+    if radar.antenna_transition is None:
+        return None
+
+    arr = np.ascontiguousarray(np.ma.getdata(radar.antenna_transition['data']), dtype = np.int8)
+
+    return hashlib.sha1(arr.tobytes()).hexdigest()
+
+def _compute_gate_geometry(radar):
+    x = radar.gate_x['data']
+    y = radar.gate_y['data']
+    z = radar.gate_z['data']
+
+    projparams = radar.projection.copy()
+    projparams['lon_0'] = radar.longitude['data'][0]
+    projparams['lat_0'] = radar.latitude['data'][0]
+    lon, lat = pyart.core.cartesian_to_geographic(x, y, projparams)
+
+    return {'lon': np.asarray(lon), 'lat': np.asarray(lat), 'z': np.asarray(z)}
+
+############################
+
+_geometry_cache = GateGeometryCache()
+
+def configure_geometry_cache(maxsize = 8, cache_dir = None):
+    """
+    Replace the default gate geometry cache
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of scan geometries kept in memory. Default 8
+    cache_dir: string or None
+        Full path to a folder where to save the coordinates as .npy files,
+        None to keep them only in memory. Default None
+    """
+    global _geometry_cache
+    _geometry_cache = GateGeometryCache(maxsize, cache_dir)
+
+def gate_geometry(radar):
+    """
+    Get the longitude, latitude and height of the gates from the default cache
+    """
+    return _geometry_cache.get(radar)
+
+def sweep_lat_lon_alt(radar, sweep, filter_transitions = True):
+    """
+    Cached equivalent of radar.get_gate_lat_lon_alt
+    """
+    return _geometry_cache.sweep_lat_lon_alt(radar, sweep, filter_transitions)
+
+def points_gate_index(radar, sweeps, points, filter_transitions = True):
+    """
+    Get the index of the nearest gates to a set of points from the default cache,
+    see GateGeometryCache.points_index
+    """
+    return _geometry_cache.points_index(radar, sweeps, points, filter_transitions)
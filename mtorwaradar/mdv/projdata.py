@@ -1,11 +1,12 @@
 import numpy as np
 import pyart
 import cartopy
+from .polargeom import gate_geometry, sweep_lat_lon_alt
 
 def polar_projData(radar, sweep, field):
     sweep_slice = radar.get_slice(sweep)
     data = radar.fields[field]['data'][sweep_slice]
-    lat, lon, alt = radar.get_gate_lat_lon_alt(sweep, filter_transitions = True)
+    lat, lon, alt = sweep_lat_lon_alt(radar, sweep, filter_transitions = True)
 
     return lon, lat, data
 
@@ -96,16 +97,9 @@ def cart_xyzData(grid, field):
 ############################
 
 def polar_coordsGeo3d(radar):
-    x = radar.gate_x['data']
-    y = radar.gate_y['data']
-    z = radar.gate_z['data']
+    geom = gate_geometry(radar)
 
-    projparams = radar.projection.copy()
-    projparams['lon_0'] = radar.longitude['data'][0]
-    projparams['lat_0'] = radar.latitude['data'][0]
-    lon, lat = pyart.core.cartesian_to_geographic(x, y, projparams)
-
-    return lon, lat, z
+    return geom['lon'], geom['lat'], geom['z']
 
 def polar_coordsGeoCRS3d(radar):
     x = radar.gate_x['data']
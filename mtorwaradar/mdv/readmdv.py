@@ -1,106 +1,319 @@
+import bz2
+import copy
+import gzip
+import zlib
+import warnings
 import numpy as np
 import pyart
+from pyart.io import mdv_common
 
-def radarPolar(filename, fields = 'all'):
+def _decode_rle8(compr_data, key, nbytes):
+    # 8-bit run length decoding, a run is coded with 3 bytes: key, count, value
+    # (pyart.io.mdv_common._decode_rle8 counts with numpy uint8 and wraps
+    # after 255 bytes with numpy >= 2)
+    key = bytes([key])
+    out = bytearray()
+    pos = 0
+    while True:
+        k = compr_data.find(key, pos)
+        if k < 0:
+            out += compr_data[pos:]
+            break
+        out += compr_data[pos:k]
+        out += compr_data[k + 2:k + 3] * compr_data[k + 1]
+        pos = k + 3
+
+    return bytes(out[:nbytes])
+
+class MdvReader:
+    """
+    Reader of a MDV file, the file is opened and its headers parsed only once
+
+    The headers are parsed by the pyart reader when the radar or grid object
+    is created, the parsed file is then reused for the field names, the
+    geometry and the sweeps data. The data of a field are decompressed
+    on first access only.
+
+    The reader does not cache the decompressed data: a field loaded through
+    a pyart object is kept by this object only, and level_data decompresses
+    the requested levels at each call.
+
+    Parameters
+    ----------
+    filename: string
+        Full path to the MDV file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._fileptr = pyart.io.common.prepare_for_read(filename)
+        self._mdvfile = None
+
+    @property
+    def _mdv(self):
+        # the headers are parsed here only if no pyart object was created before
+        if self._mdvfile is None:
+            self._fileptr.seek(0)
+            self._mdvfile = mdv_common.MdvFile(self._fileptr)
+        return self._mdvfile
+
+    @property
+    def field_names(self):
+        return list(self._mdv.fields)
+
+    @property
+    def times(self):
+        return self._mdv.times
+
+    @property
+    def geometry(self):
+        """
+        Dictionary of the dimensions, origin and grid spacing from the first field header
+        """
+        fh = self._mdv.field_headers[0]
+        nz = fh['nz']
+        return {'nx': fh['nx'], 'ny': fh['ny'], 'nz': nz,
+                'minx': fh['grid_minx'], 'miny': fh['grid_miny'],
+                'dx': fh['grid_dx'], 'dy': fh['grid_dy'],
+                'origin_lon': fh['proj_origin_lon'],
+                'origin_lat': fh['proj_origin_lat'],
+                'vlevels': np.array(self._mdv.vlevel_headers[0]['level'][:nz]),
+                'projection': self._mdv.projection}
+
+    def _select_fields(self, obj, fields = 'all'):
+        # keep only the given fields of a pyart object read with all the fields
+        # 'all': keep all fields
+        # None : only metadata
+        # list of fields or a str of one field: the fields to keep
+        # the fields are lazy, the data of the fields dropped are never read
+
+        # reuse the file parsed by the pyart reader
+        if self._mdvfile is None:
+            for fdic in obj.fields.values():
+                extractor = getattr(fdic, '_lazyload', {}).get('data')
+                if extractor is not None:
+                    self._mdvfile = extractor.mdvfile
+                    break
+
+        if fields == 'all':
+            return obj
+        if fields is None:
+            fields = []
+        if not isinstance(fields, list):
+            fields = [fields]
+        obj.fields = dict((k, v) for k, v in obj.fields.items() if k in fields)
+
+        return obj
+
+    def level_data(self, field, levels):
+        """
+        Read some vertical levels (sweeps for a polar file) of one field,
+        only the requested levels are decompressed
+
+        Parameters
+        ----------
+        field: string
+            The name of the field
+        levels: list of integer
+            The index of the levels
+
+        Returns
+        -------
+        A numpy masked array (len(levels) x ny x nx), masked as the fields
+        of the pyart objects
+        """
+        fnum = self._mdv.fields.index(field)
+        fh = self._mdv.field_headers[fnum]
+        nz = fh['nz']
+
+        # walk through the compression headers of the levels, the data
+        # of the levels not requested are skipped without being decompressed
+        # (the offsets table is not used, some writers leave it wrong)
+        self._fileptr.seek(fh['field_data_offset'])
+        self._mdv._get_levels_info(nz)
+
+        levels = list(levels)
+        data = np.empty((len(levels), fh['ny'], fh['nx']), dtype = 'float32')
+        for lev in range(max(levels) + 1):
+            compr_data, compr_info = self._read_level()
+            if lev not in levels:
+                continue
+            sw_data = self._decode_level(fh, compr_data, compr_info)
+            for i in [i for i, x in enumerate(levels) if x == lev]:
+                data[i] = sw_data
+
+        fill_value = pyart.config.get_fillvalue()
+        data[np.isnan(data)] = fill_value
+        data[data == 131072] = fill_value
+
+        return np.ma.masked_equal(data, fill_value)
+
+    def _read_level(self):
+        # read the compressed data of the level at the current position of the file
+        compr_info = self._mdv._get_compression_info()
+        if compr_info['magic_cookie'] == mdv_common.RL8_COMPRESSION:
+            self._fileptr.seek(-4, 1)
+            compr_data = self._fileptr.read(compr_info['spare'][0])
+        else:
+            compr_data = self._fileptr.read(compr_info['nbytes_coded'])
+
+        return compr_data, compr_info
+
+    def _decode_level(self, fh, compr_data, compr_info):
+        # as pyart.io.mdv_common.MdvFile.read_a_field
+        mdv = mdv_common
+        nx = fh['nx']
+        ny = fh['ny']
+        cookie = compr_info['magic_cookie']
+
+        np_form = {mdv.ENCODING_INT8: '>B',
+                   mdv.ENCODING_INT16: '>H',
+                   mdv.ENCODING_FLOAT32: '>f'}.get(fh['encoding_type'])
+        if np_form is None:
+            raise NotImplementedError('encoding: ', fh['encoding_type'])
+
+        if cookie == mdv.GZIP_COMPRESSED:
+            nbytes = nx * ny * np.dtype(np_form).itemsize
+            decompr_data = gzip.decompress(compr_data)[:nbytes]
+        elif cookie == mdv.ZLIB_COMPRESSED:
+            decompr_data = zlib.decompress(compr_data)
+        elif cookie == mdv.BZIP_COMPRESSED:
+            decompr_data = bz2.decompress(compr_data)
+        elif cookie in [mdv.TA_NOT_COMPRESSED, mdv.GZIP_NOT_COMPRESSED,
+                        mdv.ZLIB_NOT_COMPRESSED, mdv.BZIP_NOT_COMPRESSED]:
+            decompr_data = compr_data
+        elif cookie == mdv.RL8_COMPRESSION:
+            decompr_data = _decode_rle8(compr_data,
+                                        compr_info['nbytes_uncompressed'],
+                                        compr_info['nbytes_coded'])
+        else:
+            raise NotImplementedError('unknown compression mode')
+
+        data = np.frombuffer(decompr_data, np_form).astype('float32').reshape((ny, nx))
+        data[data == fh['bad_data_value']] = np.nan
+
+        return data * fh['scale'] + fh['bias']
+
+    def radar(self, fields = 'all', sweeps = None):
+        """
+        Get a pyart radar polar object, the fields are loaded on first access
+
+        Parameters
+        ----------
+        fields: string, list or None
+            'all': read all fields
+            None : only read metadata
+            list of fields or a str of one field: the fields to be read
+        sweeps: list or None
+            The index of the sweeps to read, see extract_sweeps.
+            Default None, all the sweeps
+        """
+        self._fileptr.seek(0)
+        radar = pyart.io.read_mdv(self._fileptr,
+                                  file_field_names = True,
+                                  delay_field_loading = True)
+        radar = self._select_fields(radar, fields)
+        if sweeps is not None:
+            radar = self.extract_sweeps(radar, sweeps)
+
+        return radar
+
+    def extract_sweeps(self, radar, sweeps):
+        """
+        Extract some sweeps from a radar object created by this reader,
+        only the data of these sweeps are decompressed
+
+        Parameters
+        ----------
+        radar: pyart radar polar object
+            Output from the method radar, the fields not yet loaded
+        sweeps: list of integer
+            The index of the sweeps
+
+        Returns
+        -------
+        A pyart radar polar object with the fields loaded, the sweeps
+        are numbered from 0 in the order of "sweeps"
+        """
+        sweeps = list(sweeps)
+        sub = copy.copy(radar)
+        sub.fields = dict()
+        sub = sub.extract_sweeps(sweeps)
+
+        for field, fdic in radar.fields.items():
+            meta = dict((k, fdic[k]) for k in fdic.keys() if k != 'data')
+            data = self.level_data(field, sweeps)
+            data.shape = (data.shape[0] * data.shape[1], data.shape[2])
+            meta['data'] = data
+            sub.fields[field] = meta
+
+        return sub
+
+    def grid(self, fields = 'all'):
+        """
+        Get a pyart grid object, the fields are loaded on first access
+        """
+        self._fileptr.seek(0)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            grid = pyart.io.read_grid_mdv(self._fileptr,
+                                          file_field_names = True,
+                                          delay_field_loading = True)
+        return self._select_fields(grid, fields)
+
+    def close(self):
+        """
+        Close the file, the fields not yet loaded by the pyart objects
+        created by this reader cannot be read anymore
+        """
+        self._fileptr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def radarPolar(filename, fields = 'all', sweeps = None):
     # fields
     # 'all': read all fields
     # None : only read metadata
     # list of fields or a str of one field: the fields to be read
+    # sweeps
+    # None: all the sweeps, the fields are loaded on first access and the file
+    #       stays open until the radar object is deleted
+    # list of the index of the sweeps to read, only these sweeps are decompressed,
+    #       the fields are loaded and the file is closed before returning
 
-    field_names = ['DBZ', 'DBZ_F', 'DBZVC', 'DBZVC_F', 'DBZHC', 'DBZHC_F',
-                   'VEL', 'VEL_F', 'ZDR', 'ZDR_F', 'NCP', 'NCP_F',
-                   'SNR', 'SNR_F', 'SNRHC', 'SNRHC_F', 'SNRVC', 'SNRVC_F',
-                   'DBMHC', 'DBMVC', 'WIDTH', 'WIDTH_F', 'PHIDP', 'PHIDP_F',
-                   'RHOHV', 'RHOHV_F', 'KDP', 'KDP_F', 'CMD_FLAG']
+    reader = MdvReader(filename)
+    if sweeps is None:
+        return reader.radar(fields)
 
-    if fields is not None:
-        if fields == 'all':
-            fields_excl = None
-        else:
-            if not isinstance(fields, list):
-                fields = [fields]
-            fields_excl = [x for x in field_names if x not in fields]
-    else:
-        fields_excl = field_names
-
-    radar = pyart.io.read_mdv(filename,
-                              exclude_fields = fields_excl,
-                              file_field_names = True,
-                              delay_field_loading = True)
-    return radar
+    with reader:
+        return reader.radar(fields, sweeps)
 
 def radarPolarDerived(filename, fields = 'all'):
     # fields
     # 'all': read all fields
     # None : only read metadata
     # list of fields or a str of one field: the fields to be read
+    # the fields are loaded on first access, the file stays open until
+    # the returned object is deleted
 
-    field_names = ['RATE_ZH', 'RATE_Z_ZDR', 'RATE_KDP', 'RATE_KDP_ZDR',
-                   'RATE_HYBRID', 'RATE_PID', 'PID']
-
-    if fields is not None:
-        if fields == 'all':
-            fields_excl = None
-        else:
-            if not isinstance(fields, list):
-                fields = [fields]
-            fields_excl = [x for x in field_names if x not in fields]
-    else:
-        fields_excl = field_names
-
-    radar = pyart.io.read_mdv(filename,
-                              exclude_fields = fields_excl,
-                              file_field_names = True,
-                              delay_field_loading = True)
-    return radar
+    return MdvReader(filename).radar(fields)
 
 def radarCart(filename, fields = 'all'):
     # fields
     # 'all': read all fields
     # None : only read metadata
     # list of fields or a str of one field: the fields to be read
+    # the fields are loaded on first access, the file stays open until
+    # the returned object is deleted
 
-    field_names = ['DBZ', 'DBZ_F', 'DBZHC_F', 'DBZVC_F',
-                   'NCP', 'CLUT', 'VEL', 'VEL_F']
-
-    if fields is not None:
-        if fields == 'all':
-            fields_excl = None
-        else:
-            if not isinstance(fields, list):
-                fields = [fields]
-            fields_excl = [x for x in field_names if x not in fields]
-    else:
-        fields_excl = field_names
-
-    grid = pyart.io.read_grid_mdv(filename,
-                                  exclude_fields = fields_excl,
-                                  file_field_names = True,
-                                  delay_field_loading = True)
-    return grid
+    return MdvReader(filename).grid(fields)
 
 def radarGrid(filename, fields = 'all'):
-    mdv = pyart.io.mdv_common.MdvFile(pyart.io.common.prepare_for_read(filename))
-    field_names = mdv.fields
-
-    if fields is not None:
-        if fields == 'all':
-            fields_excl = None
-        else:
-            if not isinstance(fields, list):
-                fields = [fields]
-            fields_excl = [x for x in field_names if x not in fields]
-    else:
-        fields_excl = field_names
-
-    import warnings
-    with warnings.catch_warnings():
-        warnings.filterwarnings("ignore")
-        grid = pyart.io.read_grid_mdv(filename,
-                                      exclude_fields = fields_excl,
-                                      file_field_names = True,
-                                      delay_field_loading = True)
-    return grid
+    return MdvReader(filename).grid(fields)
 
 def grid_data(filename):
     grid = pyart.io.read_grid_mdv(filename,
@@ -0,0 +1,208 @@
+import threading
+import collections
+import numpy as np
+from .polargeom import geometry_key, gate_geometry
+
+class VadEngine:
+    """
+    Velocity azimuth display (Michelson method, as pyart.retrieve.vad_michelson)
+    for a series of radar volumes
+
+    The sweep geometry (ray index of each sweep, sine and cosine of the azimuths,
+    cosine of the elevation) and the averaging intervals of the gate heights around
+    the heights "z_want" only depend on the scan strategy, they are computed once
+    and reused by the volumes with the same geometry. For each volume, the wind
+    components are fitted at every range gate of each sweep with a single
+    least squares over all the rays of the sweep.
+
+    Unlike pyart.retrieve.vad_michelson, the masked gates are left out of the fit
+    (pyart includes the raw values under the mask), the results are identical
+    for a volume without masked gates.
+
+    Parameters
+    ----------
+    z_want: 1d numpy array
+        The heights in meters where to compute the wind, equally spaced
+    maxsize: integer
+        Maximum number of scan geometries kept in memory. Default 4
+    """
+
+    def __init__(self, z_want, maxsize = 4):
+        self.z_want = np.asarray(z_want, dtype = np.float64)
+        self.maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def geometry(self, radar):
+        """
+        Get the sweep geometry and the averaging intervals of a radar volume
+        """
+        key = geometry_key(radar)
+
+        with self._lock:
+            geom = self._cache.get(key)
+            if geom is not None:
+                self._cache.move_to_end(key)
+                return geom
+
+        geom = _vad_geometry(radar, self.z_want)
+
+        with self._lock:
+            self._cache[key] = geom
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last = False)
+
+        return geom
+
+    def compute(self, radar, vel_field):
+        """
+        Compute the VAD of a radar volume
+
+        Parameters
+        ----------
+        radar: pyart radar polar object
+        vel_field: string
+            The name of the radial velocity field
+
+        Returns
+        -------
+        A dictionary with keys 'height', 'speed', 'direction', 'u_wind' and 'v_wind',
+        1d numpy arrays as the attributes of pyart HorizontalWindProfile
+        """
+        geom = self.geometry(radar)
+        velocity = radar.fields[vel_field]['data']
+        vdata = np.ma.getdata(velocity)
+        valid = ~np.ma.getmaskarray(velocity) & np.isfinite(vdata)
+
+        speed = list()
+        angle = list()
+        for swp in geom['sweeps']:
+            i0, i1 = swp['rays']
+            spd, ang = _vad_sweep(vdata[i0:i1], valid[i0:i1], swp)
+            speed.append(spd)
+            angle.append(ang)
+
+        speed = np.concatenate(speed)[geom['order']]
+        angle = np.concatenate(angle)[geom['order']]
+        u_gate = np.sin(angle) * speed
+        v_gate = np.cos(angle) * speed
+
+        u_mean = _interval_mean(u_gate, geom['lower'], geom['upper'])
+        v_mean = _interval_mean(v_gate, geom['lower'], geom['upper'])
+
+        # as pyart HorizontalWindProfile.from_u_and_v
+        wspd = np.sqrt(u_mean * u_mean + v_mean * v_mean)
+        wdir = np.rad2deg(np.arctan2(-u_mean, -v_mean))
+        wdir[wdir < 0] += 360
+
+        return {
+            'height': self.z_want,
+            'speed': wspd,
+            'direction': wdir,
+            'u_wind': -np.sin(np.deg2rad(wdir)) * wspd,
+            'v_wind': -np.cos(np.deg2rad(wdir)) * wspd
+        }
+
+def _vad_geometry(radar, z_want):
+    gate_z = gate_geometry(radar)['z']
+    starts = radar.sweep_start_ray_index['data']
+    ends = radar.sweep_end_ray_index['data']
+    azimuth = radar.azimuth['data']
+
+    sweeps = list()
+    heights = list()
+    for i in range(len(starts)):
+        i0 = int(starts[i])
+        i1 = int(ends[i])
+        # even number of rays, as pyart (the last ray is left out)
+        if not (i1 - i0) % 2 == 0:
+            i1 = i1 - 1
+
+        az = np.deg2rad(azimuth[i0:i1].astype(np.float64))
+        sinaz = np.sin(az)
+        cosaz = np.cos(az)
+        sweeps.append({
+            'rays': (i0, i1),
+            'sin': sinaz,
+            'cos': cosaz,
+            'sincos': sinaz * cosaz,
+            'sin2': sinaz**2,
+            'cos2': cosaz**2,
+            'cos_elev': np.cos(np.deg2rad(radar.fixed_angle['data'][i]))
+        })
+        heights.append(gate_z[i0, :])
+
+    heights = np.concatenate(heights).astype(np.float64)
+    order = heights.argsort()
+    heights = heights[order]
+
+    delta = z_want[1] - z_want[0]
+    lower = _nearest_index(heights, z_want - delta / 2.)
+    upper = _nearest_index(heights, z_want + delta / 2.)
+
+    return {'sweeps': sweeps, 'order': order, 'lower': lower, 'upper': upper}
+
+def _nearest_index(sorted_z, target):
+    # index of the nearest sorted height, the first one in case of ties
+    i = np.clip(np.searchsorted(sorted_z, target), 1, len(sorted_z) - 1)
+    below = sorted_z[i - 1]
+    above = sorted_z[i]
+    ix = np.where((target - below)**2 <= (above - target)**2, i - 1, i)
+    return np.searchsorted(sorted_z, sorted_z[ix], side = 'left')
+
+def _interval_mean(data, lower, upper):
+    # mean of data[lower:upper], NaN if the interval is empty or contains a NaN
+    nan = np.isnan(data)
+    csum = np.concatenate([[0.], np.cumsum(np.where(nan, 0., data))])
+    cnan = np.concatenate([[0], np.cumsum(nan)])
+
+    count = upper - lower
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        out = (csum[upper] - csum[lower]) / count
+    out[(count <= 0) | (cnan[upper] - cnan[lower] > 0)] = np.nan
+
+    return out
+
+def _vad_sweep(vel, valid, swp):
+    # least squares fit of v - u_m = a sin(az) + b cos(az) at each gate (column)
+    w = valid.astype(np.float64)
+    vel = np.where(valid, vel, 0.).astype(np.float64)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        u_m = np.floor(vel.sum(axis = 0) / w.sum(axis = 0))
+        dv = (vel - u_m) * w
+
+        sumcos = swp['cos'] @ dv
+        sumsin = swp['sin'] @ dv
+        sumsincos = swp['sincos'] @ w
+        sumsin2 = swp['sin2'] @ w
+        sumcos2 = swp['cos2'] @ w
+
+        b_value = (sumcos - (sumsincos * sumsin / sumsin2)) / \
+                  (sumcos2 - (sumsincos**2) / sumsin2)
+        a_value = (sumsin - b_value * sumsincos) / sumsin2
+
+    speed = np.sqrt(a_value**2 + b_value**2) / swp['cos_elev']
+    angle = np.arctan2(a_value, b_value)
+
+    return speed, angle
+
+########
+
+_vad_engines = dict()
+_engines_lock = threading.Lock()
+
+def vad_batch(radar, vel_field, z_want):
+    """
+    Compute the VAD of a radar volume with the engine shared by the volumes
+    using the same heights "z_want", see VadEngine
+    """
+    key = np.asarray(z_want, dtype = np.float64).tobytes()
+    with _engines_lock:
+        engine = _vad_engines.get(key)
+        if engine is None:
+            engine = VadEngine(z_want)
+            _vad_engines[key] = engine
+
+    return engine.compute(radar, vel_field)
@@ -1,11 +1,8 @@
 import numpy as np
-import rpy2.robjects as robjects
-from rpy2.robjects.packages import importr
 
 from .projdata import grid_coordsGeo
-from ..util.utilities import npmDarray_to_rFloatVector, rFloatVector_to_npmDarray, uv_to_wind
-
-mtrwdata = importr('mtorwdata')
+from ..util.utilities import uv_to_wind
+from ..util.interpolation import interp_surface_grid
 
 def get_uv_ctrec(grid):
     lon, lat = grid_coordsGeo(grid)
@@ -14,11 +11,12 @@ def get_uv_ctrec(grid):
 
     return lon, lat, u_comp, v_comp
 
-def regrid_wind_ctrec(grid, res_x = 0.1, res_y = 0.1):
+def regrid_wind_ctrec(grid, res_x = 0.1, res_y = 0.1, backend = "R"):
     """ 
     Original resolution 500 meter or 0.0044936 degree.
     res_x: resolution in degree decimal for x
     res_y: resolution in degree decimal for y
+    backend: interpolation backend, "R" (package mtorwdata) or "python"
     """
 
     lon, lat, u_comp, v_comp = get_uv_ctrec(grid)
@@ -26,24 +24,13 @@ def regrid_wind_ctrec(grid, res_x = 0.1, res_y = 0.1):
     u_comp = np.ma.filled(u_comp, np.nan)
     v_comp = np.ma.filled(v_comp, np.nan)
 
-    x_d = robjects.FloatVector(lon)
-    y_d = robjects.FloatVector(lat)
-    u_d = npmDarray_to_rFloatVector(u_comp)
-    v_d = npmDarray_to_rFloatVector(v_comp)
-
     nx = round(np.ptp(lon)/res_x)
     ny = round(np.ptp(lat)/res_y)
     lon_new = np.linspace(lon.min(), lon.max(), nx)
     lat_new = np.linspace(lat.min(), lat.max(), ny)
 
-    x_g = robjects.FloatVector(lon_new)
-    y_g = robjects.FloatVector(lat_new)
-
-    u_out = mtrwdata.interp_surface_grid(x_d, y_d, u_d, x_g, y_g)
-    v_out = mtrwdata.interp_surface_grid(x_d, y_d, v_d, x_g, y_g)
-
-    u_out = rFloatVector_to_npmDarray(u_out, (nx, ny))
-    v_out = rFloatVector_to_npmDarray(v_out, (nx, ny))
+    u_out = interp_surface_grid(lon, lat, u_comp, lon_new, lat_new, backend = backend)
+    v_out = interp_surface_grid(lon, lat, v_comp, lon_new, lat_new, backend = backend)
 
     u_out = np.ma.masked_where(np.isnan(u_out), u_out)
     v_out = np.ma.masked_where(np.isnan(v_out), v_out)
@@ -54,13 +41,14 @@ def regrid_wind_ctrec(grid, res_x = 0.1, res_y = 0.1):
 
     return x_m, y_m, u_out, v_out
 
-def get_wind_ctrec(grid, res_x = 0.1, res_y = 0.1):
+def get_wind_ctrec(grid, res_x = 0.1, res_y = 0.1, backend = "R"):
     """ Original resolution 500 meter or 0.0044936 degree.
     res_x: resolution in degree decimal for x
     res_y: resolution in degree decimal for y
+    backend: interpolation backend, "R" (package mtorwdata) or "python"
     """
 
-    x, y, u, v = regrid_wind_ctrec(grid, res_x, res_y)
+    x, y, u, v = regrid_wind_ctrec(grid, res_x, res_y, backend)
     ws, wd = uv_to_wind(u, v)
 
     s_v = ws.flatten().data
@@ -3,17 +3,28 @@ import json
 import pyart
 import copy
 import datetime
+import functools
 from dateutil import tz
 
 from ..util.radarDateTime import polar_mdv_last_time
-from .writenc_qpecappi import writenc_qpecappi
+from ..util.parallel import run_time_steps
+from ..mdv.creategrid import grid_data_from_radar
+from .writenc_qpecappi import writenc_qpecappi, writenc_qpecappi_data
 from .precipCalc_polar import calculate_PrecipRate
 from .precipRadar_polar import radarPolarPrecipData
 
 def compute_qpecappi(start_time, end_time, dirSource, dirNCOUT,
                      pars_file, method = 'RATE_Z', cmdflag = True, cmdmask = "y",
                      grid_shape = (25, 800, 800), z_lim = (0., 12000.),
-                     y_lim = (-199750., 199750.), x_lim = (-199750., 199750.)):
+                     y_lim = (-199750., 199750.), x_lim = (-199750., 199750.),
+                     workers = 1, chunksize = 1, errors = "raise", grid_mapping = False):
+    """
+    grid_mapping: boolean
+        If True, the rain rate is gridded with the gate to grid mapping cached for the
+        scan geometry (mdv.creategrid.grid_data_from_radar) instead of pyart.map.grid_from_radars.
+        The gates in antenna transition and the masked gates are then left out, each grid point
+        takes the nearest valid gate within 2 km, and the grid origin is at sea level. Default False
+    """
     t0 = datetime.datetime.strptime(start_time, '%Y-%m-%d-%H-%M')
     t1 = datetime.datetime.strptime(end_time, '%Y-%m-%d-%H-%M')
     time_range = t1 - t0
@@ -23,27 +34,50 @@ def compute_qpecappi(start_time, end_time, dirSource, dirNCOUT,
 
     params = readJSON_params(pars_file, method)
 
-    for time in time_list:
-        params_c = copy.deepcopy(params)
-        radar = radarPolarPrecipData(dirSource, time, params_c, cmdflag, cmdmask)
-        if radar is None:
-            continue
-
-        calculate_qpecappi(radar, dirNCOUT, params_c, grid_shape, z_lim, y_lim, x_lim)
+    fun = functools.partial(_compute_qpecappi_time, dirSource = dirSource,
+                            dirNCOUT = dirNCOUT, params = params,
+                            cmdflag = cmdflag, cmdmask = cmdmask,
+                            grid_shape = grid_shape, z_lim = z_lim,
+                            y_lim = y_lim, x_lim = x_lim, grid_mapping = grid_mapping)
+    run_time_steps(fun, time_list, workers = workers, chunksize = chunksize,
+                   errors = errors)
 
     return 0
 
-def calculate_qpecappi(radar, dirNCOUT, params, grid_shape, z_lim, y_lim, x_lim):
+def _compute_qpecappi_time(time, dirSource, dirNCOUT, params, cmdflag, cmdmask,
+                           grid_shape, z_lim, y_lim, x_lim, grid_mapping = False):
+    params_c = copy.deepcopy(params)
+    radar = radarPolarPrecipData(dirSource, time, params_c, cmdflag, cmdmask)
+    if radar is None:
+        return None
+
+    calculate_qpecappi(radar, dirNCOUT, params_c, grid_shape, z_lim, y_lim, x_lim,
+                       grid_mapping)
+
+    return time
+
+def calculate_qpecappi(radar, dirNCOUT, params, grid_shape, z_lim, y_lim, x_lim,
+                       grid_mapping = False):
     """ 
     params is from json file: radarPolar_rate_user.json or radarPolar_rate_ops.json
+    grid_mapping: see compute_qpecappi
     """
     prrate = calculate_PrecipRate(radar, params)
-    grid_limits = (z_lim, y_lim, x_lim)
-    grid = pyart.map.grid_from_radars(prrate, fields = ['rain_rate'],
-                                      grid_shape = grid_shape, grid_limits = grid_limits,
-                                      gridding_algo = 'map_gates_to_grid', map_roi = False,
-                                      weighting_function = 'Nearest',
-                                      roi_func = 'constant', constant_roi = 2000.)
+    if grid_mapping:
+        grid = grid_data_from_radar(prrate, ['rain_rate'], grid_shape = grid_shape,
+                                    z_lim = z_lim, y_lim = y_lim, x_lim = x_lim,
+                                    constant_roi = 2000.)
+        projection = {'proj': 'pyart_aeqd',
+                      'lon_0': prrate.longitude['data'][0],
+                      'lat_0': prrate.latitude['data'][0]}
+        xlon, xlat = pyart.core.cartesian_to_geographic(grid['x'], grid['y'], projection)
+    else:
+        grid_limits = (z_lim, y_lim, x_lim)
+        grid = pyart.map.grid_from_radars(prrate, fields = ['rain_rate'],
+                                          grid_shape = grid_shape, grid_limits = grid_limits,
+                                          gridding_algo = 'map_gates_to_grid', map_roi = False,
+                                          weighting_function = 'Nearest',
+                                          roi_func = 'constant', constant_roi = 2000.)
 
     temps = polar_mdv_last_time(radar)
     temps = datetime.datetime.strptime(temps, '%Y-%m-%d %H:%M:%S UTC')
@@ -53,7 +87,10 @@ def calculate_qpecappi(radar, dirNCOUT, params, grid_shape, z_lim, y_lim, x_lim)
     timeu = 'seconds since 1970-01-01 00:00:00'
     outncfile = os.path.join(dirNCOUT, "qpe_" + timef + ".nc")
 
-    writenc_qpecappi(grid, timed, timeu, outncfile)
+    if grid_mapping:
+        writenc_qpecappi_data(xlon, xlat, grid['fields']['rain_rate'], timed, timeu, outncfile)
+    else:
+        writenc_qpecappi(grid, timed, timeu, outncfile)
 
 def readJSON_params(pars_file, method):
     """
@@ -2,21 +2,23 @@ import pyart
 import numpy as np
 import copy
 
-import rpy2.robjects as robjects
-import rpy2.robjects.vectors as rvect
-from rpy2.robjects.packages import importr
-
 import matplotlib.pyplot as plt
 import matplotlib.transforms as transforms
 
-from ..mdv.creategrid import create_grid_from_radar
+from ..mdv.creategrid import create_grid_from_radar, grid_data_from_radar
 from ..mdv.projdata import grid_coordsGeo, polar_coordsGeo3d
-from ..util.utilities import rFloatVector_to_npmDarray
-
-mtrwdata = importr("mtorwdata")
-
-
-def create_cappi_grid(radar, fields=["DBZ_F"], cappi="one_altitude", param_cappi=4.5):
+from ..util.interpolation import interp_ppi_ranges_cappi
+from ..util.precision import as_precision
+
+
+def create_cappi_grid(
+    radar,
+    fields=["DBZ_F"],
+    cappi="one_altitude",
+    param_cappi=4.5,
+    backend="R",
+    grid_mapping=False,
+):
     """
     Create CAPPI (Constant Altitude Plan Position Indicator)
     radar:
@@ -41,6 +43,14 @@ def create_cappi_grid(radar, fields=["DBZ_F"], cappi="one_altitude", param_cappi
             Example: param_cappi={'fun': 'maximum', 'min_alt': 1.7, 'max_alt': 15.}
         'ppi_ranges': float
             Value of the altitude at which the pseudo CAPPI will be created
+    backend: string
+        Interpolation backend used by 'ppi_ranges', "R" (package mtorwdata) or "python"
+    grid_mapping: boolean
+        If True, 'one_altitude' and 'composite_altitude' reuse the gate to grid mapping
+        computed for the scan geometry of the volume (see mdv.creategrid.GridMappingCache),
+        otherwise the grid is created with pyart.map.grid_from_radars. The mapping is kept
+        in memory by each process, about 10 MB for 'one_altitude' and 16 bytes per grid point
+        for 'composite_altitude' (280 MB from 1.7 to 15 km). Default False
 
     Returns: lon, lat, data
         lon: 1d numpy array
@@ -48,19 +58,18 @@ def create_cappi_grid(radar, fields=["DBZ_F"], cappi="one_altitude", param_cappi
         data: dictionary of the fields containing the data, 2d numpy masked ndarray
     """
     if cappi == "ppi_ranges":
-        lon, lat, data = ppi_ranges_cappi_data(radar, param_cappi, fields)
+        lon, lat, data = ppi_ranges_cappi_data(radar, param_cappi, fields, backend)
     elif cappi == "one_altitude":
         grid_shape = (1, 800, 800)
         z_lim = (param_cappi * 1000.0, param_cappi * 1000.0)
         constant_roi = 3000.0
-        grid = create_grid_from_radar(
-            radar, fields, grid_shape=grid_shape, z_lim=z_lim, constant_roi=constant_roi
+        lon, lat, grid_data = cappi_grid_data(
+            radar, fields, grid_shape, z_lim, constant_roi, grid_mapping
         )
-        lon, lat = grid_coordsGeo(grid)
 
         data = dict()
         for field in fields:
-            data[field] = grid.fields[field]["data"][0, :, :]
+            data[field] = grid_data[field][0, :, :]
     else:
         lev = np.arange(
             param_cappi["min_alt"] * 1000, param_cappi["max_alt"] * 1000, 500
@@ -68,10 +77,9 @@ def create_cappi_grid(radar, fields=["DBZ_F"], cappi="one_altitude", param_cappi
         grid_shape = (len(lev), 800, 800)
         z_lim = (lev[0], lev[len(lev) - 1])
         constant_roi = 2000.0
-        grid = create_grid_from_radar(
-            radar, fields, grid_shape=grid_shape, z_lim=z_lim, constant_roi=constant_roi
+        lon, lat, grid_data = cappi_grid_data(
+            radar, fields, grid_shape, z_lim, constant_roi, grid_mapping
         )
-        lon, lat = grid_coordsGeo(grid)
 
         data = dict()
         for field in fields:
@@ -84,12 +92,49 @@ def create_cappi_grid(radar, fields=["DBZ_F"], cappi="one_altitude", param_cappi
             else:
                 fun = np.amax
 
-            data[field] = fun(grid.fields[field]["data"], axis=0)
+            data[field] = fun(grid_data[field], axis=0)
+
+    for field in fields:
+        data[field] = as_precision(data[field])
 
     return lon, lat, data
 
 
-def ppi_ranges_cappi_data(radar, alt_cappi, fields):
+def cappi_grid_data(radar, fields, grid_shape, z_lim, constant_roi, grid_mapping=False):
+    """
+    Map the radar polar data to the 800 x 800 CAPPI grid
+
+    Returns: lon, lat, data
+        lon: 1d numpy array
+        lat: 1d numpy array
+        data: dictionary of the fields containing the data, 3d numpy masked ndarray
+    """
+    if not grid_mapping:
+        grid = create_grid_from_radar(
+            radar, fields, grid_shape=grid_shape, z_lim=z_lim, constant_roi=constant_roi
+        )
+        lon, lat = grid_coordsGeo(grid)
+
+        data = dict()
+        for field in fields:
+            data[field] = grid.fields[field]["data"]
+
+        return lon, lat, data
+
+    grid = grid_data_from_radar(
+        radar, fields, grid_shape=grid_shape, z_lim=z_lim, constant_roi=constant_roi
+    )
+    projection = {
+        "proj": "pyart_aeqd",
+        "lon_0": radar.longitude["data"][0],
+        "lat_0": radar.latitude["data"][0],
+    }
+    lon, lat = pyart.core.cartesian_to_geographic(grid["x"], grid["y"], projection)
+
+    return lon, lat, grid["fields"]
+
+
+def ppi_ranges_cappi_data(radar, alt_cappi, fields, backend="R"):
     """
     Create pseudo CAPPI from each elevation angle
     radar:
@@ -98,6 +143,8 @@ def ppi_ranges_cappi_data(radar, alt_cappi, fields):
         Value of the altitude at which the CAPPI will be created
     fields: list
         list of fields to be used to compute the qpe
+    backend: string
+        Interpolation backend, "R" (package mtorwdata) or "python"
 
     Returns: lon, lat, data
         lon: 1d numpy array
@@ -157,30 +204,16 @@ def ppi_ranges_cappi_data(radar, alt_cappi, fields):
         "lat_0": radar.latitude["data"][0],
     }
     lon, lat = pyart.core.cartesian_to_geographic(xgrd, ygrd, projection)
-    nx = len(lon)
-    ny = len(lat)
-
-    g_lon = robjects.FloatVector(lon)
-    g_lat = robjects.FloatVector(lat)
 
-    x_lon = robjects.FloatVector(xlon.flatten())
-    y_lat = robjects.FloatVector(ylat.flatten())
     x_data = dict()
-
     for field in fields:
-        xdat = data[field]
-        xdat = xdat.filled(np.nan)
-        x_data[field] = robjects.FloatVector(xdat.flatten())
-
-    x_data = rvect.ListVector(x_data)
+        x_data[field] = data[field].filled(np.nan)
 
     ########
-    out = mtrwdata.interp_ppi_ranges_cappi(x_lon, y_lat, x_data, g_lon, g_lat)
-    out = dict(zip(out.names, out))
+    out = interp_ppi_ranges_cappi(xlon, ylat, x_data, lon, lat, backend=backend)
     out_data = dict()
     for field in fields:
         xdat = out[field]
-        xdat = rFloatVector_to_npmDarray(xdat, (nx, ny))
         xdat = xdat.transpose()
         xdat = np.ma.masked_invalid(xdat)
         xdat.fill_value = fill_value
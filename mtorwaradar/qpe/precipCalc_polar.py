@@ -1,29 +1,73 @@
+from ..util.utilities import ArgumentError
 from .precip_polar import *
 
 def calculate_PrecipRate(radar, params):
     """ 
     params is from json file: radarPolar_rate_user.json or radarPolar_rate_ops.json
+    The optional key 'low_memory' (default False) selects the low-allocation
+    kernels, see precip_polar.rate_all.
     """
+    low_memory = params.get('low_memory', False)
     if params['label'] == 'RATE_Z':
         rt = rate_zh(radar, dbz_field = 'DBZ_F', coef = params['rate_coef'],
                      dbz_thres = params['dbz_thres'], pia = params['pia'],
-                     filter_dbz = params['filter_dbz'])
+                     filter_dbz = params['filter_dbz'],
+                     low_memory = low_memory)
     elif params['label'] == 'RATE_ZPOLY':
         rt = rate_zpoly(radar, dbz_field = 'DBZ_F', dbz_thres = params['dbz_thres'],
-                        pia = params['pia'], filter_dbz = params['filter_dbz'])
+                        pia = params['pia'], filter_dbz = params['filter_dbz'],
+                        low_memory = low_memory)
     elif params['label'] == 'RATE_Z_ZDR':
         rt = rate_z_zdr(radar, dbz_field = 'DBZ_F', zdr_field = 'ZDR_F',
                         coef = params['rate_coef'], dbz_thres = params['dbz_thres'],
                         pia = params['pia'], filter_dbz = params['filter_dbz'],
-                        filter_zdr = params['filter_zdr'])
+                        filter_zdr = params['filter_zdr'],
+                        low_memory = low_memory)
     elif params['label'] == 'RATE_KDP':
         rt = rate_kdp(radar, kdp_field = 'KDP_F', coef = params['rate_coef'],
-                      filter_kdp = params['filter_kdp'])
+                      filter_kdp = params['filter_kdp'],
+                      low_memory = low_memory)
     elif params['label'] == 'RATE_KDP_ZDR':
         rt = rate_kdp_zdr(radar, kdp_field = 'KDP_F', zdr_field = 'ZDR_F',
                           coef = params['rate_coef'], filter_kdp = params['filter_kdp'],
-                          filter_zdr = params['filter_zdr'])
+                          filter_zdr = params['filter_zdr'],
+                          low_memory = low_memory)
     else:
         rt = None
 
     return rt
+
+def calculate_all_rates(radar, params):
+    """
+    Compute several precipitation rates in one pass over the radar volume,
+    the filters and the attenuation correction are applied only once.
+
+    params: dictionary, same format as for calculate_PrecipRate except
+        'labels': list of the methods, 'RATE_Z', 'RATE_ZPOLY', 'RATE_Z_ZDR',
+                  'RATE_KDP', 'RATE_KDP_ZDR' and 'RATE_HYBRID'
+        'rate_coefs': dictionary of the coefficients of each method, the keys are the methods,
+                      the default coefficients are used for the missing methods.
+                      Example: {'RATE_Z': {'alpha': 300, 'beta': 1.4, 'invCoef': False},
+                                'RATE_HYBRID': {'hybrid_aa': 10, 'hybrid_bb': 50, 'hybrid_cc': 100}}
+        The key 'rate_coef' (coefficients of a single method) is not accepted.
+        'low_memory': optional, see precip_polar.rate_all
+
+    Returns a dictionary with the methods as keys, same output as calculate_PrecipRate as values
+    """
+    labels = [x for x in params['labels'] if x in ['RATE_Z', 'RATE_ZPOLY', 'RATE_Z_ZDR',
+                                                   'RATE_KDP', 'RATE_KDP_ZDR', 'RATE_HYBRID']]
+    if len(labels) == 0:
+        return None
+
+    if 'rate_coef' in params and 'rate_coefs' not in params:
+        raise ArgumentError("The coefficients of the methods must be given in 'rate_coefs', " +
+                         "a dictionary with the methods as keys")
+
+    rt = rate_all(radar, methods = labels, coef = params.get('rate_coefs'),
+                  dbz_field = 'DBZ_F', zdr_field = 'ZDR_F', kdp_field = 'KDP_F',
+                  dbz_thres = params['dbz_thres'], pia = params['pia'],
+                  filter_dbz = params['filter_dbz'], filter_zdr = params['filter_zdr'],
+                  filter_kdp = params['filter_kdp'],
+                  low_memory = params.get('low_memory', False))
+
+    return rt
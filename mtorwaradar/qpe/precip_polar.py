@@ -1,134 +1,237 @@
 import inspect
 import numpy as np
 import copy
-from ..util.utilities import do_call, str2numeric_dict_args
+from ..util.utilities import ArgumentError, do_call, str2numeric_dict_args
 from ..util.pia import calculate_pia_dict_args
 from ..util.filter import *
+from ..util.precision import as_precision
 from .rain_rate import *
+from .rain_rate import _ftype
 
 def rate_zh(radar, dbz_field = 'DBZ_F',
             coef = {'alpha': 0.017, 'beta': 0.714, 'invCoef': True},
             dbz_thres = {'min_dbz': 20, 'max_dbz': 60}, 
-            pia = None, filter_dbz = None):
-    dbz = apply_filter_dict_args(radar, dbz_field, filter_dbz)
-    if dbz is None:
-        dbz = radar.fields[dbz_field]['data']
-
-    res_pia = calculate_pia_dict_args(radar, pia)
-    if res_pia is not None:
-        dbz = dbz + res_pia
-
-    dbz = np.ma.masked_invalid(dbz)
-
-    dbz_thres = str2numeric_dict_args(dbz_thres)
-    dbz = np.ma.masked_where(dbz < dbz_thres['min_dbz'], dbz)
-    dbz = dbz.filled(-999.)
-    dbz[dbz > dbz_thres['max_dbz']] = dbz_thres['max_dbz']
-    dbz = np.ma.masked_where(dbz == -999., dbz)
-
-    coef = dict((k, float(v) if type(v) is str else v) for k, v in coef.items())
-    rt = do_call(rr_zh, args = [dbz], kwargs = coef)
-    rt = np.ma.masked_where(rt < 0.1, rt)
+            pia = None, filter_dbz = None, low_memory = False):
+    dbz = _dbz_data(radar, dbz_field, dbz_thres, pia, filter_dbz, low_memory)
+    rt = _rate_zh_data(dbz, coef, low_memory)
     rt = _create_rain_rate_field(radar, rt)
 
     return rt
 
 def rate_zpoly(radar, dbz_field = 'DBZ_F',
                dbz_thres = {'min_dbz': 20, 'max_dbz': 60}, 
-               pia = None, filter_dbz = None):
-    dbz = apply_filter_dict_args(radar, dbz_field, filter_dbz)
-    if dbz is None:
-        dbz = radar.fields[dbz_field]['data']
+               pia = None, filter_dbz = None, low_memory = False):
+    dbz = _dbz_data(radar, dbz_field, dbz_thres, pia, filter_dbz, low_memory)
+    rt = _rate_zpoly_data(dbz, low_memory)
+    rt = _create_rain_rate_field(radar, rt)
 
-    res_pia = calculate_pia_dict_args(radar, pia)
-    if res_pia is not None:
-        dbz = dbz + res_pia
+    return rt
 
-    dbz = np.ma.masked_invalid(dbz)
+def rate_z_zdr(radar, dbz_field = 'DBZ_F', zdr_field = 'ZDR_F',
+               coef = {'alpha': 0.00786, 'beta_zh': 0.967, 'beta_zdr': -4.98},
+               dbz_thres = {'min_dbz': 20, 'max_dbz': 60},
+               pia = None, filter_dbz = None, filter_zdr = None, low_memory = False):
+    dbz = _dbz_data(radar, dbz_field, dbz_thres, pia, filter_dbz, low_memory)
+    zdr = _field_data(radar, zdr_field, filter_zdr, low_memory)
+    rt = _rate_z_zdr_data(dbz, zdr, coef, low_memory)
+    rt = _create_rain_rate_field(radar, rt)
 
-    dbz_thres = str2numeric_dict_args(dbz_thres)
-    dbz = np.ma.masked_where(dbz < dbz_thres['min_dbz'], dbz)
-    dbz = dbz.filled(-999.)
-    dbz[dbz > dbz_thres['max_dbz']] = dbz_thres['max_dbz']
-    dbz = np.ma.masked_where(dbz == -999., dbz)
+    return rt
 
-    rt = rr_zpoly(dbz)
-    rt = np.ma.masked_where(rt < 0.1, rt)
+def rate_kdp(radar, kdp_field = 'KDP_F',
+             coef = {'alpha': 53.3, 'beta': 0.669},
+             filter_kdp = None, low_memory = False):
+    kdp = _field_data(radar, kdp_field, filter_kdp, low_memory)
+    rt = _rate_kdp_data(kdp, coef, low_memory)
     rt = _create_rain_rate_field(radar, rt)
 
     return rt
 
-def rate_z_zdr(radar, dbz_field = 'DBZ_F', zdr_field = 'ZDR_F',
-               coef = {'alpha': 0.00786, 'beta_zh': 0.967, 'beta_zdr': -4.98},
-               dbz_thres = {'min_dbz': 20, 'max_dbz': 60},
-               pia = None, filter_dbz = None, filter_zdr = None):
+def rate_kdp_zdr(radar, kdp_field = 'KDP_F', zdr_field = 'ZDR_F',
+                 coef = {'alpha': 192, 'beta_kdp': 0.946, 'beta_zdr': -3.45},
+                 filter_kdp = None, filter_zdr = None, low_memory = False):
+    kdp = _field_data(radar, kdp_field, filter_kdp, low_memory)
+    zdr = _field_data(radar, zdr_field, filter_zdr, low_memory)
+    rt = _rate_kdp_zdr_data(kdp, zdr, coef, low_memory)
+    rt = _create_rain_rate_field(radar, rt)
+
+    return rt
+
+def rate_all(radar, methods = ['RATE_Z', 'RATE_Z_ZDR', 'RATE_KDP', 'RATE_KDP_ZDR', 'RATE_HYBRID'],
+             coef = None, dbz_field = 'DBZ_F', zdr_field = 'ZDR_F', kdp_field = 'KDP_F',
+             dbz_thres = {'min_dbz': 20, 'max_dbz': 60}, pia = None,
+             filter_dbz = None, filter_zdr = None, filter_kdp = None,
+             low_memory = False):
+    """
+    Compute several rain rates from one radar volume
+
+    The DBZ, ZDR and KDP fields are filtered, and the DBZ corrected for
+    attenuation, only once and shared by all the methods.
+
+    Parameters
+    ----------
+    radar: pyart radar polar object
+    methods: list
+        The rain rate methods, 'RATE_Z', 'RATE_ZPOLY', 'RATE_Z_ZDR', 'RATE_KDP',
+        'RATE_KDP_ZDR' and 'RATE_HYBRID' (blend of RATE_Z, RATE_Z_ZDR, RATE_KDP
+        and RATE_KDP_ZDR, see rain_rate.rr_hybrid)
+    coef: dictionary or None
+        The coefficients of each method, the keys are the methods, an ArgumentError is
+        raised for any other key. The default coefficients of the rate_* functions are used for the missing methods.
+        Example: {'RATE_Z': {'alpha': 300, 'beta': 1.4, 'invCoef': False},
+                  'RATE_HYBRID': {'hybrid_aa': 10, 'hybrid_bb': 50, 'hybrid_cc': 100}}
+    dbz_thres, pia, filter_dbz, filter_zdr, filter_kdp:
+        See rate_zh, rate_z_zdr and rate_kdp_zdr
+    low_memory: boolean
+        If True, the rates are computed on plain arrays with NaN for the missing
+        values with the low-allocation kernels of rain_rate (rr_*_array), instead
+        of masked arrays. Same results within the float rounding (relative
+        difference below 2e-5 in float32), the peak memory and the time are reduced.
+        RATE_HYBRID then evaluates its conditions as False on the masked rates
+        (rain_rate.rr_hybrid, mask_false = True), the default path keeps the
+        numpy.ma conditions. Also accepted by the rate_* functions.
+
+    Returns
+    -------
+    A dictionary with the methods as keys and a pyart radar object containing
+    the field 'rain_rate' as values
+    """
+    if coef is None:
+        coef = {}
+
+    known = ['RATE_Z', 'RATE_ZPOLY', 'RATE_Z_ZDR', 'RATE_KDP', 'RATE_KDP_ZDR', 'RATE_HYBRID']
+    unknown = [k for k in coef.keys() if k not in known]
+    if len(unknown) > 0:
+        raise ArgumentError("The keys of 'coef' must be the methods, unknown: " + ", ".join(unknown))
+
+    need = list(methods)
+    if 'RATE_HYBRID' in need:
+        need = need + ['RATE_Z', 'RATE_Z_ZDR', 'RATE_KDP', 'RATE_KDP_ZDR']
+
+    def _coef(method, fun):
+        if method in coef:
+            return coef[method]
+        return inspect.signature(fun).parameters['coef'].default
+
+    dbz = zdr = kdp = None
+    if any([m in need for m in ['RATE_Z', 'RATE_ZPOLY', 'RATE_Z_ZDR']]):
+        dbz = _dbz_data(radar, dbz_field, dbz_thres, pia, filter_dbz, low_memory)
+    if any([m in need for m in ['RATE_Z_ZDR', 'RATE_KDP_ZDR']]):
+        zdr = _field_data(radar, zdr_field, filter_zdr, low_memory)
+    if any([m in need for m in ['RATE_KDP', 'RATE_KDP_ZDR']]):
+        kdp = _field_data(radar, kdp_field, filter_kdp, low_memory)
+
+    rates = dict()
+    if 'RATE_Z' in need:
+        rates['RATE_Z'] = _rate_zh_data(dbz, _coef('RATE_Z', rate_zh), low_memory)
+    if 'RATE_ZPOLY' in need:
+        rates['RATE_ZPOLY'] = _rate_zpoly_data(dbz, low_memory)
+    if 'RATE_Z_ZDR' in need:
+        rates['RATE_Z_ZDR'] = _rate_z_zdr_data(dbz, zdr, _coef('RATE_Z_ZDR', rate_z_zdr),
+                                               low_memory)
+    if 'RATE_KDP' in need:
+        rates['RATE_KDP'] = _rate_kdp_data(kdp, _coef('RATE_KDP', rate_kdp), low_memory)
+    if 'RATE_KDP_ZDR' in need:
+        rates['RATE_KDP_ZDR'] = _rate_kdp_zdr_data(kdp, zdr, _coef('RATE_KDP_ZDR', rate_kdp_zdr),
+                                                   low_memory)
+    if 'RATE_HYBRID' in need:
+        hybrid_args = coef.get('RATE_HYBRID', {})
+        hybrid_args = _numeric_coef(hybrid_args)
+        hybrid_args['mask_false'] = low_memory
+        rates['RATE_HYBRID'] = do_call(rr_hybrid, args = [rates['RATE_Z'], rates['RATE_Z_ZDR'],
+                                       rates['RATE_KDP'], rates['RATE_KDP_ZDR']],
+                                       kwargs = hybrid_args)
+
+    return dict((m, _create_rain_rate_field(radar, rates[m])) for m in methods)
+
+#######
+
+def _field_data(radar, field, filter_pars, low_memory = False):
+    data = apply_filter_dict_args(radar, field, filter_pars)
+    if data is None:
+        data = radar.fields[field]['data']
+
+    data = as_precision(data)
+    if low_memory:
+        return _nan_array(data)
+
+    return np.ma.masked_invalid(data)
+
+def _dbz_data(radar, dbz_field, dbz_thres, pia, filter_dbz, low_memory = False):
     dbz = apply_filter_dict_args(radar, dbz_field, filter_dbz)
     if dbz is None:
         dbz = radar.fields[dbz_field]['data']
 
-    zdr = apply_filter_dict_args(radar, zdr_field, filter_zdr)
-    if zdr is None:
-        zdr = radar.fields[zdr_field]['data']
-
+    dbz = as_precision(dbz)
     res_pia = calculate_pia_dict_args(radar, pia)
     if res_pia is not None:
         dbz = dbz + res_pia
 
+    dbz_thres = str2numeric_dict_args(dbz_thres)
+    if low_memory:
+        dbz = _nan_array(dbz)
+        return threshold_dbz_array(dbz, dbz_thres['min_dbz'], dbz_thres['max_dbz'], out = dbz)
+
     dbz = np.ma.masked_invalid(dbz)
-    zdr = np.ma.masked_invalid(zdr)
 
-    dbz_thres = str2numeric_dict_args(dbz_thres)
     dbz = np.ma.masked_where(dbz < dbz_thres['min_dbz'], dbz)
     dbz = dbz.filled(-999.)
     dbz[dbz > dbz_thres['max_dbz']] = dbz_thres['max_dbz']
     dbz = np.ma.masked_where(dbz == -999., dbz)
 
-    coef = dict((k, float(v) if type(v) is str else v) for k, v in coef.items())
-    rt = do_call(rr_z_zdr, args = [dbz, zdr], kwargs = coef)
-    # rt = np.ma.masked_where(rt < 0.1, rt)
-    # rt = np.ma.masked_where(rt > 600., rt)
-    rt[rt > 600.] = 600.
-    rt = _create_rain_rate_field(radar, rt)
+    return dbz
 
-    return rt
+def _nan_array(x):
+    # plain array with NaN for the masked and invalid values, x is not modified
+    return masked_to_array(x, dtype = _ftype(x))
 
-def rate_kdp(radar, kdp_field = 'KDP_F',
-             coef = {'alpha': 53.3, 'beta': 0.669},
-             filter_kdp = None):
-    kdp = apply_filter_dict_args(radar, kdp_field, filter_kdp)
-    if kdp is None:
-        kdp = radar.fields[kdp_field]['data']
+def _numeric_coef(coef):
+    return dict((k, float(v) if type(v) is str else v) for k, v in coef.items())
 
-    kdp = np.ma.masked_invalid(kdp)
+def _mask_small_rate(rt, low_memory):
+    if low_memory:
+        with np.errstate(invalid = 'ignore'):
+            rt[rt < 0.1] = np.nan
+        return array_to_masked(rt)
 
-    coef = dict((k, float(v) if type(v) is str else v) for k, v in coef.items())
-    rt = do_call(rr_kdp, args = [kdp], kwargs = coef)
-    rt = np.ma.masked_where(rt < 0.1, rt)
-    rt = _create_rain_rate_field(radar, rt)
+    return np.ma.masked_where(rt < 0.1, rt)
 
-    return rt
+def _rate_zh_data(dbz, coef, low_memory = False):
+    fun = rr_zh_array if low_memory else rr_zh
+    rt = do_call(fun, args = [dbz], kwargs = _numeric_coef(coef))
 
-def rate_kdp_zdr(radar, kdp_field = 'KDP_F', zdr_field = 'ZDR_F',
-                 coef = {'alpha': 192, 'beta_kdp': 0.946, 'beta_zdr': -3.45},
-                 filter_kdp = None, filter_zdr = None):
-    kdp = apply_filter_dict_args(radar, kdp_field, filter_kdp)
-    if kdp is None:
-        kdp = radar.fields[kdp_field]['data']
+    return _mask_small_rate(rt, low_memory)
 
-    zdr = apply_filter_dict_args(radar, zdr_field, filter_zdr)
-    if zdr is None:
-        zdr = radar.fields[zdr_field]['data']
+def _rate_zpoly_data(dbz, low_memory = False):
+    rt = rr_zpoly_array(dbz) if low_memory else rr_zpoly(dbz)
 
-    kdp = np.ma.masked_invalid(kdp)
-    zdr = np.ma.masked_invalid(zdr)
+    return _mask_small_rate(rt, low_memory)
 
-    coef = dict((k, float(v) if type(v) is str else v) for k, v in coef.items())
-    rt = do_call(rr_kdp_zdr, args = [kdp, zdr], kwargs = coef)
-    rt = np.ma.masked_where(rt < 0.1, rt)
-    rt = _create_rain_rate_field(radar, rt)
+def _rate_z_zdr_data(dbz, zdr, coef, low_memory = False):
+    fun = rr_z_zdr_array if low_memory else rr_z_zdr
+    rt = do_call(fun, args = [dbz, zdr], kwargs = _numeric_coef(coef))
+    # rt = np.ma.masked_where(rt < 0.1, rt)
+    # rt = np.ma.masked_where(rt > 600., rt)
+    if low_memory:
+        np.minimum(rt, 600., out = rt)
+        return array_to_masked(rt)
+
+    rt[rt > 600.] = 600.
 
     return rt
 
+def _rate_kdp_data(kdp, coef, low_memory = False):
+    fun = rr_kdp_array if low_memory else rr_kdp
+    rt = do_call(fun, args = [kdp], kwargs = _numeric_coef(coef))
+
+    return _mask_small_rate(rt, low_memory)
+
+def _rate_kdp_zdr_data(kdp, zdr, coef, low_memory = False):
+    fun = rr_kdp_zdr_array if low_memory else rr_kdp_zdr
+    rt = do_call(fun, args = [kdp, zdr], kwargs = _numeric_coef(coef))
+
+    return _mask_small_rate(rt, low_memory)
+
 #######
 
 def _create_rain_rate_field(radar, rain_rate):
@@ -1,33 +1,41 @@
 import numpy as np
 import copy
 
+def _ftype(x):
+    # scalar type of the float array x, the masked array operations convert
+    # the python scalars to float64 arrays, which would upcast the float32 data
+    return np.result_type(x, np.float32).type
+
 def rr_zh(dbz, alpha = 0.017, beta = 0.714, invCoef = True):
     fill_value = dbz.fill_value
-    Z = np.ma.power(10., 0.1 * dbz)
+    ft = _ftype(dbz)
+    Z = np.ma.power(ft(10.), ft(0.1) * dbz)
     if(invCoef):
-        rt = alpha * np.ma.power(Z, beta)
+        rt = ft(alpha) * np.ma.power(Z, ft(beta))
     else:
-        rt = np.ma.power(Z / alpha, 1.0 / beta)
+        rt = np.ma.power(Z / ft(alpha), ft(1.0 / beta))
 
     rt.fill_value = fill_value
     return rt
 
 def rr_zpoly(dbz):
     fill_value = dbz.fill_value
+    ft = _ftype(dbz)
     X = dbz
     X2 = X * X
     X3 = X2 * X
     X4 = X3 * X
-    poly = -2.3 + 0.17 * X -5.1e-3 * X2 + 9.8e-5 * X3 - 6e-7 * X4
-    rt = np.ma.power(10., poly)
+    poly = ft(-2.3) + ft(0.17) * X - ft(5.1e-3) * X2 + ft(9.8e-5) * X3 - ft(6e-7) * X4
+    rt = np.ma.power(ft(10.), poly)
 
     rt.fill_value = fill_value
     return rt
 
 def rr_z_zdr(dbz, zdr, alpha = 0.00786, beta_zh = 0.967, beta_zdr = -4.98):
     fill_value = dbz.fill_value
-    Z = np.ma.power(10., 0.1 * dbz)
-    rt = alpha * np.ma.power(Z, beta_zh) * np.ma.power(zdr, beta_zdr)
+    ft = _ftype(dbz)
+    Z = np.ma.power(ft(10.), ft(0.1) * dbz)
+    rt = ft(alpha) * np.ma.power(Z, ft(beta_zh)) * np.ma.power(zdr, ft(beta_zdr))
     # rt = alpha * np.ma.power(dbz, beta_zh) * np.ma.power(zdr, beta_zdr)
 
     rt.fill_value = fill_value
@@ -35,26 +43,28 @@ def rr_z_zdr(dbz, zdr, alpha = 0.00786, beta_zh = 0.967, beta_zdr = -4.98):
 
 def rr_kdp(kdp, alpha = 53.3, beta = 0.669):
     fill_value = kdp.fill_value
+    ft = _ftype(kdp)
     # rt = np.sign(kdp) * alpha * np.ma.power(np.abs(kdp), beta)
     # rt = np.ma.masked_where(rt < 0, rt)
     kdp[kdp < 0] = 0.
-    rt = alpha * np.ma.power(kdp, beta)
+    rt = ft(alpha) * np.ma.power(kdp, ft(beta))
 
     rt.fill_value = fill_value
     return rt
 
 def rr_kdp_zdr(kdp, zdr, alpha = 192, beta_kdp = 0.946, beta_zdr = -3.45):
     fill_value = kdp.fill_value
+    ft = _ftype(kdp)
     # rt = np.sign(kdp) * alpha * np.ma.power(np.abs(kdp), beta_kdp) * np.ma.power(zdr, beta_zdr)
     # rt = np.ma.masked_where(rt < 0, rt)
     kdp[kdp < 0] = 0.
-    rt = alpha * np.ma.power(kdp, beta_kdp) * np.ma.power(zdr, beta_zdr)
+    rt = ft(alpha) * np.ma.power(kdp, ft(beta_kdp)) * np.ma.power(zdr, ft(beta_zdr))
 
     rt.fill_value = fill_value
     return rt
 
 def rr_hybrid(rt_zh, rt_z_zdr, rt_kdp, rt_kdp_zdr,
-              hybrid_aa = 10, hybrid_bb = 50, hybrid_cc = 100):
+              hybrid_aa = 10, hybrid_bb = 50, hybrid_cc = 100, mask_false = False):
     """
     PRECIP_RATE_HYBRID
     The HYBRID rate is a combination of the other rates.
@@ -63,21 +73,138 @@ def rr_hybrid(rt_zh, rt_z_zdr, rt_kdp, rt_kdp_zdr,
     Else if RATE_Z_ZDR <= hybrid_bb, RATE_HYBRID = RATE_Z_ZDR
     Else If RATE_Z_ZDR <= hybrid_cc, RATE_HYBRID = RATE_KDP_ZDR
     Else if RATE_Z_ZDR > hybrid_bb, RATE_HYBRID = RATE_KDP
+
+    mask_false: if True, the conditions are False for the masked rates and
+    do not depend on the data under the mask (used by the low_memory path of
+    precip_polar, the data under the mask being NaN there).
+    Default False, the conditions are evaluated as numpy.ma does.
     """
+    def _cond(x):
+        return np.ma.filled(x, False) if mask_false else x
+
     fill_value = rt_zh.fill_value
     hybrid = copy.deepcopy(rt_zh)
-    hybrid[np.logical_not(hybrid.mask)] = 0
-    
-    mask_aa = rt_zh <= hybrid_aa
+    hybrid[np.logical_not(np.ma.getmaskarray(hybrid))] = 0
+
+    mask_aa = _cond(rt_zh <= hybrid_aa)
     hybrid[mask_aa] = rt_zh[mask_aa]
-    mask_bb = np.logical_and(rt_z_zdr <= hybrid_bb, np.logical_not(mask_aa))
+    mask_bb = np.logical_and(_cond(rt_z_zdr <= hybrid_bb), np.logical_not(mask_aa))
     hybrid[mask_bb] = rt_z_zdr[mask_bb]
     mask_cc = np.logical_or(np.logical_not(mask_aa), np.logical_not(mask_bb))
-    mask_cc = np.logical_and(rt_z_zdr <= hybrid_cc, np.logical_not(mask_cc))
+    mask_cc = np.logical_and(_cond(rt_z_zdr <= hybrid_cc), np.logical_not(mask_cc))
     hybrid[mask_cc] = rt_kdp_zdr[mask_cc]
-    mask_ee = np.logical_and(rt_z_zdr > hybrid_bb, np.logical_not(mask_cc))
+    mask_ee = np.logical_and(_cond(rt_z_zdr > hybrid_bb), np.logical_not(mask_cc))
     hybrid[mask_ee] = rt_kdp[mask_ee]
 
     hybrid.fill_value = fill_value
     return hybrid
 
+
+#######
+## Low-allocation kernels
+## The inputs are plain float arrays with NaN for the missing values,
+## the result is computed in "out" (a new array of the dtype of the first
+## input if None) without masked temporaries. The non-finite results are
+## set to NaN, as np.ma.power masks them in the functions above.
+
+_LN10 = np.log(10.)
+
+def _out_array(x, out):
+    if out is None:
+        out = np.empty(np.shape(x), dtype = np.result_type(x, np.float32))
+    return out
+
+def _finite_or_nan(out):
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+def rr_zh_array(dbz, alpha = 0.017, beta = 0.714, invCoef = True, out = None):
+    out = _out_array(dbz, out)
+    with np.errstate(invalid = 'ignore', over = 'ignore'):
+        if(invCoef):
+            # alpha * (10^(0.1 dbz))^beta
+            np.multiply(dbz, 0.1 * beta * _LN10, out = out)
+            np.exp(out, out = out)
+            out *= alpha
+        else:
+            # (10^(0.1 dbz) / alpha)^(1/beta)
+            np.multiply(dbz, 0.1 * _LN10 / beta, out = out)
+            np.exp(out, out = out)
+            out *= alpha ** (-1.0 / beta)
+
+    return _finite_or_nan(out)
+
+def rr_zpoly_array(dbz, out = None):
+    out = _out_array(dbz, out)
+    # Horner scheme of -2.3 + 0.17 X - 5.1e-3 X^2 + 9.8e-5 X^3 - 6e-7 X^4
+    np.multiply(dbz, -6e-7, out = out)
+    for c in [9.8e-5, -5.1e-3, 0.17]:
+        out += c
+        out *= dbz
+    out += -2.3
+    with np.errstate(over = 'ignore'):
+        out *= _LN10
+        np.exp(out, out = out)
+
+    return _finite_or_nan(out)
+
+def rr_z_zdr_array(dbz, zdr, alpha = 0.00786, beta_zh = 0.967, beta_zdr = -4.98, out = None):
+    out = _out_array(dbz, out)
+    with np.errstate(invalid = 'ignore', divide = 'ignore', over = 'ignore'):
+        # alpha * exp(0.1 beta_zh ln10 dbz + beta_zdr ln(zdr))
+        tmp = np.log(zdr)
+        tmp *= beta_zdr
+        np.multiply(dbz, 0.1 * beta_zh * _LN10, out = out)
+        out += tmp
+        del tmp
+        np.exp(out, out = out)
+        out *= alpha
+
+    return _finite_or_nan(out)
+
+def rr_kdp_array(kdp, alpha = 53.3, beta = 0.669, out = None):
+    out = _out_array(kdp, out)
+    with np.errstate(invalid = 'ignore'):
+        np.maximum(kdp, 0., out = out)
+        np.power(out, beta, out = out)
+        out *= alpha
+
+    return _finite_or_nan(out)
+
+def rr_kdp_zdr_array(kdp, zdr, alpha = 192, beta_kdp = 0.946, beta_zdr = -3.45, out = None):
+    out = _out_array(kdp, out)
+    with np.errstate(invalid = 'ignore', divide = 'ignore', over = 'ignore'):
+        tmp = np.power(zdr, beta_zdr)
+        np.maximum(kdp, 0., out = out)
+        np.power(out, beta_kdp, out = out)
+        out *= tmp
+        del tmp
+        out *= alpha
+
+    return _finite_or_nan(out)
+
+def threshold_dbz_array(dbz, min_dbz = 20, max_dbz = 60, out = None):
+    """
+    Set to NaN the DBZ below min_dbz and clip the DBZ above max_dbz
+    """
+    out = _out_array(dbz, out)
+    with np.errstate(invalid = 'ignore'):
+        np.minimum(dbz, max_dbz, out = out)
+        out[dbz < min_dbz] = np.nan
+
+    return out
+
+def masked_to_array(x, dtype = np.float32):
+    """
+    Convert a masked array to a plain array with NaN for the masked values
+    """
+    return np.ma.filled(np.ma.asarray(x).astype(dtype), np.nan)
+
+def array_to_masked(x, fill_value = None):
+    """
+    Convert a plain array with NaN for the missing values to a masked array
+    """
+    x = np.ma.masked_invalid(x, copy = False)
+    if fill_value is not None:
+        x.fill_value = fill_value
+    return x
@@ -5,13 +5,27 @@ from netCDF4 import Dataset as ncdf
 
 
 def writenc_qpecappi(grid, timestamp, timeunits, outncfile, miss_val=-999.0):
-    pr = np.amax(grid.fields["rain_rate"]["data"], axis=0)
+    xlon, xlat = grid_coordsGeo(grid)
+    rain_rate = grid.fields["rain_rate"]["data"]
+
+    return writenc_qpecappi_data(
+        xlon, xlat, rain_rate, timestamp, timeunits, outncfile, miss_val
+    )
+
+
+def writenc_qpecappi_data(
+    xlon, xlat, rain_rate, timestamp, timeunits, outncfile, miss_val=-999.0
+):
+    """
+    Write the maximum over the levels of the gridded rain rate (z x lat x lon)
+    and the accumulation over 5 minutes, see writenc_qpecappi
+    """
+    pr = np.amax(rain_rate, axis=0)
     tot = pr * 300.0 / 3600.0
 
     # add time dimension
     pr = pr[np.newaxis, :, :]
     tot = tot[np.newaxis, :, :]
-    xlon, xlat = grid_coordsGeo(grid)
 
     # open a netCDF file to write
     ncout = ncdf(outncfile, mode="w", format="NETCDF4")
@@ -3,5 +3,9 @@ from . import colorbar
 from . import filter
 from . import pia
 from . import radarDateTime
+from . import parallel
+from . import interpolation
+from . import precision
+from . import watcher
 
 __all__ = [s for s in dir() if not s.startswith('_')]
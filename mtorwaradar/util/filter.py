@@ -3,6 +3,7 @@ import inspect
 from scipy import signal
 import pyart
 from .utilities import do_call, str2numeric_dict_args
+from .precision import get_precision, as_precision
 
 def apply_filter_dict_args(radar, filter_field, filter_pars = None, censor_fieldF = True):
     if filter_pars is not None:
@@ -56,36 +57,13 @@ def median_filter_censor(radar, filter_field,
     censor_f = radar.fields[censor_field]['data']
 
     # Initialize mask
-    mask = np.ones(filter_f.shape) * False
+    mask = np.zeros(filter_f.shape, dtype = bool)
     # Censoring
     mask += censor_f < censor_thres
     # Add filter_field mask
     mask += filter_f.mask
 
-    field_filter = np.zeros(filter_f.shape)
-    for i, row in enumerate(filter_f):
-        # idx of last valid gate
-        idx = np.where(~row.mask)[0]
-        if len(idx):
-            row = row[0:idx[-1] + 1]
-            row_with_nan = np.ma.filled(row, np.nan)
-            # To be sure to always have a left and right neighbour,
-            # we need to pad the signal with NaN
-            row_with_nan = np.pad(
-                row_with_nan, (1, 1), 'constant',
-                constant_values=(np.nan,))
-            idx = np.where(np.isfinite(row_with_nan))[0]
-            nan_left = idx[np.where(np.isnan(row_with_nan[idx - 1]))[0]]
-            nan_right = idx[np.where(np.isnan(row_with_nan[idx + 1]))[0]]
-
-            len_sub = nan_right - nan_left
-            for j, l in enumerate(len_sub):
-                if l < minsize_seq:
-                    mask[i, nan_left[j] - 1:nan_right[j] + 1] = True
-
-            # median filter
-            row = signal.medfilt(row_with_nan, median_filter_len)
-            field_filter[i, 0:len(row[1:-1])] = row[1:-1]
+    field_filter = _median_filter_range(filter_f, mask, median_filter_len, minsize_seq)
 
     field_filter = np.ma.masked_array(field_filter,
         mask = mask, fill_value = filter_f.fill_value)
@@ -94,39 +72,59 @@ def median_filter_censor(radar, filter_field,
 
 def median_filter(radar, filter_field, median_filter_len = 5, minsize_seq = 3):
     filter_f = radar.fields[filter_field]['data']
-    mask = np.ones(filter_f.shape) * False
+    mask = np.zeros(filter_f.shape, dtype = bool)
     mask += filter_f.mask
 
-    field_filter = np.zeros(filter_f.shape)
-    for i, row in enumerate(filter_f):
-        idx = np.where(~row.mask)[0]
-        if len(idx):
-            row = row[0:idx[-1] + 1]
-            row_with_nan = np.ma.filled(row, np.nan)
-            row_with_nan = np.pad(
-                row_with_nan, (1, 1), 'constant',
-                constant_values=(np.nan,))
-            idx = np.where(np.isfinite(row_with_nan))[0]
-            nan_left = idx[np.where(np.isnan(row_with_nan[idx - 1]))[0]]
-            nan_right = idx[np.where(np.isnan(row_with_nan[idx + 1]))[0]]
-
-            len_sub = nan_right - nan_left
-            for j, l in enumerate(len_sub):
-                if l < minsize_seq:
-                    mask[i, nan_left[j] - 1:nan_right[j] + 1] = True
-
-            row = signal.medfilt(row_with_nan, median_filter_len)
-            field_filter[i, 0:len(row[1:-1])] = row[1:-1]
+    field_filter = _median_filter_range(filter_f, mask, median_filter_len, minsize_seq)
 
     field_filter = np.ma.masked_array(field_filter,
         mask = mask, fill_value = filter_f.fill_value)
 
     return field_filter
 
+def _median_filter_range(filter_f, mask, median_filter_len, minsize_seq):
+    # Median filter in range applied to all the rays at once.
+    # Each ray is truncated after its last valid gate and padded with NaN
+    # on both sides, the sequences of valid gates shorter than or equal
+    # to minsize_seq and the gate following them are added to mask
+    # (modified in place).
+    nrays, ngates = filter_f.shape
+    valid = ~np.ma.getmaskarray(filter_f)
+    has_valid = valid.any(axis = 1)
+    # number of gates up to the last valid gate
+    nlen = ngates - np.argmax(valid[:, ::-1], axis = 1)
+    nlen[~has_valid] = 0
+
+    col = np.arange(ngates + 2)[np.newaxis, :]
+    nlen = nlen[:, np.newaxis]
+    padded = np.empty((nrays, ngates + 2), dtype = get_precision())
+    padded[:, 1:-1] = np.ma.filled(filter_f, np.nan)
+    padded[col > nlen + 1] = 0.
+    padded[(col == 0) | (col == nlen + 1)] = np.nan
+
+    # short sequences censoring
+    finite = np.isfinite(padded[:, :-1])
+    finite[:, 1:] &= col[:, :ngates] < nlen
+    starts = finite[:, 1:] & ~finite[:, :-1]
+    finite = finite[:, 1:]
+    run_id = np.cumsum(starts.ravel()).reshape(starts.shape)
+    run_len = np.bincount(run_id[finite], minlength = run_id.max() + 1)
+    short_seq = finite & (run_len[run_id] <= minsize_seq)
+    # the gate following a short sequence is also censored
+    short_seq[:, 1:] |= short_seq[:, :-1]
+    mask[short_seq] = True
+
+    # median filter, the kernel covers only the range dimension
+    field_filter = signal.medfilt(padded, [1, median_filter_len])
+    field_filter = field_filter[:, 1:-1]
+    field_filter[col[:, :ngates] >= nlen] = 0.
+
+    return field_filter
+
 def smooth_trim(radar, filter_field, window_len = 5, window = 'hanning'):
     field = radar.fields[filter_field]['data']
     field_nan = np.ma.filled(field, np.nan)
-    field_smooth = np.zeros(field.shape)
+    field_smooth = np.zeros(field.shape, dtype = get_precision())
     for i, row in enumerate(field_nan):
         smth = pyart.correct.phase_proc.smooth_and_trim(row, window_len, window)
         field_smooth[i, :] = smth
@@ -141,6 +139,7 @@ def smooth_trim_scan(radar, filter_field, window_len = 5, window = 'hanning'):
     field = radar.fields[filter_field]['data']
     field_nan = np.ma.filled(field, np.nan)
     field_smooth = pyart.correct.phase_proc.smooth_and_trim_scan(field_nan, window_len, window)
+    field_smooth = as_precision(field_smooth)
 
     field_smooth = np.ma.masked_invalid(field_smooth)
     field_smooth = np.ma.masked_array(field_smooth,
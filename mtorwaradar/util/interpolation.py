@@ -0,0 +1,450 @@
+import warnings
+import numpy as np
+from scipy.interpolate import griddata, LinearNDInterpolator, RegularGridInterpolator
+from scipy.spatial import cKDTree
+from .utilities import ArgumentError, npmDarray_to_rFloatVector, rFloatVector_to_npmDarray
+
+########
+## Interpolation and extraction kernels
+## backend "R": functions from the R package mtorwdata (through rpy2)
+## backend "python": NumPy/SciPy implementation, no R runtime needed
+##
+## Differences of the python backend
+## - interp3d_xsec, interp_ppi_ranges_cappi: linear interpolation over a Delaunay
+##   triangulation of the data points, NaN outside their convex hull.
+##   A field linear in the coordinates is reproduced exactly.
+## - interp_surface_grid: bilinear interpolation, NaN outside the input grid.
+## - extract_3DGridData: nearest grid cell and padding, same definition as the R function.
+## - extract_3DPolarData: the gates are not gridded, the value at each cell of the
+##   interpolation grid is an inverse distance weighting (power 2) of the "k" nearest
+##   valid gates within the radius "roi", NaN if there is none. The defaults (8 gates,
+##   1000 m) cover the 500 m cells of the grid used by extract_polar_vertical and the
+##   beam spacing at the usual ranges. The result is smoother than a gridding and differs
+##   from the R backend by up to the variation of the field over "roi".
+## The parity tests against the R backend and their tolerances are in tests/test_interpolation.py
+
+_mtrwdata = None
+
+
+def _r_mtrwdata():
+    global _mtrwdata
+    if _mtrwdata is None:
+        from rpy2.robjects.packages import importr
+
+        _mtrwdata = importr("mtorwdata")
+
+    return _mtrwdata
+
+
+def _check_backend(backend):
+    if backend not in ["R", "python"]:
+        raise ArgumentError("'backend' must be 'R' or 'python'")
+
+
+def _fun_spatial(fun_sp):
+    dispatcher = {
+        "mean": np.nanmean,
+        "median": np.nanmedian,
+        "max": np.nanmax,
+        "min": np.nanmin,
+    }
+    if fun_sp not in dispatcher:
+        raise ArgumentError("'fun_sp' must be 'mean', 'median', 'max' or 'min'")
+
+    fun = dispatcher[fun_sp]
+
+    def _fun(x, axis):
+        with warnings.catch_warnings():
+            # all-NaN slices return NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            return fun(x, axis=axis)
+
+    return _fun
+
+
+def _r_points(points):
+    import rpy2.robjects as robjects
+
+    r_points = robjects.DataFrame(points[0])
+    for pt in points[1:]:
+        r_points = r_points.rbind(robjects.DataFrame(pt))
+
+    return r_points
+
+
+########
+
+
+def interp3d_xsec(x, y, z, v, x_g, y_g, z_g, backend="R"):
+    """
+    Interpolate a vertical cross section from Cartesian grid data
+
+    Parameters
+    ----------
+    x, y, z, v: 2d numpy arrays
+        Coordinates (in meter) and values of the data points, same shape
+    x_g, y_g, z_g: 2d numpy arrays
+        Coordinates of the cross section (altitude x distance along the section), same shape
+    backend: string
+        "R" or "python". Default "R"
+
+    Returns
+    -------
+    2d numpy array with the same shape as x_g, NaN for missing values
+    """
+    _check_backend(backend)
+
+    if backend == "R":
+        v_out = _r_mtrwdata().interp3d_xsec(
+            npmDarray_to_rFloatVector(x),
+            npmDarray_to_rFloatVector(y),
+            npmDarray_to_rFloatVector(z),
+            npmDarray_to_rFloatVector(v),
+            npmDarray_to_rFloatVector(x_g),
+            npmDarray_to_rFloatVector(y_g),
+            npmDarray_to_rFloatVector(z_g),
+        )
+        return rFloatVector_to_npmDarray(v_out, x_g.shape)
+
+    # the data points are within a narrow band around the section,
+    # interpolate with the distance along the section and the altitude
+    x0 = x_g.flat[0]
+    y0 = y_g.flat[0]
+    dx = x_g.flat[-1] - x0
+    dy = y_g.flat[-1] - y0
+    dl = np.hypot(dx, dy)
+    if dl == 0:
+        dx, dy, dl = 1.0, 0.0, 1.0
+
+    s_d = ((x - x0) * dx + (y - y0) * dy) / dl
+    s_g = ((x_g - x0) * dx + (y_g - y0) * dy) / dl
+
+    pts = np.column_stack((s_d.ravel(), z.ravel()))
+    v_out = griddata(pts, v.ravel(), (s_g, z_g), method="linear")
+
+    return v_out
+
+
+def interp_surface_grid(x, y, z, x_g, y_g, backend="R"):
+    """
+    Bilinear interpolation from a regular grid to another regular grid
+
+    Parameters
+    ----------
+    x, y: 1d numpy arrays
+        Coordinates of the input grid, increasing
+    z: 2d numpy array
+        Values of the input grid, shape (len(y), len(x))
+    x_g, y_g: 1d numpy arrays
+        Coordinates of the output grid
+    backend: string
+        "R" or "python". Default "R"
+
+    Returns
+    -------
+    2d numpy array with shape (len(x_g), len(y_g)), NaN for missing values
+    """
+    _check_backend(backend)
+
+    nx = len(x_g)
+    ny = len(y_g)
+
+    if backend == "R":
+        import rpy2.robjects as robjects
+
+        out = _r_mtrwdata().interp_surface_grid(
+            robjects.FloatVector(x),
+            robjects.FloatVector(y),
+            npmDarray_to_rFloatVector(z),
+            robjects.FloatVector(x_g),
+            robjects.FloatVector(y_g),
+        )
+        return rFloatVector_to_npmDarray(out, (nx, ny))
+
+    fun = RegularGridInterpolator(
+        (y, x), z, method="linear", bounds_error=False, fill_value=np.nan
+    )
+    xx, yy = np.meshgrid(x_g, y_g, indexing="ij")
+
+    return fun((yy, xx))
+
+
+def interp_ppi_ranges_cappi(x, y, data, g_lon, g_lat, backend="R"):
+    """
+    Interpolate the pseudo CAPPI data to a regular grid
+
+    Parameters
+    ----------
+    x, y: 2d numpy arrays
+        Longitude and latitude of the gates, NaN for the unused gates
+    data: dictionary
+        Dictionary of the fields, 2d numpy arrays same shape as x, NaN for missing values
+    g_lon, g_lat: 1d numpy arrays
+        Longitude and latitude of the output grid
+    backend: string
+        "R" or "python". Default "R"
+
+    Returns
+    -------
+    Dictionary of the fields, 2d numpy arrays with shape (len(g_lon), len(g_lat))
+    """
+    _check_backend(backend)
+
+    nx = len(g_lon)
+    ny = len(g_lat)
+    fields = list(data.keys())
+
+    if backend == "R":
+        import rpy2.robjects as robjects
+        import rpy2.robjects.vectors as rvect
+
+        x_data = dict()
+        for field in fields:
+            x_data[field] = npmDarray_to_rFloatVector(data[field], order="C")
+        x_data = rvect.ListVector(x_data)
+
+        out = _r_mtrwdata().interp_ppi_ranges_cappi(
+            npmDarray_to_rFloatVector(x, order="C"),
+            npmDarray_to_rFloatVector(y, order="C"),
+            x_data,
+            robjects.FloatVector(g_lon),
+            robjects.FloatVector(g_lat),
+        )
+        out = dict(zip(out.names, out))
+
+        return dict(
+            (field, rFloatVector_to_npmDarray(out[field], (nx, ny))) for field in fields
+        )
+
+    x = x.ravel()
+    y = y.ravel()
+    ix = np.isfinite(x) & np.isfinite(y)
+    values = np.column_stack([data[field].ravel()[ix] for field in fields])
+
+    # one triangulation for all the fields
+    fun = LinearNDInterpolator(np.column_stack((x[ix], y[ix])), values)
+    xx, yy = np.meshgrid(g_lon, g_lat, indexing="ij")
+    out = fun(xx, yy)
+
+    return dict((field, out[:, :, i]) for i, field in enumerate(fields))
+
+
+def extract_3DGridData(lon, lat, alt, data, points, levels, padxyz, fun_sp, backend="R"):
+    """
+    Extract Cartesian grid data over a given points
+
+    Parameters
+    ----------
+    lon, lat, alt: 1d numpy arrays
+        Coordinates of the grid
+    data: dictionary
+        Dictionary of the fields, 3d numpy arrays (alt x lat x lon), NaN for missing values
+    points: list of dictionary
+        format [{"id": "id_point1", "longitude": value_lon, "latitude": value_lat}, {...}, ...]
+    levels: list
+        Index of the altitudes to be extracted
+    padxyz: list
+        Padding in number of grid for longitude, latitude and altitude
+    fun_sp: string
+        Function used for the padding: "mean", "median", "max", "min"
+    backend: string
+        "R" or "python". Default "R"
+
+    Returns
+    -------
+    Dictionary of the fields, 2d numpy arrays with shape (len(points), len(levels))
+    """
+    _check_backend(backend)
+
+    npt = len(points)
+    nlev = len(levels)
+    fields = list(data.keys())
+
+    if backend == "R":
+        import rpy2.robjects as robjects
+        import rpy2.robjects.vectors as rvect
+
+        r_coords = rvect.ListVector(
+            {
+                "lon": robjects.FloatVector(lon),
+                "lat": robjects.FloatVector(lat),
+                "alt": robjects.FloatVector(alt),
+            }
+        )
+        r_data = dict()
+        for field in fields:
+            r_data[field] = npmDarray_to_rFloatVector(data[field], order="C")
+        r_data = rvect.ListVector(r_data)
+
+        out = _r_mtrwdata().extract_3DGridData(
+            r_coords,
+            r_data,
+            _r_points(points),
+            robjects.FloatVector(levels),
+            robjects.FloatVector(padxyz),
+            fun_sp,
+        )
+        out = dict(zip(out.names, out))
+
+        return dict(
+            (field, rFloatVector_to_npmDarray(out[field], (npt, nlev))) for field in fields
+        )
+
+    fun = _fun_spatial(fun_sp)
+    px, py, pz = [int(p) for p in padxyz]
+    nz, ny, nx = len(alt), len(lat), len(lon)
+
+    out = dict((field, np.full((npt, nlev), np.nan)) for field in fields)
+    for p, pt in enumerate(points):
+        if not (lon.min() <= pt["longitude"] <= lon.max()):
+            continue
+        if not (lat.min() <= pt["latitude"] <= lat.max()):
+            continue
+
+        ix = np.abs(lon - pt["longitude"]).argmin()
+        iy = np.abs(lat - pt["latitude"]).argmin()
+        sx = slice(max(ix - px, 0), min(ix + px + 1, nx))
+        sy = slice(max(iy - py, 0), min(iy + py + 1, ny))
+
+        for l, lev in enumerate(levels):
+            sz = slice(max(lev - pz, 0), min(lev + pz + 1, nz))
+            for field in fields:
+                out[field][p, l] = fun(data[field][sz, sy, sx].ravel(), axis=0)
+
+    return out
+
+
+def extract_3DPolarData(
+    gate_x, gate_y, gate_z, data, interp, points, padxy, fun_sp, backend="R", k=8, roi=1000.0
+):
+    """
+    Interpolate radar polar data to a regular grid and extract over a given points
+
+    Parameters
+    ----------
+    gate_x, gate_y, gate_z: 2d numpy arrays
+        Cartesian coordinates of the gates relative to the radar (in meter)
+    data: dictionary
+        Dictionary of the fields, 2d numpy arrays same shape as gate_x, NaN for missing values
+    interp: dictionary
+        Coordinates of the interpolation grid, with keys "x", "y", "z" (in meter)
+        and "lon", "lat" (the geographic coordinates of "x" and "y")
+    points: list of dictionary
+        format [{"id": "id_point1", "longitude": value_lon, "latitude": value_lat}, {...}, ...]
+    padxy: list
+        Padding in number of grid for x and y
+    fun_sp: string
+        Function used for the padding: "mean", "median", "max", "min"
+    backend: string
+        "R" or "python". Default "R"
+    k: integer
+        python backend, number of nearest gates used in the inverse distance weighting. Default 8
+    roi: float
+        python backend, radius of influence of the gates in meter. Default 1000
+
+    Returns
+    -------
+    Dictionary of the fields, 2d numpy arrays with shape (len(points), len(interp["z"]))
+    """
+    _check_backend(backend)
+
+    npt = len(points)
+    nlev = len(interp["z"])
+    fields = list(data.keys())
+
+    if backend == "R":
+        import rpy2.robjects as robjects
+        import rpy2.robjects.vectors as rvect
+
+        r_coords = rvect.ListVector(
+            {
+                "x": npmDarray_to_rFloatVector(gate_x, order="C"),
+                "y": npmDarray_to_rFloatVector(gate_y, order="C"),
+                "z": npmDarray_to_rFloatVector(gate_z, order="C"),
+            }
+        )
+        r_data = dict()
+        for field in fields:
+            r_data[field] = npmDarray_to_rFloatVector(data[field], order="C")
+        r_data = rvect.ListVector(r_data)
+
+        r_interp = rvect.ListVector(
+            dict((n, robjects.FloatVector(interp[n])) for n in ["x", "y", "z", "lon", "lat"])
+        )
+
+        out = _r_mtrwdata().extract_3DPolarData(
+            r_coords, r_data, r_interp, _r_points(points), robjects.FloatVector(padxy), fun_sp
+        )
+        out = dict(zip(out.names, out))
+
+        return dict(
+            (field, rFloatVector_to_npmDarray(out[field], (npt, nlev))) for field in fields
+        )
+
+    fun = _fun_spatial(fun_sp)
+    px, py = [int(p) for p in padxy]
+    g_x = np.asarray(interp["x"])
+    g_y = np.asarray(interp["y"])
+    g_z = np.asarray(interp["z"])
+    g_lon = np.asarray(interp["lon"])
+    g_lat = np.asarray(interp["lat"])
+
+    # grid cells needed for each point
+    cells = list()
+    for pt in points:
+        ix = np.abs(g_lon - pt["longitude"]).argmin()
+        iy = np.abs(g_lat - pt["latitude"]).argmin()
+        sx = np.arange(max(ix - px, 0), min(ix + px + 1, len(g_x)))
+        sy = np.arange(max(iy - py, 0), min(iy + py + 1, len(g_y)))
+        cells.append((sx, sy))
+
+    t_x = np.concatenate([np.repeat(g_x[sx], len(sy)) for sx, sy in cells])
+    t_y = np.concatenate([np.tile(g_y[sy], len(sx)) for sx, sy in cells])
+    t_xyz = np.column_stack(
+        (np.repeat(t_x, nlev), np.repeat(t_y, nlev), np.tile(g_z, len(t_x)))
+    )
+
+    # only the gates around the requested cells are used
+    d_x = gate_x.ravel()
+    d_y = gate_y.ravel()
+    d_z = gate_z.ravel()
+    ig = (
+        (d_x >= t_x.min() - roi)
+        & (d_x <= t_x.max() + roi)
+        & (d_y >= t_y.min() - roi)
+        & (d_y <= t_y.max() + roi)
+    )
+    ig = np.where(ig)[0]
+
+    out = dict((field, np.full((npt, nlev), np.nan)) for field in fields)
+    if len(ig) == 0:
+        return out
+
+    tree = cKDTree(np.column_stack((d_x[ig], d_y[ig], d_z[ig])))
+    kk = min(k, len(ig))
+    dst, idx = tree.query(t_xyz, k=kk, distance_upper_bound=roi)
+    dst = dst.reshape(len(t_xyz), kk)
+    idx = idx.reshape(len(t_xyz), kk)
+    found = np.isfinite(dst)
+    idx[~found] = 0
+    wgt = np.where(found, 1.0 / np.maximum(dst, 1e-6) ** 2, 0.0)
+
+    t_val = dict()
+    for field in fields:
+        val = data[field].ravel()[ig][idx]
+        w = np.where(np.isfinite(val), wgt, 0.0)
+        sw = w.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            v = np.nansum(val * w, axis=1) / sw
+        v[sw == 0] = np.nan
+        t_val[field] = v
+
+    i0 = 0
+    for p, (sx, sy) in enumerate(cells):
+        ncell = len(sx) * len(sy)
+        for field in fields:
+            v = t_val[field][i0 * nlev : (i0 + ncell) * nlev].reshape(ncell, nlev)
+            out[field][p, :] = fun(v, axis=0)
+        i0 = i0 + ncell
+
+    return out
@@ -0,0 +1,112 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from .precision import precision_pool_args
+from .utilities import ArgumentError
+
+
+class StepError:
+    """
+    Error raised while processing one time step
+
+    Attributes
+    ----------
+    time: string
+        The time step
+    message: string
+        The formatted traceback of the error
+    """
+
+    def __init__(self, time, message):
+        self.time = time
+        self.message = message
+
+    def __repr__(self):
+        return "StepError(time=" + repr(self.time) + ")"
+
+
+class _StepRunner:
+    def __init__(self, fun):
+        self.fun = fun
+
+    def __call__(self, time):
+        try:
+            return self.fun(time)
+        except Exception:
+            return StepError(time, traceback.format_exc())
+
+
+def iter_time_steps(fun, seqTime, workers=1, chunksize=1, errors="raise"):
+    """
+    Apply a function to each time step and yield the outputs as they are computed,
+    serially or with a single pool of processes for all the time steps.
+
+    Parameters
+    ----------
+    See run_time_steps
+
+    Returns
+    -------
+    A generator of the outputs of "fun", in the same order as "seqTime".
+    With errors="capture", the time steps raising an error are yielded as StepError.
+    """
+    if errors not in ["raise", "capture"]:
+        raise ArgumentError("'errors' must be 'raise' or 'capture'")
+    if workers is None:
+        workers = os.cpu_count()
+
+    runner = _StepRunner(fun) if errors == "capture" else fun
+
+    executor = None
+    if workers <= 1 or len(seqTime) <= 1:
+        out = map(runner, seqTime)
+    else:
+        workers = min(workers, len(seqTime))
+        executor = ProcessPoolExecutor(max_workers=workers, **precision_pool_args())
+        out = executor.map(runner, seqTime, chunksize=chunksize)
+
+    try:
+        for res in out:
+            if isinstance(res, StepError):
+                print("Error, time: " + res.time + "\n" + res.message)
+            yield res
+    finally:
+        if executor is not None:
+            # the steps not yet started are cancelled when the generator is closed early
+            out.close()
+            executor.shutdown()
+
+
+def run_time_steps(fun, seqTime, workers=1, chunksize=1, errors="raise"):
+    """
+    Apply a function to each time step, serially or with a pool of processes.
+
+    Parameters
+    ----------
+    fun: callable
+        A function taking one time step as argument. When workers > 1, it must be
+        picklable, i.e. a module level function or a functools.partial of it.
+    seqTime: list
+        List of the time steps
+    workers: integer or None
+        Number of processes to use. Default 1, the time steps are processed in the current process.
+        None to use all the available CPUs.
+    chunksize: integer
+        Number of time steps sent to a process at once. Default 1
+    errors: string
+        "raise": an error in a time step is raised, the remaining time steps are cancelled.
+        "capture": the error is printed and returned as a StepError, the other time steps
+        are processed. Default "raise"
+
+    The processes use the precision of the data fields (util.precision)
+    set in the current process when this function is called.
+
+    Returns
+    -------
+    A list of the outputs of "fun", in the same order as "seqTime".
+    With errors="capture", the time steps raising an error are returned as StepError.
+    """
+    out = iter_time_steps(
+        fun, seqTime, workers=workers, chunksize=chunksize, errors=errors
+    )
+    return list(out)
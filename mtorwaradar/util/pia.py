@@ -1,6 +1,14 @@
+import os
 import inspect
+import hashlib
+import threading
+import functools
+import collections
+import numpy as np
 import wradlib as wlb
-from .utilities import do_call, str2numeric_dict_args
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .utilities import ArgumentError, do_call, str2numeric_dict_args
+from .precision import as_precision, precision_pool_args
 
 def calculate_pia_dict_args(radar, pia = None,
                             dbz_field = 'DBZ_F',
@@ -52,8 +60,8 @@ def calculate_pia_dict_args(radar, pia = None,
 
 def calculate_pia(radar, **kwargs):
     args1 = inspect.getfullargspec(correct_attenuation).args[1:]
-    args2 = inspect.getfullargspec(wlb.atten.correct_attenuation_constrained).args[1:]
-    args3 = inspect.getfullargspec(wlb.atten.pia_from_kdp).args[1:]
+    args2 = _keyword_args(wlb.atten.correct_attenuation_constrained)
+    args3 = _keyword_args(wlb.atten.pia_from_kdp)
     pia_args = args1 + args2 + args3
 
     pia_kwargs = dict((key, kwargs[key]) for key in pia_args if key in kwargs)
@@ -61,28 +69,257 @@ def calculate_pia(radar, **kwargs):
 
     return pia
 
+def _keyword_args(fun):
+    # arguments after the data, the wradlib 2 functions are decorated
+    # and their arguments keyword-only
+    return list(inspect.signature(fun).parameters)[1:]
+
 def correct_attenuation(radar, pia_field = 'dbz', dbz_field = 'DBZ_F',
-                        kdp_field = 'KDP_F', **kwargs):
+                        kdp_field = 'KDP_F', sector = None, workers = 1,
+                        executor = 'thread', **kwargs):
     # path-integrated attenuation
     # pia_field: 'dbz' or 'kdp'
+    # sector: None, the wradlib function is called once on all the rays of the volume
+    #         'sweep', the sweeps are computed separately, wradlib is called on the
+    #         (sweep x ray x gate) field of each group of sweeps (see workers).
+    #         With 'kdp' the result is the same. With 'dbz', each sweep is a full azimuth
+    #         circle for the sectors of beams breaching the constraints (sector_thr) and
+    #         the interpolation of the small sectors, as wradlib does for a 3d
+    #         (sweep x ray x gate) field, whereas the whole volume call sees the rays of
+    #         the consecutive sweeps as neighbors. The PIA can then differ for the beams
+    #         of the sectors crossing the first or the last ray of a sweep.
+    # workers: number of groups of consecutive sweeps computed in parallel,
+    #          None to use all the available CPUs
+    # executor: 'thread' or 'process', the pool used when workers > 1
     dr = radar.range['meters_between_gates']/1000
 
     if pia_field == 'dbz':
-        dbz = radar.fields[dbz_field]['data']
+        data = radar.fields[dbz_field]['data']
         pia_fun = wlb.atten.correct_attenuation_constrained
-        pia_args = inspect.getfullargspec(pia_fun).args[1:]
-        pia_kwargs = dict((key, kwargs[key]) for key in pia_args if key in kwargs)
-        if not 'gate_length' in kwargs:
-            pia_kwargs['gate_length'] = dr
-        pia = do_call(pia_fun, args = [dbz], kwargs = pia_kwargs)
-
+        len_arg = 'gate_length'
     if pia_field == 'kdp':
-        kdp = radar.fields[kdp_field]['data']
+        data = radar.fields[kdp_field]['data']
         pia_fun = wlb.atten.pia_from_kdp
-        pia_args = inspect.getfullargspec(pia_fun).args[1:]
-        pia_kwargs = dict((key, kwargs[key]) for key in pia_args if key in kwargs)
-        if not 'dr' in kwargs:
-            pia_kwargs['dr'] = dr
-        pia = do_call(pia_fun, args = [kdp], kwargs = pia_kwargs)
+        len_arg = 'dr'
+
+    pia_args = _keyword_args(pia_fun)
+    pia_kwargs = dict((key, kwargs[key]) for key in pia_args if key in kwargs)
+    if not len_arg in kwargs:
+        pia_kwargs[len_arg] = dr
+
+    sectors = pia_sectors(radar, sector)
+    pia = _pia_cache.get(pia_fun, data, pia_kwargs, sectors, workers, executor)
+
+    return as_precision(pia)
+
+def pia_sectors(radar, sector = None):
+    """
+    Get the blocks of rays on which the attenuation is computed separately
+
+    Returns
+    -------
+    None for the whole volume or a list of the (start, stop) indices of the rays
+    """
+    if sector is None or sector == 'None':
+        return None
+    if sector != 'sweep':
+        raise ArgumentError("'sector' must be None or 'sweep'")
+
+    start = radar.sweep_start_ray_index['data']
+    end = radar.sweep_end_ray_index['data'] + 1
+
+    return [(int(i), int(j)) for i, j in zip(start, end)]
+
+def _compute_pia(pia_fun, data, pia_kwargs, sectors = None, workers = 1, executor = 'thread'):
+    if sectors is None:
+        return do_call(pia_fun, args = [data], kwargs = pia_kwargs)
+
+    if executor not in ['thread', 'process']:
+        raise ArgumentError("'executor' must be 'thread' or 'process'")
+    if workers is None:
+        workers = os.cpu_count()
+
+    # consecutive sweeps in one group per worker
+    groups = np.array_split(np.arange(len(sectors)), min(max(workers, 1), len(sectors)))
+    blocks = [[data[sectors[k][0]:sectors[k][1]] for k in g] for g in groups]
+    fun = functools.partial(_sweeps_pia, pia_fun, pia_kwargs)
+    if len(blocks) <= 1:
+        res = [fun(x) for x in blocks]
+    else:
+        if executor == 'process':
+            pool = ProcessPoolExecutor(max_workers = len(blocks), **precision_pool_args())
+        else:
+            pool = ThreadPoolExecutor(max_workers = len(blocks))
+        with pool:
+            res = list(pool.map(fun, blocks))
+    res = [x for r in res for x in r]
+
+    pia = np.zeros(data.shape, dtype = np.result_type(*res))
+    if any(np.ma.isMaskedArray(x) for x in res):
+        pia = np.ma.masked_array(pia, mask = np.zeros(data.shape, dtype = bool))
+    for (i, j), x in zip(sectors, res):
+        pia[i:j] = x
 
     return pia
+
+def _sweeps_pia(pia_fun, pia_kwargs, sweeps):
+    # the wradlib functions take a (sweep x ray x gate) field, the rays of each sweep
+    # are an azimuth circle, so the sweeps with the same number of rays are computed
+    # in one call, the loops over the gates and the (a, b) iterations are not repeated
+    if len(set(x.shape for x in sweeps)) == 1:
+        pia = do_call(pia_fun, args = [np.ma.stack(sweeps)], kwargs = pia_kwargs)
+        return [pia[k] for k in range(len(sweeps))]
+
+    return [do_call(pia_fun, args = [x], kwargs = pia_kwargs) for x in sweeps]
+
+class PiaCache:
+    """
+    Cache of the path-integrated attenuation
+
+    The PIA is identified by the content of the input field (DBZ or KDP),
+    the wradlib function and its arguments, so the same volume processed
+    several times with different rain rate coefficients or outputs
+    is corrected for attenuation only once.
+
+    Memory: a PIA array has the size of the input field, about 25 MB in float64
+    for a 9 sweeps x 360 rays x 1000 gates volume. The cache is held by each process,
+    a pool of workers (util.parallel.run_time_steps) keeps one cache per worker.
+    In a loop over the time steps each volume is new, the cache only helps when
+    the same volume is processed several times, e.g. several products of one volume.
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of PIA arrays kept in memory, the least recently
+        used is removed first. Default 2
+    cache_dir: string or None
+        Full path to a folder where to save the PIA as .npy files,
+        None to keep them only in memory. Default None
+    maxbytes: integer
+        Maximum total size in bytes of the PIA arrays kept in memory, the least recently
+        used are removed first, the last PIA is always kept. Default 64 MB
+    """
+
+    def __init__(self, maxsize = 2, cache_dir = None, maxbytes = 64 * 2**20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.cache_dir = cache_dir
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pia_fun, data, pia_kwargs, sectors = None, workers = 1, executor = 'thread'):
+        """
+        Get the PIA of data computed with pia_fun(data, **pia_kwargs), separately
+        on the blocks of rays in sectors (see pia_sectors), the returned array is read-only
+        """
+        key = pia_key(pia_fun, data, pia_kwargs, sectors)
+
+        with self._lock:
+            pia = self._cache.get(key)
+            if pia is not None:
+                self._cache.move_to_end(key)
+                return pia
+
+        pia = self._read_npy(key)
+        if pia is None:
+            pia = _compute_pia(pia_fun, data, pia_kwargs, sectors, workers, executor)
+            if not np.ma.isMaskedArray(pia):
+                self._write_npy(key, pia)
+
+        pia.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = pia
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last = False)
+            while len(self._cache) > 1 and self.nbytes > self.maxbytes:
+                self._cache.popitem(last = False)
+
+        return pia
+
+    @property
+    def nbytes(self):
+        """
+        Total size in bytes of the PIA arrays kept in memory
+        """
+        return sum(pia.nbytes for pia in self._cache.values())
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _npy_file(self, key):
+        return os.path.join(self.cache_dir, 'pia_' + key + '.npy')
+
+    def _read_npy(self, key):
+        if self.cache_dir is None:
+            return None
+
+        npy_file = self._npy_file(key)
+        if not os.path.isfile(npy_file):
+            return None
+
+        return np.load(npy_file)
+
+    def _write_npy(self, key, pia):
+        if self.cache_dir is None:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+        npy_file = self._npy_file(key)
+        tmp = npy_file + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as fl:
+            np.save(fl, pia)
+        os.replace(tmp, npy_file)
+
+def pia_key(pia_fun, data, pia_kwargs, sectors = None):
+    """
+    Hash of the input field, the normalized arguments of the PIA computation
+    and the blocks of rays computed separately
+    """
+    def _normalize(x):
+        if callable(x):
+            return x.__module__ + '.' + x.__name__
+        if isinstance(x, (list, tuple)):
+            return [_normalize(v) for v in x]
+        if isinstance(x, np.ndarray):
+            return x.tolist()
+        if isinstance(x, (np.integer, np.floating)):
+            return x.item()
+        return x
+
+    sha = hashlib.sha1()
+    sha.update(_normalize(pia_fun).encode())
+    args = sorted((k, _normalize(v)) for k, v in pia_kwargs.items())
+    sha.update(repr(args).encode())
+    if sectors is not None:
+        sha.update(repr(sectors).encode())
+
+    arr = np.ma.getdata(data)
+    sha.update((str(arr.shape) + str(arr.dtype)).encode())
+    sha.update(np.ascontiguousarray(arr).tobytes())
+    mask = np.ma.getmask(data)
+    if mask is not np.ma.nomask:
+        sha.update(np.ascontiguousarray(mask).tobytes())
+
+    return sha.hexdigest()
+
+_pia_cache = PiaCache()
+
+def configure_pia_cache(maxsize = 2, cache_dir = None, maxbytes = 64 * 2**20):
+    """
+    Replace the default PIA cache, see PiaCache
+
+    Parameters
+    ----------
+    maxsize: integer
+        Maximum number of PIA arrays kept in memory, 0 to disable the memory cache. Default 2
+    cache_dir: string or None
+        Full path to a folder where to save the PIA as .npy files,
+        None to keep them only in memory. Default None
+    maxbytes: integer
+        Maximum total size in bytes of the PIA arrays kept in memory. Default 64 MB
+    """
+    global _pia_cache
+    _pia_cache = PiaCache(maxsize, cache_dir, maxbytes)
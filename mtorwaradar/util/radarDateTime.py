@@ -1,7 +1,9 @@
 
+import bisect
 import datetime
 import os
 import re
+import threading
 from .utilities import ArgumentError
 
 def get_mdv_time(radar):
@@ -24,77 +26,145 @@ def grid_mdv_time(grid):
 
     return temps[0].strftime('%Y-%m-%d %H:%M:%S UTC')
 
-def mdv_nearest_time_file(dirMDV, time):
-    t0 = datetime.datetime.strptime(time, '%Y-%m-%d-%H-%M')
-
-    daty = []
-    daty = daty + [t0 + datetime.timedelta(seconds = -5 * 60)]
-    daty = daty + [t0]
-    daty = daty + [t0 + datetime.timedelta(seconds = 5 * 60)]
-
-    heure = [x.strftime("%Y%m%d%H") for x in daty]
-    heure = list(set(heure))
-    heure = [datetime.datetime.strptime(t, '%Y%m%d%H') for t in heure]
-
-    jr = [x.strftime("%Y%m%d") for x in heure]
-    hr = [x.strftime("%H") for x in heure]
+class MdvCatalog:
+    """
+    Sorted index of the MDV files of one radar source
+
+    The MDV files are stored in date folders (yyyymmdd) and named by
+    the scan time (HHMMSS.mdv). The catalog keeps, for each date folder,
+    the sorted list of the scan times and the modification time of the folder,
+    a folder is listed again only when its modification time changes.
+    The catalog is kept in the memory of the process only, it is not saved:
+    each process (e.g. the workers of util.parallel) builds its own catalog
+    and the folders are listed again after a restart.
+
+    Parameters
+    ----------
+    dirMDV: string
+        The full path to the folder containing the date folders (yyyymmdd)
+    """
+
+    _file_pattern = re.compile('^[0-9]{6}\\.mdv$')
+
+    def __init__(self, dirMDV):
+        self.dirMDV = dirMDV
+        self._folders = dict()
+        self._lock = threading.Lock()
+
+    def _day_times(self, day):
+        ddir = os.path.join(self.dirMDV, day)
+        try:
+            mtime = os.stat(ddir).st_mtime_ns
+        except OSError:
+            self._folders.pop(day, None)
+            return []
+
+        folder = self._folders.get(day)
+        if folder is not None and folder[0] == mtime:
+            return folder[1]
 
-    dt = []
-    for i in range(len(jr)):
-        d = jr[i]
-        pattern = '^' + hr[i] + '.+\\.mdv$'
-        ddir = os.path.join(dirMDV, d)
         if not os.path.isdir(ddir):
-            continue
-        ff = [os.path.splitext(d + f)[0] for f in os.listdir(ddir) if re.match(pattern, f)]
-        dt = dt + ff
+            return []
+
+        dt = [os.path.splitext(f)[0] for f in os.listdir(ddir) if self._file_pattern.match(f)]
+        dt = [datetime.datetime.strptime(day + t, '%Y%m%d%H%M%S') for t in dt]
+        dt.sort()
+        self._folders[day] = (mtime, dt)
+
+        return dt
+
+    def times_between(self, start, end):
+        """
+        Get the scan times within an interval
+
+        Parameters
+        ----------
+        start, end: datetime
+            The bounds of the interval (included)
+
+        Returns
+        -------
+        List of the sorted scan times (datetime)
+        """
+        ndays = (end.date() - start.date()).days
+        days = [start.date() + datetime.timedelta(days = x) for x in range(ndays + 1)]
+        days = [x.strftime('%Y%m%d') for x in days]
+
+        out = []
+        with self._lock:
+            for day in days:
+                dt = self._day_times(day)
+                i0 = bisect.bisect_left(dt, start)
+                i1 = bisect.bisect_right(dt, end)
+                out = out + dt[i0:i1]
+
+        return out
+
+    def end_time(self, t0, window = 300):
+        """
+        Get the first scan time between t0 and t0 + window seconds
+        """
+        dt = self.times_between(t0, t0 + datetime.timedelta(seconds = window))
+        if len(dt) == 0:
+            return None
+
+        return dt[0]
+
+    def nearest_time(self, t0, window = 300):
+        """
+        Get the nearest scan time to t0 within +/- window seconds
+        """
+        delta = datetime.timedelta(seconds = window)
+        dt = self.times_between(t0 - delta, t0 + delta)
+        if len(dt) == 0:
+            return None
+
+        return min(dt, key=lambda x: abs(x - t0))
+
+    def refresh(self):
+        """
+        Index all the date folders
+        """
+        if not os.path.isdir(self.dirMDV):
+            return
+
+        days = [d for d in os.listdir(self.dirMDV) if re.match('^[0-9]{8}$', d)]
+        with self._lock:
+            for day in days:
+                self._day_times(day)
+
+_mdv_catalogs = dict()
+_mdv_catalogs_lock = threading.Lock()
+
+def get_mdv_catalog(dirMDV):
+    """
+    Get the catalog of the MDV files of a radar source,
+    the catalog is created at the first call and reused by the next calls
+    of the same process.
+    """
+    key = os.path.abspath(dirMDV)
+    with _mdv_catalogs_lock:
+        catalog = _mdv_catalogs.get(key)
+        if catalog is None:
+            catalog = MdvCatalog(key)
+            _mdv_catalogs[key] = catalog
+
+    return catalog
 
-    if len(dt) == 0:
-        return None
-
-    dt = [datetime.datetime.strptime(t, '%Y%m%d%H%M%S') for t in dt]
-    dt = [t for t in dt if daty[0] <= t <= daty[2]]
-
-    if len(dt) == 0:
+def mdv_nearest_time_file(dirMDV, time):
+    t0 = datetime.datetime.strptime(time, '%Y-%m-%d-%H-%M')
+    tr = get_mdv_catalog(dirMDV).nearest_time(t0)
+    if tr is None:
         return None
 
-    tr = min(dt, key=lambda x: abs(x - t0))
-
     return [tr.strftime("%Y%m%d"), tr.strftime("%H%M%S")]
 
 def mdv_end_time_file(dirMDV, time):
     t0 = datetime.datetime.strptime(time, '%Y-%m-%d-%H-%M')
-    daty = [t0] + [t0 + datetime.timedelta(seconds = 5 * 60)]
-
-    heure = [x.strftime("%Y%m%d%H") for x in daty]
-    heure = list(set(heure))
-    heure = [datetime.datetime.strptime(t, '%Y%m%d%H') for t in heure]
-
-    jr = [x.strftime("%Y%m%d") for x in heure]
-    hr = [x.strftime("%H") for x in heure]
-
-    dt = []
-    for i in range(len(jr)):
-        d = jr[i]
-        pattern = '^' + hr[i] + '.+\\.mdv$'
-        ddir = os.path.join(dirMDV, d)
-        if not os.path.isdir(ddir):
-            continue
-        ff = [os.path.splitext(d + f)[0] for f in os.listdir(ddir) if re.match(pattern, f)]
-        dt = dt + ff
-
-    if len(dt) == 0:
+    tr = get_mdv_catalog(dirMDV).end_time(t0)
+    if tr is None:
         return None
 
-    dt = [datetime.datetime.strptime(t, '%Y%m%d%H%M%S') for t in dt]
-    dt = [t for t in dt if t0 <= t <= daty[1]]
-
-    if len(dt) == 0:
-        return None
-
-    dt.sort()
-    tr = dt[0]
-
     return [tr.strftime("%Y%m%d"), tr.strftime("%H%M%S")]
 
 def mdv_seq_times_files(dirMDV, start_time, end_time, times = "end"):
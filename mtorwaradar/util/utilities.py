@@ -1,10 +1,11 @@
 import numpy as np
+import pandas as pd
 import json
-import rpy2.robjects as robjects
 from functools import singledispatch
 import csv
 from contextlib import contextmanager
 import sys, os
+import uuid
 
 
 class ArgumentError(Exception):
@@ -43,18 +44,81 @@ def str2numeric_dict_args(args):
 ########
 
 
-def npmDarray_to_rFloatVector(arr):
-    x_1d = arr.transpose().reshape(arr.size)
+def npmDarray_to_rFloatVector(arr, order="F"):
+    """
+    Convert a numpy array to an R FloatVector
+
+    The R vector is filled from the memory of the array, there is only
+    one copy of the data, without intermediate array when the array is
+    float64 and contiguous in the given order.
+
+    Parameters
+    ----------
+    arr: numpy array
+        The array to convert, masked values must be filled before.
+    order: string
+        The order of the elements in the R vector, "F" column-major
+        (layout of the R arrays) or "C" row-major (numpy flatten). Default "F"
+
+    Returns
+    -------
+    An R FloatVector of length arr.size
+    """
+    import rpy2.rinterface as rinterface
+    import rpy2.robjects as robjects
+
+    arr = np.asarray(arr)
+    if arr.dtype == np.float64 and (
+        arr.flags.f_contiguous if order == "F" else arr.flags.c_contiguous
+    ):
+        # view of the array as a 1d buffer, copied by R in one pass
+        flat = arr.ravel(order=order)
+        vec = rinterface.FloatSexpVector.from_memoryview(memoryview(flat))
+        return robjects.FloatVector(vec)
 
-    return robjects.FloatVector(x_1d)
+    # other layouts or types, the data are cast and reordered
+    # directly into the memory of the R vector
+    vec = robjects.FloatVector(rinterface.baseenv["numeric"](arr.size))
+    buf = np.asarray(vec.memoryview())
+    buf = buf.reshape(arr.shape, order=order)
+    np.copyto(buf, arr, casting="unsafe")
 
+    return vec
 
-def rFloatVector_to_npmDarray(vec, shape):
-    # shape: tuple
-    dim = robjects.IntVector(shape)
-    arr = robjects.r.array(vec, dim)
 
-    return np.array(arr)
+class _RVectorArray(np.ndarray):
+    # numpy view on the memory of an R vector, holding a reference to the
+    # R object so that the vector is not released by the R garbage collector
+    def __array_finalize__(self, obj):
+        self._robj = getattr(obj, "_robj", None)
+
+
+def rFloatVector_to_npmDarray(vec, shape, copy=True):
+    """
+    Convert an R FloatVector to a numpy array
+
+    Parameters
+    ----------
+    vec: R FloatVector
+        The R vector, the elements in column-major order
+    shape: tuple
+        The shape of the output array
+    copy: boolean
+        If False, the output array is a view on the memory of the R vector,
+        the array and its views keep a reference to the R vector. Default True
+
+    Returns
+    -------
+    A float64 numpy array with the given shape
+    """
+    arr = np.asarray(vec.memoryview())
+    if copy:
+        return arr.reshape(shape, order="F").copy(order="K")
+
+    arr = arr.view(_RVectorArray)
+    arr._robj = vec
+
+    return arr.reshape(shape, order="F")
 
 
 ########
@@ -148,10 +212,10 @@ def suppress_stdout():
 ########
 
 
-def write_to_json(dict_data, file):
-    file_json = open(file, "w")
-    data_json = json.dumps(dict_data, indent=2, default=ts_float32)
-    print(data_json, file=file_json)
+def write_to_json(dict_data, file, indent=2):
+    with open(file, "w") as file_json:
+        json.dump(dict_data, file_json, indent=indent, default=ts_float32)
+        file_json.write("\n")
 
 
 def write_to_csv(x, file):
@@ -160,13 +224,105 @@ def write_to_csv(x, file):
 
     Parameters
     ----------
-    x: list of dictionaries
+    x: list of dictionaries or pandas DataFrame
         format [{'a': 1, 'b':2}, {...}, ...]
 
     """
+    if isinstance(x, pd.DataFrame):
+        x.to_csv(file, index=False)
+        return
+
     with open(file, mode="w") as fl:
         colnames = list(x[0].keys())
         writer = csv.DictWriter(fl, fieldnames=colnames)
         writer.writeheader()
         for d in x:
             writer.writerow(d)
+
+
+def write_to_parquet(
+    x,
+    path,
+    partition_by="auto",
+    float32=True,
+    float64_columns=["longitude", "latitude", "points_longitude", "points_latitude"],
+    compression="zstd",
+    existing_data_behavior="overwrite_or_ignore",
+):
+    """
+    Write a table to Parquet
+
+    The string columns are dictionary encoded (stored as categorical),
+    the float columns are written in single precision.
+
+    Parameters
+    ----------
+    x: list of dictionaries or pandas DataFrame
+        format [{'a': 1, 'b':2}, {...}, ...], the output of the *Table functions
+        or api.extract_output.extracted_to_dataframe
+    path: string
+        Full path to the Parquet file, or to the root folder of the dataset if partitioned
+    partition_by: string or None
+        The column of the dates, format "%Y%m%d%H%M%S", used to partition the dataset by day,
+        the files are written in the folders path/date=YYYYmmdd.
+        "auto": the column "dates" (extracted data) or "time" (VAD, QVP) if it exists.
+        None: write a single file. Default "auto"
+    float32: boolean
+        Write the float columns in single precision. Default True
+    float64_columns: list
+        The float columns kept in double precision
+    compression: string
+        The compression codec. Default "zstd"
+    existing_data_behavior: string
+        What to do with the data already in the dataset, when partitioned
+        "overwrite_or_ignore": the rows are appended in new files with unique names,
+            the existing files are kept, writing the same dates twice duplicates their rows.
+        "delete_matching": the folders of the days written are emptied first,
+            the rows of these days written before are deleted, the other days are kept.
+        "error": raise an error if the dataset already contains files.
+        Default "overwrite_or_ignore"
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(x, pd.DataFrame):
+        df = x.copy(deep=False)
+    else:
+        df = pd.DataFrame.from_records(x)
+
+    for col in df.columns:
+        dtype = df[col].dtype
+        if float32 and dtype == np.float64 and col not in float64_columns:
+            df[col] = df[col].astype(np.float32)
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            df[col] = df[col].astype("category")
+
+    if existing_data_behavior not in ["overwrite_or_ignore", "delete_matching", "error"]:
+        raise ArgumentError(
+            "'existing_data_behavior' must be 'overwrite_or_ignore', 'delete_matching' or 'error'"
+        )
+
+    if partition_by == "auto":
+        partition_by = [c for c in ["dates", "time"] if c in df.columns]
+        partition_by = partition_by[0] if len(partition_by) > 0 else None
+
+    if partition_by is None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression=compression)
+        return
+
+    # the day of each date, computed on the categories
+    dates = df[partition_by].astype("category")
+    days = np.array([str(d)[:8] for d in dates.cat.categories], dtype=object)
+    df["date"] = pd.Categorical(days[dates.cat.codes.to_numpy()])
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        path,
+        partition_cols=["date"],
+        compression=compression,
+        existing_data_behavior=existing_data_behavior,
+        # unique names, the files written before are not overwritten
+        basename_template="part-" + uuid.uuid4().hex + "-{i}.parquet",
+    )
@@ -0,0 +1,307 @@
+import os
+import time
+import queue
+import datetime
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from .radarDateTime import MdvCatalog
+from .precision import precision_pool_args
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo = None)
+
+def _mdv_file_time(mdvfile):
+    # scan time of dirMDV/yyyymmdd/HHMMSS.mdv, None for the other names
+    day = os.path.basename(os.path.dirname(mdvfile))
+    name = os.path.basename(mdvfile)
+    if not MdvCatalog._file_pattern.match(name):
+        return None
+    try:
+        return datetime.datetime.strptime(day + name[:6], '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
+
+class MdvWatcher:
+    """
+    Watch a MDV folder and run the registered products on each new file
+
+    The date folders dirMDV/yyyymmdd are polled for new files "HHMMSS.mdv",
+    a file is considered complete when its size has not changed for "settle_time"
+    seconds, or as soon as it is closed or moved in the folder when the package
+    inotify_simple is available. The complete files are put in a bounded queue
+    consumed by "workers" threads, each running all the products for one file.
+
+    Parameters
+    ----------
+    dirMDV: string
+        The full path to the folder containing the date folders (yyyymmdd)
+    poll_interval: float
+        Time in seconds between two scans of the folders. Default 1
+    settle_time: float
+        Time in seconds a file size must be stable to be considered complete. Default 2
+    queue_size: integer
+        Maximum number of files waiting to be processed. Default 8
+    overflow: string
+        What to do when the queue is full,
+        'block': wait for a free place, the new files are detected later
+        'drop_oldest': remove the oldest waiting file. Default 'block'
+    workers: integer
+        Number of files processed at the same time. Default 1
+    executor: string
+        'thread': the products run in the worker threads,
+        'process': the products run in a pool of "workers" processes,
+        the products must then be picklable. Default 'thread'
+    backfill: float
+        The files with a scan time in the last "backfill" seconds before the start
+        of the watcher are also processed. Default 0
+
+    Example
+    -------
+    The products are created by the factories of the api modules,
+    they take the same parameters as the corresponding functions over a period.
+
+    from mtorwaradar.util.watcher import MdvWatcher
+    from mtorwaradar.api.create_cappi_loc import cappi_product
+    from mtorwaradar.api.qpe_cappi_loc import qpe_product
+    from mtorwaradar.api.create_echotops_loc import echotops_product
+    from mtorwaradar.api.create_vad_loc import vad_product
+
+    dirMDV = '/home/data/Projdir/mdv/radarPolar/ops1/sur'
+    watcher = MdvWatcher(dirMDV, workers = 2, executor = 'process')
+    watcher.register('CAPPI', cappi_product(dirMDV, '/home/data/cappi', ['DBZ_F'], backend = 'python'))
+    watcher.register('QPE', qpe_product(dirMDV, '/home/data/qpe', backend = 'python'))
+    watcher.register('Echo tops', echotops_product(dirMDV, '/home/data/echotops'))
+    watcher.register('VAD', vad_product(dirMDV, '/home/data/vad', engine = 'batch'))
+    watcher.run()
+    """
+
+    def __init__(self, dirMDV, poll_interval = 1., settle_time = 2.,
+                 queue_size = 8, overflow = 'block', workers = 1,
+                 executor = 'thread', backfill = 0.):
+        self.dirMDV = dirMDV
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.overflow = overflow
+        self.workers = workers
+        self.executor = executor
+        self.backfill = backfill
+
+        self._products = []
+        self._queue = queue.Queue(maxsize = queue_size)
+        self._stop = threading.Event()
+        self._catalog = MdvCatalog(dirMDV)
+        self._pending = dict()
+        self._done = set()
+        self._closed = set()
+        self._notifier = None
+        self._watched = dict()
+        self._threads = []
+        self._pool = None
+
+    def register(self, name, fun):
+        """
+        Register a product
+
+        Parameters
+        ----------
+        name: string
+            The name of the product, used in the messages
+        fun: callable
+            A function taking the scan time "yyyy-mm-dd-HH-MM" (UTC) as argument,
+            as the functions given to util.parallel.run_time_steps. The factories
+            api.create_cappi_loc.cappi_product, api.qpe_cappi_loc.qpe_product,
+            api.create_echotops_loc.echotops_product and api.create_vad_loc.vad_product
+            create these functions for the products of the package
+        """
+        self._products.append((name, fun))
+
+    def start(self):
+        """
+        Start the watcher in background threads
+        """
+        self._stop.clear()
+        if self.executor == 'process':
+            self._pool = ProcessPoolExecutor(max_workers = self.workers, **precision_pool_args())
+
+        if inotify_simple is not None:
+            self._notifier = inotify_simple.INotify()
+
+        start = _utcnow() - datetime.timedelta(seconds = self.backfill)
+        for t in self._catalog.times_between(start - datetime.timedelta(days = 1), start):
+            self._done.add(t)
+        self._start_time = start - datetime.timedelta(days = 1)
+
+        self._threads = [threading.Thread(target = self._watch, daemon = True)]
+        for _ in range(self.workers):
+            self._threads.append(threading.Thread(target = self._consume, daemon = True))
+        for th in self._threads:
+            th.start()
+
+    def stop(self):
+        """
+        Stop the watcher, the files already in the queue are processed before
+        """
+        self._stop.set()
+        for th in self._threads:
+            th.join()
+        self._threads = []
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._notifier is not None:
+            self._notifier.close()
+            self._notifier = None
+            self._watched = dict()
+
+    def run(self, duration = None):
+        """
+        Run the watcher in the current thread until interrupted (Ctrl-C)
+        or during "duration" seconds
+        """
+        self.start()
+        try:
+            if duration is None:
+                while True:
+                    time.sleep(1.)
+            else:
+                time.sleep(duration)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    ########
+
+    def _watch(self):
+        while not self._stop.is_set():
+            try:
+                self._poll()
+            except Exception:
+                print("Error, watcher:\n" + traceback.format_exc())
+            self._wait()
+
+    def _day_dirs(self, now):
+        days = [now - datetime.timedelta(days = 1), now]
+        return [d.strftime('%Y%m%d') for d in days]
+
+    def _wait(self):
+        if self._notifier is None:
+            self._stop.wait(self.poll_interval)
+            return
+
+        now = _utcnow()
+        days = self._day_dirs(now)
+        for day in list(self._watched):
+            if day not in days:
+                try:
+                    self._notifier.rm_watch(self._watched.pop(day))
+                except OSError:
+                    pass
+        for day in days:
+            ddir = os.path.join(self.dirMDV, day)
+            if day not in self._watched and os.path.isdir(ddir):
+                flags = inotify_simple.flags
+                self._watched[day] = self._notifier.add_watch(
+                    ddir, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+
+        if not os.path.isdir(os.path.join(self.dirMDV, days[1])):
+            # the folder of the day does not exist yet
+            self._stop.wait(self.poll_interval)
+            return
+
+        wd_day = dict((v, k) for k, v in self._watched.items())
+        events = self._notifier.read(timeout = int(self.poll_interval * 1000))
+        for ev in events:
+            if ev.mask & (inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO):
+                if ev.wd in wd_day and ev.name.endswith('.mdv'):
+                    self._closed.add(os.path.join(self.dirMDV, wd_day[ev.wd], ev.name))
+
+    def _poll(self):
+        now = _utcnow()
+        start = max(self._start_time, now - datetime.timedelta(days = 1))
+        end = now + datetime.timedelta(days = 1)
+        times = self._catalog.times_between(start, end)
+        clock = time.time()
+
+        for t in times:
+            if t in self._done:
+                continue
+
+            mdvfile = os.path.join(self.dirMDV, t.strftime('%Y%m%d'),
+                                   t.strftime('%H%M%S') + '.mdv')
+            try:
+                st = os.stat(mdvfile)
+            except OSError:
+                continue
+
+            complete = mdvfile in self._closed
+            if not complete:
+                size = self._pending.get(t)
+                if size is None or size[0] != st.st_size:
+                    self._pending[t] = (st.st_size, clock)
+                    continue
+                complete = clock - size[1] >= self.settle_time
+
+            if complete:
+                if not self._put(t):
+                    return
+                self._done.add(t)
+                self._pending.pop(t, None)
+                self._closed.discard(mdvfile)
+
+        # forget the times older than the polling window
+        self._done = set(t for t in self._done if t >= start)
+        self._pending = dict((t, v) for t, v in self._pending.items() if t >= start)
+        # and the closed files not catalogued, not in the window or already processed
+        closed = set()
+        for mdvfile in self._closed:
+            t = _mdv_file_time(mdvfile)
+            if t is not None and t >= start and t not in self._done:
+                closed.add(mdvfile)
+        self._closed = closed
+
+    def _put(self, t):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(t, timeout = self.poll_interval)
+                return True
+            except queue.Full:
+                if self.overflow == 'drop_oldest':
+                    try:
+                        old = self._queue.get_nowait()
+                        self._queue.task_done()
+                        print("Queue full, skip time: " + old.strftime('%Y-%m-%d %H:%M:%S'))
+                    except queue.Empty:
+                        pass
+        return False
+
+    def _consume(self):
+        while True:
+            try:
+                t = self._queue.get(timeout = self.poll_interval)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+
+            step = t.strftime('%Y-%m-%d-%H-%M')
+            for name, fun in self._products:
+                t0 = time.time()
+                try:
+                    if self._pool is not None:
+                        self._pool.submit(fun, step).result()
+                    else:
+                        fun(step)
+                    print(name + ", time: " + step + " done in " +
+                          str(round(time.time() - t0, 1)) + "s.")
+                except Exception:
+                    print("Error, " + name + ", time: " + step + "\n" + traceback.format_exc())
+
+            self._queue.task_done()
@@ -28,4 +28,13 @@ setup(
     ],
     python_requires=">=3.8",
     # install_requires=requirements,
+    extras_require={
+        # util.utilities.write_to_parquet, api.extract_output.extracted_to_arrow
+        "parquet": ["pyarrow>=8.0"],
+        # output "xarray" of the extraction functions
+        "xarray": ["xarray"],
+        # util.watcher.MdvWatcher, file events instead of polling only
+        "watcher": ["inotify_simple"],
+        "all": ["pyarrow>=8.0", "xarray", "inotify_simple"],
+    },
 )
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from pyart.testing import make_empty_ppi_radar
+from mtorwaradar.mdv import creategrid
+from mtorwaradar.mdv.creategrid import (
+    GridMappingCache,
+    create_grid_from_radar,
+    grid_data_from_radar,
+    _gate_points,
+    _grid_points,
+)
+
+
+def _radar():
+    # 4 sweeps, 250 m gates, with masked gates and rays in antenna transition
+    nsweeps = 4
+    radar = make_empty_ppi_radar(120, 180, nsweeps)
+    radar.range["data"] = np.arange(120, dtype="float32") * 250.0 + 125.0
+    radar.fixed_angle["data"] = np.array([0.5, 1.5, 3.0, 6.0], dtype="float32")
+    radar.elevation["data"] = np.repeat(radar.fixed_angle["data"], 180)
+    azimuth = np.arange(0.0, 360.0, 2.0) + np.random.default_rng(0).uniform(0.0, 0.5, 180)
+    radar.azimuth["data"] = np.tile(azimuth.astype("float32"), nsweeps)
+    radar.altitude["data"] = np.array([1500.0])
+    radar.init_gate_x_y_z()
+    radar.init_gate_altitude()
+
+    transition = np.zeros(radar.nrays, dtype="int32")
+    transition[[0, 1, 179, 180, 181, 400]] = 1
+    radar.antenna_transition = {"data": transition}
+
+    rng = np.random.default_rng(1)
+    # the value of a gate is its index, to know which gate is mapped
+    dbz = np.arange(radar.nrays * radar.ngates, dtype="float64").reshape(radar.nrays, radar.ngates)
+    # clear air in half of the volume, scattered valid gates elsewhere
+    mask = rng.random((radar.nrays, radar.ngates)) < 0.6
+    mask[:, :40] |= np.tile(np.arange(180) < 90, nsweeps)[:, None]
+    radar.add_field("DBZ_F", {"data": np.ma.masked_array(dbz, mask=mask)})
+
+    return radar
+
+
+GRID = {
+    "grid_shape": (5, 61, 61),
+    "z_lim": (1000.0, 5000.0),
+    "y_lim": (-30000.0, 30000.0),
+    "x_lim": (-30000.0, 30000.0),
+    "constant_roi": 1500.0,
+}
+
+
+def _assert_same_grid(radar, grid, ref, pars):
+    data = grid["fields"]["DBZ_F"]
+    ref = ref.fields["DBZ_F"]["data"]
+    assert data.shape == ref.shape
+    np.testing.assert_array_equal(np.ma.getmaskarray(data), np.ma.getmaskarray(ref))
+
+    # same nearest gate, or a gate at the same distance within the float32
+    # precision of the pyart gate coordinates
+    gates = _gate_points(radar)
+    limits = (pars["z_lim"], pars["y_lim"], pars["x_lim"])
+    z, y, x = np.meshgrid(*_grid_points(pars["grid_shape"], limits), indexing="ij")
+    points = np.column_stack((z.ravel(), y.ravel(), x.ravel()))
+    valid = ~np.ma.getmaskarray(ref).ravel()
+    points = points[valid]
+    gate = np.asarray(data.compressed(), dtype="int64")
+    gate_ref = np.rint(ref.compressed()).astype("int64")
+    dist = np.linalg.norm(gates[gate] - points, axis=1)
+    dist_ref = np.linalg.norm(gates[gate_ref] - points, axis=1)
+    np.testing.assert_allclose(dist, dist_ref, atol=0.1)
+    assert np.mean(gate == gate_ref) > 0.99
+
+
+@pytest.mark.parametrize("nneighbors", [1, 4, 16])
+def test_grid_mapping_parity(monkeypatch, nneighbors):
+    radar = _radar()
+    monkeypatch.setattr(creategrid, "_grid_mapping_cache", GridMappingCache(nneighbors=nneighbors))
+
+    grid = grid_data_from_radar(radar, ["DBZ_F"], **GRID)
+    ref = create_grid_from_radar(radar, ["DBZ_F"], **GRID)
+
+    _assert_same_grid(radar, grid, ref, GRID)
+    # both masked and valid points are present
+    assert 0.1 < np.ma.getmaskarray(ref.fields["DBZ_F"]["data"]).mean() < 0.9
+
+
+def test_grid_mapping_one_level(monkeypatch):
+    radar = _radar()
+    monkeypatch.setattr(creategrid, "_grid_mapping_cache", GridMappingCache(nneighbors=2))
+    pars = dict(GRID, grid_shape=(1, 61, 61), z_lim=(2000.0, 2000.0))
+
+    grid = grid_data_from_radar(radar, ["DBZ_F"], **pars)
+    ref = create_grid_from_radar(radar, ["DBZ_F"], **pars)
+
+    _assert_same_grid(radar, grid, ref, pars)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from mtorwaradar.mdv.echotops import echo_tops_stack, echo_tops_array
+
+THRES = [-5.0, 10.0, 15.0, 20.0, 32.5, 45.0, 80.0]
+
+
+def _echo_tops_baseline(data, alt, thres):
+    # echo_tops_array before the cumulative maximum
+    arr_thres = data >= thres
+    arr_index = np.empty(arr_thres.shape)
+    arr_index[:] = -1
+
+    for lev in range(arr_thres.shape[0]):
+        arr_index[lev, arr_thres[lev, :, :]] = lev
+
+    arr_index = np.ma.masked_where(arr_index == -1, arr_index)
+    arr_mask = np.logical_and.reduce(arr_index.mask)
+    index = np.argmax(arr_index, axis=0)
+
+    lev = list(range(len(alt)))
+    ix = np.digitize(index.ravel(), lev, right=True)
+    echo_tops = alt[ix].reshape(index.shape)
+    echo_tops = np.ma.masked_where(arr_mask, echo_tops)
+
+    return echo_tops
+
+
+def _dbz(seed, shape=(12, 30, 40)):
+    rng = np.random.default_rng(seed)
+    dbz = rng.uniform(-20.0, 60.0, shape)
+    # the reflectivity decreases with the height
+    dbz -= np.arange(shape[0])[:, None, None] * 3.0
+    mask = rng.random(shape) < 0.2
+    # fully masked columns
+    mask[:, :3, :] = True
+    # columns never exceeding the thresholds (but the lowest)
+    dbz[:, 3:6, :] = 0.0
+    # as the pyart grids, the fill value under the mask
+    dbz[mask] = -9999.0
+
+    return np.ma.masked_array(dbz, mask=mask)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_stack_matches_baseline(seed):
+    dbz = _dbz(seed)
+    alt = np.linspace(0.5, 17.0, dbz.shape[0])
+    tops = echo_tops_stack(dbz, alt, THRES)
+
+    assert tops.shape == (len(THRES),) + dbz.shape[1:]
+    for j, th in enumerate(THRES):
+        ref = _echo_tops_baseline(dbz, alt, th)
+        np.testing.assert_array_equal(tops.mask[j], np.ma.getmaskarray(ref))
+        np.testing.assert_array_equal(tops[j].filled(0), ref.filled(0))
+        np.testing.assert_array_equal(echo_tops_array(dbz, alt, th), ref)
+
+    # fully masked columns and columns below the thresholds
+    assert np.all(tops.mask[:, :3, :])
+    assert not np.any(tops.mask[0, 3:6, :])
+    assert np.all(tops.mask[1:, 3:6, :])
+    # no column reaches 80 dBZ
+    assert np.all(tops.mask[-1])
+
+
+def test_stack_masked_data_ignored():
+    dbz = _dbz(3)
+    alt = np.linspace(0.5, 17.0, dbz.shape[0])
+    tops = echo_tops_stack(dbz, alt, THRES)
+
+    # the data under the mask and the NaN are not used
+    high = dbz.copy()
+    high.data[high.mask] = 70.0
+    high[0, 10, 10] = np.nan
+    dbz[0, 10, 10] = np.ma.masked
+    np.testing.assert_array_equal(echo_tops_stack(high, alt, THRES), tops)
+
+
+def test_interpolate_linear_profile():
+    alt = np.arange(11, dtype=np.float64)
+    # 50 dBZ at the ground, -5 dBZ by km
+    dbz = 50.0 - 5.0 * alt
+    dbz = np.ma.masked_array(np.tile(dbz[:, None, None], (1, 2, 3)))
+    thres = [22.0, 40.0, 0.0, -10.0, 60.0]
+
+    tops = echo_tops_stack(dbz, alt, thres, interpolate=True)
+    expected = [5.6, 2.0, 10.0, 10.0]
+    for j, top in enumerate(expected):
+        np.testing.assert_allclose(tops[j], top)
+    assert np.all(tops.mask[-1])
+
+    # without interpolation, the highest level exceeding the threshold
+    tops = echo_tops_stack(dbz, alt, thres)
+    np.testing.assert_array_equal(tops[:4, 0, 0], [5.0, 2.0, 10.0, 10.0])
+
+    # the level above masked, no interpolation
+    dbz[6, 0, 0] = np.ma.masked
+    tops = echo_tops_stack(dbz, alt, [22.0], interpolate=True)
+    assert tops[0, 0, 0] == 5.0
+    np.testing.assert_allclose(tops[0, 1, 1], 5.6)
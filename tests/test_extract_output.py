@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+from mtorwaradar.api.extract_output import (
+    new_extracted_arrays,
+    extracted_output,
+    extracted_to_dataframe,
+    extracted_to_xarray,
+)
+from mtorwaradar.util.utilities import ArgumentError
+
+FIELDS = ["DBZ_F", "RHOHV_F"]
+DATES = ["2024-01-01 00:{:02d}:00".format(5 * d) for d in range(3)]
+POINTS = [
+    {"id": "P" + str(p), "longitude": 36.8 + 0.1 * p, "latitude": -1.3 - 0.1 * p}
+    for p in range(4)
+]
+ALTITUDE = np.array([1000.0, 2000.0])
+
+
+def _steps():
+    # the extracted values of each date (point x level), as returned by the
+    # interpolation, with NaN and infinite values
+    rng = np.random.default_rng(0)
+    steps = list()
+    for d in range(len(DATES)):
+        out = dict()
+        for field in FIELDS:
+            val = rng.normal(size=(len(POINTS), len(ALTITUDE)))
+            val[rng.random(val.shape) < 0.3] = np.nan
+            val[0, d % 2] = np.inf
+            out[field] = val
+        steps.append(out)
+
+    return steps
+
+
+def _extract(steps, output):
+    # as extract_grid_data, the arrays are allocated for one more date than filled
+    ext_data = {"coords": POINTS, "altitude": ALTITUDE, "date": list()}
+    ext_data["data"] = new_extracted_arrays(
+        FIELDS, len(steps) + 1, len(ALTITUDE), len(POINTS), output
+    )
+    for nd, out in enumerate(steps):
+        for field in FIELDS:
+            xdat = out[field].transpose()
+            ext_data["data"][field][nd] = np.where(np.isfinite(xdat), xdat, np.nan)
+        ext_data["date"].append(DATES[nd])
+
+    return extracted_output(ext_data, len(steps), output)
+
+
+def _extract_baseline(steps):
+    # the nested lists grown by date before the arrays were preallocated
+    ext_data = {"coords": POINTS, "altitude": ALTITUDE.tolist(), "date": list()}
+    ext_data["data"] = dict((field, list()) for field in FIELDS)
+    for nd, out in enumerate(steps):
+        for field in FIELDS:
+            xdat = np.ma.masked_invalid(out[field].transpose())
+            xdat = xdat.filled(-9999).tolist()
+            ext_data["data"][field] = ext_data["data"][field] + [xdat]
+        ext_data["date"] = ext_data["date"] + [DATES[nd]]
+
+    return ext_data
+
+
+def test_output_list():
+    steps = _steps()
+    out = _extract(steps, "list")
+    assert out == _extract_baseline(steps)
+    assert isinstance(out["altitude"], list)
+    assert isinstance(out["data"]["DBZ_F"][0][0], list)
+
+
+def test_output_array():
+    steps = _steps()
+    out = _extract(steps, "array")
+    ref = _extract_baseline(steps)
+
+    assert list(out["date"]) == DATES
+    np.testing.assert_array_equal(out["altitude"], ALTITUDE)
+    for field in FIELDS:
+        val = out["data"][field]
+        # truncated to the dates filled
+        assert val.shape == (len(DATES), len(ALTITUDE), len(POINTS))
+        expected = np.array(ref["data"][field])
+        expected[expected == -9999] = np.nan
+        np.testing.assert_array_equal(val, expected.astype(val.dtype))
+
+
+def test_output_no_date():
+    out = _extract(list(), "array")
+    assert len(out["date"]) == 0
+    assert out["data"]["DBZ_F"].shape == (0, len(ALTITUDE), len(POINTS))
+
+
+def test_output_xarray():
+    steps = _steps()
+    ds = _extract(steps, "xarray")
+    ref = _extract(steps, "array")
+
+    assert ds["DBZ_F"].dims == ("date", "altitude", "point")
+    assert list(ds["date"].values) == DATES
+    np.testing.assert_array_equal(ds["altitude"], ALTITUDE)
+    assert list(ds["point"].values) == [pt["id"] for pt in POINTS]
+    np.testing.assert_array_equal(
+        ds["point_longitude"], [pt["longitude"] for pt in POINTS]
+    )
+    np.testing.assert_array_equal(
+        ds["point_latitude"], [pt["latitude"] for pt in POINTS]
+    )
+    for field in FIELDS:
+        np.testing.assert_array_equal(ds[field].values, ref["data"][field])
+
+    # the -9999 of the list output are NaN
+    ds_list = extracted_to_xarray(_extract(steps, "list"))
+    for field in FIELDS:
+        np.testing.assert_array_equal(ds_list[field].values, ds[field].values)
+
+
+@pytest.mark.parametrize("output", ["list", "array"])
+def test_dataframe_order(output):
+    x = _extract(_steps(), output)
+    df = extracted_to_dataframe(x)
+
+    assert len(df) == len(POINTS) * len(ALTITUDE) * len(DATES)
+    assert list(df.columns) == ["id", "longitude", "latitude", "dates", "altitude"] + FIELDS
+
+    # ordered by point, level and date
+    row = 0
+    for p, pt in enumerate(POINTS):
+        for e, alt in enumerate(ALTITUDE):
+            for d, date in enumerate(DATES):
+                rec = df.iloc[row]
+                assert rec["id"] == pt["id"]
+                assert rec["longitude"] == pt["longitude"]
+                assert rec["latitude"] == pt["latitude"]
+                assert rec["dates"] == date
+                assert rec["altitude"] == alt
+                for field in FIELDS:
+                    np.testing.assert_equal(rec[field], x["data"][field][d][e][p])
+                row += 1
+
+
+def test_dataframe_points_prefix():
+    x = _extract(_steps(), "array")
+    # extractRadarPolar returns the coordinates of the gates as data
+    x["data"]["longitude"] = np.zeros_like(x["data"]["DBZ_F"])
+    df = extracted_to_dataframe(x)
+    assert list(df.columns[:3]) == ["points_id", "points_longitude", "points_latitude"]
+
+
+def test_no_level():
+    x = _extract(_steps(), "array")
+    del x["altitude"]
+    with pytest.raises(ArgumentError):
+        extracted_to_dataframe(x)
+    with pytest.raises(ArgumentError):
+        extracted_output(x, 1, "array")
+
+
+def test_output_invalid():
+    with pytest.raises(ArgumentError):
+        _extract(_steps(), "dataframe")
@@ -0,0 +1,106 @@
+import types
+import numpy as np
+import pytest
+import scipy
+from scipy import signal
+from mtorwaradar.util.filter import median_filter, median_filter_censor
+
+# since SciPy 1.14 the 1-D medfilt uses a sliding window, its result for
+# the windows containing NaN depends on the preceding samples and differs
+# from the N-D medfilt used by the vectorized filter
+MEDFILT_1D_SLIDING = tuple(int(v) for v in scipy.__version__.split(".")[:2]) >= (1, 14)
+
+
+def _median_filter_loop(filter_f, mask, median_filter_len, minsize_seq):
+    # per-ray implementation replaced by _median_filter_range, also returns
+    # the median of the gates whose window has no missing value, from the 1-D
+    # medfilt of each sequence of valid gates (NaN elsewhere)
+    mask = mask.copy()
+    field_filter = np.zeros(filter_f.shape)
+    complete = np.full(filter_f.shape, np.nan)
+    half = median_filter_len // 2
+    for i, row in enumerate(filter_f):
+        idx = np.where(~row.mask)[0]
+        if len(idx):
+            row = row[0 : idx[-1] + 1]
+            row_with_nan = np.ma.filled(row, np.nan)
+            row_with_nan = np.pad(
+                row_with_nan, (1, 1), "constant", constant_values=(np.nan,)
+            )
+            idx = np.where(np.isfinite(row_with_nan))[0]
+            nan_left = idx[np.where(np.isnan(row_with_nan[idx - 1]))[0]]
+            nan_right = idx[np.where(np.isnan(row_with_nan[idx + 1]))[0]]
+
+            len_sub = nan_right - nan_left
+            for j, l in enumerate(len_sub):
+                if l < minsize_seq:
+                    mask[i, nan_left[j] - 1 : nan_right[j] + 1] = True
+
+            row = signal.medfilt(row_with_nan, median_filter_len)
+            field_filter[i, 0 : len(row[1:-1])] = row[1:-1]
+
+            for left, right in zip(nan_left, nan_right):
+                if right - left < 2 * half:
+                    continue
+                seq = signal.medfilt(row_with_nan[left : right + 1], median_filter_len)
+                complete[i, left + half - 1 : right - half] = seq[half : len(seq) - half]
+
+    return np.ma.masked_array(field_filter, mask=mask), complete
+
+
+def _random_radar(seed, nrays=60, ngates=120):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(30.0, 10.0, (nrays, ngates))
+    mask = np.zeros(data.shape, dtype=bool)
+    # runs of missing gates of random length
+    for _ in range(nrays * 6):
+        i = rng.integers(nrays)
+        j = rng.integers(ngates)
+        mask[i, j : j + rng.integers(1, 6)] = True
+    # rays without data and rays truncated at the end
+    mask[rng.integers(nrays, size=3)] = True
+    for i in rng.integers(nrays, size=5):
+        mask[i, rng.integers(ngates // 2, ngates) :] = True
+
+    fields = {
+        "DBZ_F": {"data": np.ma.masked_array(data, mask=mask)},
+        "RHOHV_F": {"data": np.ma.masked_array(rng.uniform(0.5, 1.0, data.shape))},
+    }
+    return types.SimpleNamespace(fields=fields)
+
+
+def _assert_identical(out, ref, complete):
+    np.testing.assert_array_equal(np.ma.getmaskarray(out), np.ma.getmaskarray(ref))
+    if MEDFILT_1D_SLIDING:
+        valid = np.isfinite(complete)
+        assert valid.any()
+        np.testing.assert_array_equal(np.ma.getdata(out)[valid], complete[valid])
+    else:
+        np.testing.assert_array_equal(np.ma.getdata(out), np.ma.getdata(ref))
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("median_filter_len, minsize_seq", [(5, 3), (3, 1), (7, 4)])
+def test_median_filter_matches_loop(seed, median_filter_len, minsize_seq):
+    radar = _random_radar(seed)
+    filter_f = radar.fields["DBZ_F"]["data"]
+
+    out = median_filter(radar, "DBZ_F", median_filter_len, minsize_seq)
+    ref, complete = _median_filter_loop(
+        filter_f, np.ma.getmaskarray(filter_f), median_filter_len, minsize_seq
+    )
+    _assert_identical(out, ref, complete)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_median_filter_censor_matches_loop(seed):
+    radar = _random_radar(seed)
+    filter_f = radar.fields["DBZ_F"]["data"]
+    censor_f = radar.fields["RHOHV_F"]["data"]
+
+    out = median_filter_censor(
+        radar, "DBZ_F", 5, 3, censor_field="RHOHV_F", censor_thres=0.7
+    )
+    mask = np.ma.getmaskarray(filter_f) | (censor_f < 0.7)
+    ref, complete = _median_filter_loop(filter_f, np.ma.getdata(mask), 5, 3)
+    _assert_identical(out, ref, complete)
@@ -0,0 +1,281 @@
+import numpy as np
+import pytest
+from pyart.core import antenna_vectors_to_cartesian
+from mtorwaradar.util.interpolation import (
+    interp3d_xsec,
+    interp_surface_grid,
+    interp_ppi_ranges_cappi,
+    extract_3DGridData,
+    extract_3DPolarData,
+)
+
+
+def _has_mtorwdata():
+    try:
+        from rpy2.robjects.packages import isinstalled
+
+        return isinstalled("mtorwdata")
+    except Exception:
+        return False
+
+
+requires_r = pytest.mark.skipif(
+    not _has_mtorwdata(), reason="rpy2 and the R package mtorwdata are required"
+)
+
+# Tolerances of the parity tests between the backends
+# - linear kernels (interp3d_xsec, interp_surface_grid, interp_ppi_ranges_cappi)
+#   on fields linear in the coordinates: both backends are exact, rtol 1e-6,
+#   compared where both are defined, the R values must be defined over at least
+#   90% of the cells defined by the python backend (the hull edges may differ)
+# - extract_3DGridData: same definition, rtol 1e-10
+# - extract_3DPolarData: inverse distance weighting vs gridding, the difference
+#   is bounded by the variation of the field over the radius of influence,
+#   1 dBZ for the field used below (gradient 1 dBZ/km, roi 1000 m)
+RTOL_LINEAR = 1e-6
+RTOL_GRID = 1e-10
+ATOL_POLAR = 1.0
+
+
+def _linear(a, b, c=0.0):
+    return 10.0 + 1e-3 * a + 2e-3 * b + 5e-4 * c
+
+
+def _xsec_data():
+    x = np.arange(0.0, 10001.0, 500.0)
+    y = np.array([-500.0, 0.0, 500.0])
+    z = np.arange(0.0, 5001.0, 250.0)
+    zz, yy, xx = np.meshgrid(z, y, x, indexing="ij")
+    shape = (len(z), len(y) * len(x))
+    x, y, z = xx.reshape(shape), yy.reshape(shape), zz.reshape(shape)
+    # linear along the section and with the altitude, constant across
+    v = _linear(x, z)
+
+    d = np.linspace(250.0, 9750.0, 39)
+    h = np.linspace(100.0, 4900.0, 25)
+    x_g, z_g = np.meshgrid(d, h)
+    y_g = np.zeros_like(x_g)
+
+    return (x, y, z, v, x_g, y_g, z_g), _linear(x_g, z_g)
+
+
+def _surface_data():
+    x = np.linspace(29.0, 31.0, 41)
+    y = np.linspace(-3.0, -1.0, 31)
+    xx, yy = np.meshgrid(x, y)
+    x_g = np.linspace(29.1, 30.9, 25)
+    y_g = np.linspace(-2.9, -1.1, 19)
+    gx, gy = np.meshgrid(x_g, y_g, indexing="ij")
+
+    return (x, y, _linear(xx * 1e3, yy * 1e3), x_g, y_g), _linear(gx * 1e3, gy * 1e3)
+
+
+def _ppi_data():
+    rng = np.random.default_rng(1)
+    az = np.deg2rad(np.arange(0.0, 360.0, 2.0))[:, np.newaxis]
+    rg = np.arange(0.02, 1.0, 0.02)[np.newaxis, :]
+    x = 30.0 + rg * np.sin(az)
+    y = -2.0 + rg * np.cos(az)
+    x[rng.random(x.shape) < 0.02] = np.nan
+    y[np.isnan(x)] = np.nan
+    data = {
+        "DBZ": _linear(x * 1e3, y * 1e3),
+        "ZDR": 0.5 * x - 0.25 * y,
+    }
+    g_lon = np.linspace(29.4, 30.6, 25)
+    g_lat = np.linspace(-2.6, -1.4, 25)
+    gx, gy = np.meshgrid(g_lon, g_lat, indexing="ij")
+    expected = {
+        "DBZ": _linear(gx * 1e3, gy * 1e3),
+        "ZDR": 0.5 * gx - 0.25 * gy,
+    }
+
+    return (x, y, data, g_lon, g_lat), expected
+
+
+def _grid_data():
+    rng = np.random.default_rng(2)
+    lon = np.linspace(29.0, 31.0, 21)
+    lat = np.linspace(-3.0, -1.0, 21)
+    alt = np.arange(1000.0, 10001.0, 1000.0)
+    dbz = rng.normal(30.0, 8.0, (len(alt), len(lat), len(lon)))
+    dbz[rng.random(dbz.shape) < 0.1] = np.nan
+    points = [
+        {"id": "p1", "longitude": 30.02, "latitude": -2.01},
+        {"id": "p2", "longitude": 29.0, "latitude": -1.0},
+        {"id": "p3", "longitude": 32.0, "latitude": -2.0},
+    ]
+
+    return lon, lat, alt, {"DBZ": dbz}, points
+
+
+def _polar_data():
+    azimuth = np.arange(0.0, 360.0, 1.0)
+    ranges = np.arange(250.0, 60001.0, 250.0)
+    elevation = np.array([0.5, 1.5, 2.5, 3.5, 5.0, 7.0, 10.0, 14.0])
+    gx, gy, gz = list(), list(), list()
+    for elev in elevation:
+        x, y, z = antenna_vectors_to_cartesian(
+            ranges, azimuth, np.repeat(elev, len(azimuth))
+        )
+        gx.append(x)
+        gy.append(y)
+        gz.append(z)
+    gate_x, gate_y, gate_z = np.vstack(gx), np.vstack(gy), np.vstack(gz)
+
+    # 1 dBZ/km horizontally
+    data = {"DBZ": 30.0 + 1e-3 * gate_x - 1e-3 * gate_y, "ONE": np.ones(gate_x.shape)}
+
+    g = np.arange(-20000.0, 20001.0, 500.0)
+    interp = {
+        "x": g,
+        "y": g,
+        "z": np.arange(500.0, 3001.0, 500.0),
+        "lon": 30.0 + g / 111e3,
+        "lat": -2.0 + g / 111e3,
+    }
+    points = [
+        {"id": "p1", "longitude": 30.15, "latitude": -1.9},
+        {"id": "p2", "longitude": 29.88, "latitude": -2.12},
+    ]
+
+    return gate_x, gate_y, gate_z, data, interp, points
+
+
+def _assert_parity(v_py, v_r, rtol=None, atol=0.0):
+    both = np.isfinite(v_py) & np.isfinite(v_r)
+    assert both.sum() >= 0.9 * np.isfinite(v_py).sum()
+    np.testing.assert_allclose(v_r[both], v_py[both], rtol=rtol or 0.0, atol=atol)
+
+
+########
+# python backend
+
+
+def test_interp3d_xsec_linear_field():
+    args, expected = _xsec_data()
+    v_out = interp3d_xsec(*args, backend="python")
+
+    assert np.isfinite(v_out).all()
+    np.testing.assert_allclose(v_out, expected, rtol=1e-10)
+
+
+def test_interp_surface_grid_linear_field():
+    args, expected = _surface_data()
+    out = interp_surface_grid(*args, backend="python")
+
+    assert out.shape == expected.shape
+    np.testing.assert_allclose(out, expected, rtol=1e-10)
+
+
+def test_interp_ppi_ranges_cappi_linear_field():
+    args, expected = _ppi_data()
+    out = interp_ppi_ranges_cappi(*args, backend="python")
+
+    for field in expected:
+        assert out[field].shape == expected[field].shape
+        assert np.isfinite(out[field]).all()
+        np.testing.assert_allclose(out[field], expected[field], rtol=1e-8, atol=1e-10)
+
+
+def test_extract_3DGridData_padding():
+    lon, lat, alt, data, points = _grid_data()
+    levels = [0, 4, 9]
+    out = extract_3DGridData(
+        lon, lat, alt, data, points, levels, [1, 1, 1], "mean", backend="python"
+    )
+
+    dbz = data["DBZ"]
+    ix = np.abs(lon - 30.02).argmin()
+    iy = np.abs(lat + 2.01).argmin()
+    for l, lev in enumerate(levels):
+        ref = np.nanmean(dbz[max(lev - 1, 0) : lev + 2, iy - 1 : iy + 2, ix - 1 : ix + 2])
+        np.testing.assert_allclose(out["DBZ"][0, l], ref, rtol=1e-12)
+
+    # point on the corner of the grid, padding truncated
+    ref = np.nanmean(dbz[0:2, -2:, 0:2])
+    np.testing.assert_allclose(out["DBZ"][1, 0], ref, rtol=1e-12)
+    # point outside the grid
+    assert np.isnan(out["DBZ"][2]).all()
+
+
+def test_extract_3DPolarData_idw():
+    gate_x, gate_y, gate_z, data, interp, points = _polar_data()
+    out = extract_3DPolarData(
+        gate_x, gate_y, gate_z, data, interp, points, [1, 1], "mean", backend="python"
+    )
+
+    assert out["DBZ"].shape == (len(points), len(interp["z"]))
+    # weights normalized
+    np.testing.assert_allclose(out["ONE"], 1.0, rtol=1e-12)
+
+    # the field at the center of the padded cells, within the variation over roi
+    for p, pt in enumerate(points):
+        ix = np.abs(interp["lon"] - pt["longitude"]).argmin()
+        iy = np.abs(interp["lat"] - pt["latitude"]).argmin()
+        ref = 30.0 + 1e-3 * interp["x"][ix] - 1e-3 * interp["y"][iy]
+        np.testing.assert_allclose(out["DBZ"][p], ref, atol=ATOL_POLAR)
+
+
+def test_extract_3DPolarData_missing_gates():
+    gate_x, gate_y, gate_z, data, interp, points = _polar_data()
+    data = {"DBZ": np.full(gate_x.shape, np.nan)}
+    out = extract_3DPolarData(
+        gate_x, gate_y, gate_z, data, interp, points, [1, 1], "max", backend="python"
+    )
+
+    assert np.isnan(out["DBZ"]).all()
+
+
+########
+# parity with the R backend
+
+
+@requires_r
+def test_interp3d_xsec_parity():
+    args, _ = _xsec_data()
+    v_py = interp3d_xsec(*args, backend="python")
+    v_r = interp3d_xsec(*args, backend="R")
+
+    _assert_parity(v_py, v_r, rtol=RTOL_LINEAR)
+
+
+@requires_r
+def test_interp_surface_grid_parity():
+    args, _ = _surface_data()
+    v_py = interp_surface_grid(*args, backend="python")
+    v_r = interp_surface_grid(*args, backend="R")
+
+    _assert_parity(v_py, v_r, rtol=RTOL_LINEAR)
+
+
+@requires_r
+def test_interp_ppi_ranges_cappi_parity():
+    args, _ = _ppi_data()
+    v_py = interp_ppi_ranges_cappi(*args, backend="python")
+    v_r = interp_ppi_ranges_cappi(*args, backend="R")
+
+    for field in v_py:
+        _assert_parity(v_py[field], v_r[field], rtol=RTOL_LINEAR)
+
+
+@requires_r
+@pytest.mark.parametrize("fun_sp", ["mean", "median", "max", "min"])
+def test_extract_3DGridData_parity(fun_sp):
+    lon, lat, alt, data, points = _grid_data()
+    args = (lon, lat, alt, data, points[:2], [0, 4, 9], [1, 1, 1], fun_sp)
+    v_py = extract_3DGridData(*args, backend="python")
+    v_r = extract_3DGridData(*args, backend="R")
+
+    np.testing.assert_allclose(v_r["DBZ"], v_py["DBZ"], rtol=RTOL_GRID)
+
+
+@requires_r
+def test_extract_3DPolarData_parity():
+    gate_x, gate_y, gate_z, data, interp, points = _polar_data()
+    data = {"DBZ": data["DBZ"]}
+    args = (gate_x, gate_y, gate_z, data, interp, points, [1, 1], "mean")
+    v_py = extract_3DPolarData(*args, backend="python")
+    v_r = extract_3DPolarData(*args, backend="R")
+
+    _assert_parity(v_py["DBZ"], v_r["DBZ"], atol=ATOL_POLAR)
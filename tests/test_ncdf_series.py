@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pytest
+from netCDF4 import Dataset as ncdf
+from mtorwaradar.api import ncdf_series
+from mtorwaradar.api.ncdf_series import NcTimeSeries, run_time_series
+from mtorwaradar.util import parallel
+
+LON = np.linspace(29.0, 30.0, 4)
+LAT = np.linspace(-2.0, -1.0, 3)
+UNIT = "seconds since 1970-01-01 00:00:00"
+VARIABLES = [{"name": "rate", "long_name": "Precipitation rate", "units": "mm/hr"}]
+
+
+def _step(time):
+    # time: "YYYY-mm-dd-HH-MM", one step every 5 minutes of the day
+    hh, mm = int(time[11:13]), int(time[14:16])
+    if mm == 10:
+        return None
+    value = 1704067200.0 + hh * 3600 + mm * 60
+    return {
+        "lon": LON,
+        "lat": LAT,
+        "time": {"format": "20240101" + time[11:13] + time[14:16] + "00", "value": value, "unit": UNIT},
+        "variables": [dict(VARIABLES[0], data=np.full((3, 4), hh * 60 + mm, dtype="float32"))],
+    }
+
+
+def test_run_time_series_single_pool(tmp_path, monkeypatch):
+    pools = list()
+
+    class CountedPool(parallel.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(1)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", CountedPool)
+
+    seqTime = ["2024-01-01-{:02d}-{:02d}".format(h, m) for h in range(2) for m in range(0, 60, 5)]
+    ncfiles = run_time_series(
+        _step,
+        seqTime,
+        lambda tf: os.path.join(str(tmp_path), "rate_" + tf[:10] + ".nc"),
+        "test",
+        workers=2,
+        chunksize=1,
+    )
+
+    assert len(pools) == 1
+    assert [os.path.basename(x) for x in ncfiles] == ["rate_2024010100.nc", "rate_2024010101.nc"]
+    with ncdf(ncfiles[1]) as nc:
+        times = nc.variables["time"][:]
+        assert len(times) == 11
+        assert np.all(np.diff(times) > 0)
+        np.testing.assert_array_equal(nc.variables["rate"][:, 0, 0], (times - 1704067200.0) / 60)
+
+
+def test_append_overwrite_and_order(tmp_path):
+    ncfile = str(tmp_path / "series.nc")
+    with NcTimeSeries(ncfile, LON, LAT, UNIT, VARIABLES) as nc:
+        nc.append(100.0, {"rate": np.ones((3, 4))})
+        nc.append(200.0, {"rate": np.ones((3, 4))})
+
+    with NcTimeSeries(ncfile, LON, LAT, UNIT, VARIABLES) as nc:
+        nc.append(100.0, {"rate": np.full((3, 4), 2.0)})
+        nc.append(300.0, {"rate": np.full((3, 4), 3.0)})
+        with pytest.raises(ValueError):
+            nc.append(250.0, {"rate": np.ones((3, 4))})
+
+    with ncdf(ncfile) as nc:
+        np.testing.assert_array_equal(nc.variables["time"][:], [100.0, 200.0, 300.0])
+        np.testing.assert_array_equal(nc.variables["rate"][:, 0, 0], [2.0, 1.0, 3.0])
+
+
+@pytest.mark.parametrize(
+    "lon, unit, variables",
+    [
+        (LON[:3], UNIT, VARIABLES),
+        (LON, "seconds since 2000-01-01 00:00:00", VARIABLES),
+        (LON, UNIT, [dict(VARIABLES[0], name="precip")]),
+        (LON, UNIT, VARIABLES + [dict(VARIABLES[0], name="precip")]),
+    ],
+)
+def test_reopen_checks_file(tmp_path, lon, unit, variables):
+    ncfile = str(tmp_path / "series.nc")
+    with NcTimeSeries(ncfile, LON, LAT, UNIT, VARIABLES) as nc:
+        nc.append(100.0, {"rate": np.ones((3, 4))})
+
+    with pytest.raises(ValueError):
+        NcTimeSeries(ncfile, lon, LAT, unit, variables)
@@ -0,0 +1,83 @@
+import functools
+import os
+import time
+import pytest
+from mtorwaradar.util import parallel
+from mtorwaradar.util.utilities import ArgumentError
+
+STEPS = ["t" + str(i) for i in range(8)]
+
+
+def _step(time_step):
+    # the last steps are the fastest, the order of the outputs must not depend on it
+    time.sleep(0.01 * (8 - int(time_step[1:])))
+    return time_step.upper()
+
+
+def _step_pid(time_step):
+    time.sleep(0.01)
+    return os.getpid()
+
+
+def _step_fail(time_step):
+    if time_step == "t2":
+        raise RuntimeError("corrupt volume " + time_step)
+    return time_step.upper()
+
+
+def _step_touch(time_step, folder):
+    open(os.path.join(folder, time_step), "w").close()
+    time.sleep(0.2)
+    return time_step
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_outputs_in_order(workers):
+    out = parallel.run_time_steps(_step, STEPS, workers=workers)
+    assert out == [t.upper() for t in STEPS]
+
+
+def test_chunksize():
+    pids = parallel.run_time_steps(_step_pid, STEPS[:6], workers=2, chunksize=3)
+    # each chunk is processed by a single worker
+    assert len(set(pids[:3])) == 1
+    assert len(set(pids[3:])) == 1
+    assert os.getpid() not in pids
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_errors_raise(workers):
+    with pytest.raises(RuntimeError, match="corrupt volume t2"):
+        parallel.run_time_steps(_step_fail, STEPS, workers=workers)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_errors_capture(workers, capsys):
+    out = parallel.run_time_steps(_step_fail, STEPS, workers=workers, errors="capture")
+
+    assert isinstance(out[2], parallel.StepError)
+    assert out[2].time == "t2"
+    assert "RuntimeError: corrupt volume t2" in out[2].message
+    assert out[:2] + out[3:] == [t.upper() for t in STEPS if t != "t2"]
+    assert "Error, time: t2" in capsys.readouterr().out
+
+
+def test_errors_invalid():
+    with pytest.raises(ArgumentError):
+        parallel.run_time_steps(_step, STEPS, errors="ignore")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_early_close(workers, tmp_path):
+    steps = ["t" + str(i) for i in range(20)]
+    fun = functools.partial(_step_touch, folder=str(tmp_path))
+    out = parallel.iter_time_steps(fun, steps, workers=workers)
+    assert next(out) == "t0"
+    out.close()
+
+    # the steps not yet started are not processed
+    done = os.listdir(str(tmp_path))
+    assert "t0" in done
+    assert len(done) < len(steps)
+    time.sleep(0.5)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(done)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from mtorwaradar.util.utilities import ArgumentError, write_to_parquet
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _table(times, value):
+    n = len(times)
+    return pd.DataFrame(
+        {
+            "time": times,
+            "height": np.arange(n, dtype=np.float64),
+            "speed": np.full(n, value),
+        }
+    )
+
+
+def _read(path):
+    df = pq.read_table(path).to_pandas()
+    df["date"] = df["date"].astype(str)
+    df["time"] = df["time"].astype(str)
+    return df.sort_values(["time", "speed"]).reset_index(drop=True)
+
+
+def test_append_by_default(tmp_path):
+    path = str(tmp_path / "vad")
+    write_to_parquet(_table(["20240101000000", "20240102000000"], 1.0), path)
+    write_to_parquet(_table(["20240101050000", "20240101050000"], 2.0), path)
+
+    df = _read(path)
+    assert len(df) == 4
+    assert df["date"].tolist() == ["20240101"] * 3 + ["20240102"]
+    np.testing.assert_array_equal(df["speed"], [1.0, 2.0, 2.0, 1.0])
+
+
+def test_delete_matching(tmp_path):
+    path = str(tmp_path / "vad")
+    write_to_parquet(_table(["20240101000000", "20240102000000"], 1.0), path)
+    write_to_parquet(
+        _table(["20240101050000"], 2.0), path, existing_data_behavior="delete_matching"
+    )
+
+    df = _read(path)
+    # the rows of 20240101 written before are deleted, the other day is kept
+    assert df["time"].tolist() == ["20240101050000", "20240102000000"]
+    np.testing.assert_array_equal(df["speed"], [2.0, 1.0])
+
+
+def test_existing_data_behavior(tmp_path):
+    path = str(tmp_path / "vad")
+    write_to_parquet(_table(["20240101000000"], 1.0), path)
+
+    with pytest.raises(Exception):
+        write_to_parquet(
+            _table(["20240101050000"], 2.0), path, existing_data_behavior="error"
+        )
+    with pytest.raises(ArgumentError):
+        write_to_parquet(
+            _table(["20240101050000"], 2.0), path, existing_data_behavior="append"
+        )
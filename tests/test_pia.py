@@ -0,0 +1,121 @@
+import types
+import numpy as np
+import pytest
+import wradlib as wlb
+from mtorwaradar.util import pia as upia
+
+
+def _radar(seed=0, nsweeps=3, nrays=120, ngates=200):
+    rng = np.random.default_rng(seed)
+    nr = nsweeps * nrays
+    # rain cells of different azimuthal widths, some strong enough
+    # to breach the constraints
+    dbz = rng.normal(15.0, 5.0, (nr, ngates))
+    for _ in range(12):
+        r0 = rng.integers(nr)
+        width = rng.integers(2, 30)
+        g0 = rng.integers(0, ngates - 60)
+        dbz[r0 : r0 + width, g0 : g0 + 60] += rng.uniform(25.0, 45.0)
+    mask = rng.random(dbz.shape) < 0.05
+    kdp = np.abs(rng.normal(0.5, 1.0, (nr, ngates)))
+
+    start = np.arange(nsweeps) * nrays
+    return types.SimpleNamespace(
+        nrays=nr,
+        range={"meters_between_gates": 250.0},
+        sweep_start_ray_index={"data": start},
+        sweep_end_ray_index={"data": start + nrays - 1},
+        fields={
+            "DBZ_F": {"data": np.ma.masked_array(dbz, mask=mask)},
+            "KDP_F": {"data": np.ma.masked_array(kdp, mask=mask)},
+        },
+    )
+
+
+CONSTRAINED = {
+    "a_max": 0.0002,
+    "a_min": 0.0,
+    "n_a": 10,
+    "b_max": 0.7,
+    "b_min": 0.65,
+    "n_b": 6,
+    "sector_thr": 10,
+    "constraints": [wlb.atten.constraint_dbz, wlb.atten.constraint_pia],
+    "constraint_args": [[60.0], [20.0]],
+}
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    upia.configure_pia_cache(maxsize=0)
+    yield
+    upia.configure_pia_cache()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_constrained_matches_wradlib(seed):
+    radar = _radar(seed)
+    pia = upia.correct_attenuation(radar, "dbz", **CONSTRAINED)
+    ref = wlb.atten.correct_attenuation_constrained(
+        radar.fields["DBZ_F"]["data"], gate_length=0.25, **CONSTRAINED
+    )
+
+    np.testing.assert_array_equal(np.ma.getdata(pia), np.ma.getdata(ref))
+
+
+def test_kdp_matches_wradlib():
+    radar = _radar(4)
+    pia = upia.correct_attenuation(radar, "kdp", gamma=0.8)
+    ref = wlb.atten.pia_from_kdp(radar.fields["KDP_F"]["data"], dr=0.25, gamma=0.8)
+
+    np.testing.assert_array_equal(np.ma.getdata(pia), np.ma.getdata(ref))
+
+
+def test_cache_bounded_by_maxbytes():
+    cache = upia.PiaCache(maxsize=4, maxbytes=3 * 8 * 100)
+    datas = [np.full((10, 10), float(i)) for i in range(4)]
+    for data in datas:
+        cache.get(wlb.atten.pia_from_kdp, data, {"dr": 0.25})
+
+    assert len(cache._cache) == 3
+    assert cache.nbytes <= cache.maxbytes
+    pia = cache.get(wlb.atten.pia_from_kdp, datas[-1], {"dr": 0.25})
+    assert not pia.flags.writeable
+
+
+@pytest.mark.parametrize(
+    "seed, workers, executor", [(0, 1, "thread"), (1, 3, "thread"), (2, 2, "process")]
+)
+def test_sweep_matches_wradlib(seed, workers, executor):
+    radar = _radar(seed)
+    data = radar.fields["DBZ_F"]["data"]
+    pia = upia.correct_attenuation(
+        radar, "dbz", sector="sweep", workers=workers, executor=executor, **CONSTRAINED
+    )
+    # wradlib on a (sweep x ray x gate) field, each sweep is an azimuth circle
+    ref = wlb.atten.correct_attenuation_constrained(
+        data.reshape((3, -1, data.shape[-1])), gate_length=0.25, **CONSTRAINED
+    ).reshape(data.shape)
+
+    np.testing.assert_array_equal(np.ma.getdata(pia), np.ma.getdata(ref))
+    np.testing.assert_array_equal(np.ma.getmaskarray(pia), np.ma.getmaskarray(ref))
+
+    # the whole volume call differs only around the first and last rays of the sweeps
+    whole = upia.correct_attenuation(radar, "dbz", **CONSTRAINED)
+    rays = np.where((np.ma.getdata(pia) != np.ma.getdata(whole)).any(axis=1))[0]
+    bounds = np.append(radar.sweep_start_ray_index["data"], radar.nrays)
+    dist = np.abs(rays[:, None] - bounds[None, :] + 0.5).min(axis=1)
+    assert np.all(dist < CONSTRAINED["sector_thr"])
+
+
+def test_kdp_sweep_matches_volume():
+    radar = _radar(4)
+    pia = upia.correct_attenuation(radar, "kdp", sector="sweep", workers=3, gamma=0.8)
+    ref = upia.correct_attenuation(radar, "kdp", gamma=0.8)
+
+    np.testing.assert_array_equal(np.ma.getdata(pia), np.ma.getdata(ref))
+
+
+def test_sector_invalid():
+    with pytest.raises(upia.ArgumentError):
+        upia.correct_attenuation(_radar(0), "kdp", sector=120)
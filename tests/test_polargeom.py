@@ -0,0 +1,46 @@
+import numpy as np
+import pyart
+from mtorwaradar.mdv.polargeom import GateGeometryCache
+
+POINTS = [
+    {"id": "P" + str(p), "longitude": -97.6 + 0.05 * p, "latitude": 36.4 + 0.04 * p}
+    for p in range(5)
+]
+
+
+def _radar():
+    radar = pyart.testing.make_empty_ppi_radar(50, 36, 2)
+    radar.range["data"] = np.arange(50) * 1000.0 + 500.0
+    radar.azimuth["data"] = np.tile(np.arange(36) * 10.0, 2)
+    radar.init_gate_x_y_z()
+    radar.antenna_transition = {"data": np.zeros(radar.nrays, dtype=np.int32)}
+
+    return radar
+
+
+def _index_nocache(radar, sweeps, filter_transitions):
+    return GateGeometryCache().points_index(radar, sweeps, POINTS, filter_transitions)
+
+
+def test_points_index_transitions():
+    radar = _radar()
+    cache = GateGeometryCache()
+    index = cache.points_index(radar, [0, 1], POINTS)
+
+    # the rays of the nearest gates are now in transition
+    radar.antenna_transition["data"][: radar.nrays // 2 : 2] = 1
+    out = cache.points_index(radar, [0, 1], POINTS)
+    expected = _index_nocache(radar, [0, 1], True)
+    for swp in [0, 1]:
+        np.testing.assert_array_equal(out[swp], expected[swp])
+    assert any([not np.array_equal(out[swp], index[swp]) for swp in [0, 1]])
+
+    # the transitions are not used without filter
+    out = cache.points_index(radar, [0, 1], POINTS, filter_transitions=False)
+    for swp in [0, 1]:
+        np.testing.assert_array_equal(out[swp], index[swp])
+
+    # same transitions, from the cache
+    assert cache.points_index(radar, [0, 1], POINTS) is cache.points_index(
+        radar, [0, 1], POINTS
+    )
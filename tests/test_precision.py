@@ -0,0 +1,181 @@
+import functools
+import multiprocessing
+import numpy as np
+import pytest
+import wradlib as wlb
+from pyart.testing import make_empty_ppi_radar
+from mtorwaradar.util import parallel
+from mtorwaradar.util import pia as upia
+from mtorwaradar.util.filter import median_filter, median_filter_censor, smooth_trim_scan
+from mtorwaradar.util.precision import set_precision, get_precision
+from mtorwaradar.qpe.precip_polar import rate_all
+from mtorwaradar.qpe.create_cappi import create_cappi_grid
+
+# Tolerances float32 vs float64, for float64 source data
+# - filters: the median and the smoothing of the float32 data,
+#   one rounding of the inputs and of the sum, rtol 1e-6
+# - PIA: computed in float64 and cast, rtol 1e-7 (float32 rounding)
+# - rain rates: rounding of the fields propagated through the power laws,
+#   rtol 2e-6, 3e-5 for RATE_ZPOLY (cancellation in the polynomial)
+# - CAPPI: 'one_altitude' copies the nearest gate, rtol 1e-7,
+#   'composite_altitude' averages in float32, rtol 1e-6
+RTOL_FILTER = 1e-6
+RTOL_PIA = 1e-7
+RTOL_RATE = 2e-6
+RTOL_RATE_ZPOLY = 3e-5
+RTOL_CAPPI = 1e-7
+RTOL_CAPPI_MEAN = 1e-6
+
+METHODS = ["RATE_Z", "RATE_ZPOLY", "RATE_Z_ZDR", "RATE_KDP", "RATE_KDP_ZDR", "RATE_HYBRID"]
+
+
+def _radar(seed=0, nsweeps=5, nrays=360, ngates=400):
+    rng = np.random.default_rng(seed)
+    radar = make_empty_ppi_radar(ngates, nrays, nsweeps)
+    radar.fixed_angle["data"] = np.array([0.5, 1.5, 2.5, 4.0, 6.0])[:nsweeps]
+    radar.elevation["data"] = np.repeat(radar.fixed_angle["data"], nrays)
+    radar.range["data"] = np.arange(ngates) * 500.0 + 250.0
+    radar.range["meters_between_gates"] = 500.0
+    radar.init_gate_x_y_z()
+    radar.init_gate_longitude_latitude()
+    radar.init_gate_altitude()
+
+    size = (radar.nrays, radar.ngates)
+    mask = rng.random(size) < 0.1
+    fields = {
+        "DBZ_F": rng.uniform(20.0, 60.0, size),
+        "ZDR_F": rng.uniform(0.2, 4.0, size),
+        "KDP_F": rng.uniform(0.0, 4.0, size),
+        "RHOHV_F": rng.uniform(0.6, 1.0, size),
+    }
+    for name, data in fields.items():
+        radar.add_field(name, {"data": np.ma.masked_array(data, mask=mask)})
+
+    return radar
+
+
+@pytest.fixture
+def precision():
+    old = np.dtype(get_precision()).name
+    yield set_precision
+    set_precision(old)
+
+
+def _both(precision, fun, *args, **kwargs):
+    precision("float64")
+    out64 = fun(*args, **kwargs)
+    precision("float32")
+    out32 = fun(*args, **kwargs)
+
+    return out64, out32
+
+
+def _assert_close(out64, out32, rtol):
+    assert out64.dtype == np.float64
+    assert out32.dtype == np.float32
+    np.testing.assert_array_equal(np.ma.getmaskarray(out32), np.ma.getmaskarray(out64))
+    valid = ~np.ma.getmaskarray(out64)
+    np.testing.assert_allclose(
+        np.asarray(out32)[valid], np.asarray(out64)[valid], rtol=rtol
+    )
+
+
+@pytest.mark.parametrize(
+    "fun, kwargs",
+    [
+        (median_filter, {}),
+        (median_filter_censor, {"censor_field": "RHOHV_F", "censor_thres": 0.7}),
+        (smooth_trim_scan, {}),
+    ],
+)
+def test_filter_precision(precision, fun, kwargs):
+    radar = _radar()
+    out64, out32 = _both(precision, fun, radar, "DBZ_F", **kwargs)
+
+    _assert_close(out64, out32, RTOL_FILTER)
+
+
+@pytest.mark.parametrize("pia_field", ["dbz", "kdp"])
+def test_pia_precision(precision, pia_field):
+    radar = _radar(nsweeps=2, ngates=200)
+    dbz = radar.fields["DBZ_F"]["data"]
+    radar.fields["DBZ_F"]["data"] = np.ma.masked_array(
+        np.random.default_rng(3).normal(20.0, 8.0, dbz.shape), mask=dbz.mask
+    )
+    kwargs = {
+        "constraints": [wlb.atten.constraint_dbz, wlb.atten.constraint_pia],
+        "constraint_args": [[59.0], [20.0]],
+    }
+
+    upia.configure_pia_cache(maxsize=0)
+    try:
+        out64, out32 = _both(
+            precision, upia.correct_attenuation, radar, pia_field, **kwargs
+        )
+    finally:
+        upia.configure_pia_cache()
+
+    _assert_close(out64, out32, RTOL_PIA)
+
+
+def test_rain_rate_precision(precision):
+    radar = _radar(1)
+    rt64, rt32 = _both(precision, rate_all, radar, methods=METHODS)
+
+    for m in METHODS:
+        rtol = RTOL_RATE_ZPOLY if m == "RATE_ZPOLY" else RTOL_RATE
+        _assert_close(
+            rt64[m].fields["rain_rate"]["data"], rt32[m].fields["rain_rate"]["data"], rtol
+        )
+
+
+@pytest.mark.parametrize(
+    "cappi, param_cappi, rtol",
+    [
+        ("one_altitude", 2.0, RTOL_CAPPI),
+        (
+            "composite_altitude",
+            {"fun": "average", "min_alt": 1.0, "max_alt": 3.0},
+            RTOL_CAPPI_MEAN,
+        ),
+    ],
+)
+def test_cappi_precision(precision, cappi, param_cappi, rtol):
+    radar = _radar(2)
+    (_, _, d64), (_, _, d32) = _both(
+        precision,
+        create_cappi_grid,
+        radar,
+        ["DBZ_F"],
+        cappi=cappi,
+        param_cappi=param_cappi,
+        grid_mapping=True,
+    )
+
+    _assert_close(d64["DBZ_F"], d32["DBZ_F"], rtol)
+
+
+########
+# precision of the worker processes
+
+
+def _step_precision(time):
+    return time, np.dtype(get_precision()).name
+
+
+@pytest.mark.parametrize("method", ["spawn", "forkserver"])
+def test_run_time_steps_precision(precision, monkeypatch, method):
+    if method not in multiprocessing.get_all_start_methods():
+        pytest.skip(method + " not available")
+    monkeypatch.setattr(
+        parallel,
+        "ProcessPoolExecutor",
+        functools.partial(
+            parallel.ProcessPoolExecutor, mp_context=multiprocessing.get_context(method)
+        ),
+    )
+
+    precision("float32")
+    out = parallel.run_time_steps(_step_precision, ["t1", "t2", "t3"], workers=2)
+
+    assert out == [("t1", "float32"), ("t2", "float32"), ("t3", "float32")]
@@ -0,0 +1,180 @@
+import os
+import copy
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from netCDF4 import Dataset as ncdf
+from pyart.testing import make_empty_ppi_radar
+from mtorwaradar.api import create_cappi_loc, qpe_cappi_loc, create_vad_loc
+from mtorwaradar.api import create_echotops, create_echotops_loc
+from mtorwaradar.api import create_cappi, qpe_cappi
+from mtorwaradar.mdv.creategrid import grid_data_from_radar
+from mtorwaradar.mdv.echotops import echo_tops_stack
+
+
+def _captured_pars(module, driver, monkeypatch, *args, **kwargs):
+    captured = list()
+    monkeypatch.setattr(
+        module,
+        "run_time_steps",
+        lambda fun, seqTime, **kw: captured.append(fun.keywords["pars"]),
+    )
+    driver("dirMDV", "dirOUT", "2024-01-01 00:00", "2024-01-01 00:05", *args, **kwargs)
+
+    return captured[0]
+
+
+CAPPI_KWARGS = {
+    "pia": {"method": "dbz", "pars": {"constraints": "both", "a_max": 0.0003}},
+    "dbz_fields": "DBZ_F",
+    "filter": {"method": "median_filter_censor", "pars": {"censor_field": "NCP"}},
+    "filter_fields": ["DBZ_F", "ZDR_F"],
+    "cappi": {"method": "one_altitude", "pars": {"alt": 3}},
+    "grid_mapping": True,
+}
+
+QPE_KWARGS = {
+    "qpe": {"method": "RATE_KDP", "pars": {"alpha": 50}},
+    "pia": {"method": "kdp"},
+    "filter": {"method": "median_filter"},
+    "grid_mapping": True,
+}
+
+
+def test_cappi_product_pars(monkeypatch):
+    kwargs = copy.deepcopy(CAPPI_KWARGS)
+    fun = create_cappi_loc.cappi_product("dirMDV", "dirOUT", "DBZ_F", **kwargs)
+    pars = _captured_pars(
+        create_cappi_loc,
+        create_cappi_loc.createCAPPI,
+        monkeypatch,
+        "DBZ_F",
+        **copy.deepcopy(CAPPI_KWARGS)
+    )
+
+    assert fun.keywords["pars"] == pars
+    assert pars["grid_mapping"] is True
+    assert fun.keywords["dirOUT"] == "dirOUT"
+    # the arguments are not modified
+    assert kwargs == CAPPI_KWARGS
+
+
+def test_qpe_product_pars(monkeypatch):
+    kwargs = copy.deepcopy(QPE_KWARGS)
+    fun = qpe_cappi_loc.qpe_product("dirMDV", "dirOUT", **kwargs)
+    pars = _captured_pars(
+        qpe_cappi_loc,
+        qpe_cappi_loc.computeCAPPIQPE,
+        monkeypatch,
+        **copy.deepcopy(QPE_KWARGS)
+    )
+
+    assert fun.keywords["pars"] == pars
+    assert pars["grid_mapping"] is True
+    assert kwargs == QPE_KWARGS
+
+
+def test_products_picklable():
+    products = [
+        create_cappi_loc.cappi_product("dirMDV", "dirOUT", ["DBZ_F"], **CAPPI_KWARGS),
+        qpe_cappi_loc.qpe_product("dirMDV", "dirOUT", **QPE_KWARGS),
+        create_echotops_loc.echotops_product("dirMDV", "dirOUT", thres=[15, 30]),
+        create_vad_loc.vad_product("dirMDV", "dirOUT", heights=[0, 5000, 250]),
+    ]
+    for fun in products:
+        fun2 = pickle.loads(pickle.dumps(fun))
+        assert fun2.func is fun.func
+        assert repr(fun2.keywords) == repr(fun.keywords)
+
+
+def _radar():
+    rng = np.random.default_rng(0)
+    radar = make_empty_ppi_radar(300, 360, 5)
+    radar.fixed_angle["data"] = np.array([0.5, 1.5, 3.0, 6.0, 10.0])
+    radar.elevation["data"] = np.repeat(radar.fixed_angle["data"], 360)
+    radar.range["data"] = np.arange(300) * 500.0 + 250.0
+    radar.init_gate_x_y_z()
+    radar.init_gate_longitude_latitude()
+    radar.init_gate_altitude()
+    dbz = rng.normal(25.0, 10.0, (radar.nrays, radar.ngates))
+    radar.add_field("DBZ_F", {"data": np.ma.masked_less(dbz, 5.0)})
+
+    return radar
+
+
+@pytest.mark.parametrize("grid_mapping", [False, True])
+def test_cappi_grid_mapping_passed(monkeypatch, grid_mapping):
+    radar = _radar()
+    captured = list()
+
+    def cappi_grid(radar, fields, cappi, param_cappi, backend, grid_mapping):
+        captured.append(grid_mapping)
+        data = dict((f, np.ma.zeros((2, 2))) for f in fields)
+        return np.arange(2.0), np.arange(2.0), data
+
+    for module in [create_cappi, qpe_cappi]:
+        monkeypatch.setattr(module, "readRadarPolar", lambda *args: radar)
+        monkeypatch.setattr(module, "radarPolarTimeInfo", lambda *args: {})
+        monkeypatch.setattr(module, "create_cappi_grid", cappi_grid)
+
+    fun = create_cappi_loc.cappi_product(
+        "dirMDV", "dirOUT", "DBZ_F", grid_mapping=grid_mapping
+    )
+    pars = fun.keywords["pars"]
+    create_cappi.create_cappi_data("dirMDV", None, "2024-01-01-00-00", pars)
+    fun = qpe_cappi_loc.qpe_product(
+        "dirMDV", "dirOUT", apply_cmd=False, grid_mapping=grid_mapping
+    )
+    qpe_cappi.compute_cappi_qpe("dirMDV", "2024-01-01-00-00", fun.keywords["pars"])
+
+    assert captured == [grid_mapping, grid_mapping]
+
+
+def test_echotops_product(tmp_path, monkeypatch):
+    radar = _radar()
+    monkeypatch.setattr(create_echotops, "readRadarPolar", lambda *args: radar)
+    monkeypatch.setattr(
+        create_echotops,
+        "radarPolarTimeInfo",
+        lambda radar, time_zone: {
+            "format": "20240101000000",
+            "value": 1704067200.0,
+            "unit": "seconds since 1970-01-01 00:00:00",
+        },
+    )
+
+    fun = create_echotops_loc.echotops_product(
+        "dirMDV", str(tmp_path), thres=[10, 32.5], grid_mapping=True, time_zone="UTC"
+    )
+    out_file = fun("2024-01-01-00-00")
+    assert out_file == os.path.join(str(tmp_path), "echotops_20240101000000.nc")
+
+    grid = grid_data_from_radar(radar, ["DBZ_F"], z_lim=(0.0, 17000.0))
+    ref = echo_tops_stack(grid["fields"]["DBZ_F"], grid["z"] / 1000, [10, 32.5])
+    with ncdf(out_file) as nc:
+        for j, name in enumerate(["Tops10", "Tops32.5"]):
+            tops = nc.variables[name][0, :, :]
+            np.testing.assert_array_equal(np.ma.getmaskarray(tops), ref[j].mask)
+            np.testing.assert_allclose(tops.compressed(), ref[j].compressed(), rtol=1e-6)
+
+
+def test_vad_product(tmp_path, monkeypatch):
+    def vad_data(dirMDV, source, time, z_want, vel_field, time_zone, engine):
+        n = len(z_want)
+        return {
+            "time": "20240101000000",
+            "height": z_want,
+            "speed": np.full(n, 5.0),
+            "direction": np.full(n, 90.0),
+            "u_wind": np.full(n, -5.0),
+            "v_wind": np.zeros(n),
+        }
+
+    monkeypatch.setattr(create_vad_loc, "create_vad_data", vad_data)
+    fun = create_vad_loc.vad_product("dirMDV", str(tmp_path), heights=[0, 1000, 250])
+    out_file = fun("2024-01-01-00-00")
+
+    tab = pd.read_csv(out_file)
+    assert list(tab.columns) == ["time", "height", "speed", "direction", "u_wind", "v_wind"]
+    np.testing.assert_array_equal(tab["height"], [0, 250, 500, 750, 1000])
@@ -0,0 +1,199 @@
+import os
+import numpy as np
+import pytest
+from mtorwaradar.api.qpe_accumulation import PrecipAccumulator
+
+# on the hour
+T0 = 1.6e9 - 1.6e9 % 3600
+WINDOWS = [3600, 10800, 86400]
+
+
+def _grid(ny=30, nx=40):
+    return np.linspace(29.0, 31.0, nx), np.linspace(-3.0, -1.0, ny)
+
+
+def _rates(nscan, seed=0, ny=30, nx=40):
+    rng = np.random.default_rng(seed)
+    for k in range(nscan):
+        rate = rng.gamma(0.5, 4.0, (ny, nx))
+        rate = np.ma.masked_where(rng.random((ny, nx)) < 0.2, rate)
+        yield T0 + 300.0 * k, rate
+
+
+def _bucket_files(folder):
+    return sorted(f for f in os.listdir(folder) if f != "state.npz")
+
+
+def _assert_same(acc1, acc2):
+    assert acc1.last_time == acc2.last_time
+    for w in WINDOWS:
+        a1 = acc1.accumulation(w)
+        a2 = acc2.accumulation(w)
+        np.testing.assert_allclose(a2["data"], a1["data"], rtol=1e-6, atol=1e-6)
+        assert a2["coverage"] == a1["coverage"]
+
+
+def test_restore_from_checkpoint(tmp_path):
+    lon, lat = _grid()
+    folder = str(tmp_path / "acc")
+    acc = PrecipAccumulator(checkpoint=folder)
+    ref = PrecipAccumulator()
+    scans = list(_rates(40))
+    for t, rate in scans[:30]:
+        acc.add(t, rate, lon, lat)
+        ref.add(t, rate, lon, lat)
+
+    restored = PrecipAccumulator(checkpoint=folder)
+    _assert_same(ref, restored)
+
+    # the restored accumulator goes on as the original one
+    for t, rate in scans[30:]:
+        restored.add(t, rate, lon, lat)
+        ref.add(t, rate, lon, lat)
+    _assert_same(ref, PrecipAccumulator(checkpoint=folder))
+
+
+def test_only_modified_buckets_written(tmp_path):
+    lon, lat = _grid()
+    folder = str(tmp_path / "acc")
+    acc = PrecipAccumulator(checkpoint=folder)
+    scans = list(_rates(20))
+    for t, rate in scans[:-1]:
+        acc.add(t, rate, lon, lat)
+    before = set(_bucket_files(folder))
+
+    acc.add(*scans[-1], lon, lat)
+    after = set(_bucket_files(folder))
+
+    # one bucket per window, the file of the expired bucket of the 1h window
+    # is removed, the 3h and 24h buckets are new
+    assert len(after - before) == len(WINDOWS)
+    assert [f.split("_")[0] for f in before - after] == ["w3600"]
+    assert len(after) == 12 + 20 + 20
+
+
+def _brute_force(scans, time, window, step=300, max_gap=900):
+    # the rate of each scan over the time since the previous scan, up to max_gap,
+    # summed over the scans of the window ending at time
+    total = 0.0
+    seconds = 0.0
+    previous = None
+    for t, rate in scans:
+        if t > time:
+            break
+        dt = step if previous is None else min(t - previous, max_gap)
+        previous = t
+        if t > time - window:
+            total = total + np.ma.filled(rate, 0.0) * dt / 3600.0
+            seconds += dt
+    return total, min(seconds / window, 1.0)
+
+
+def test_matches_brute_force():
+    lon, lat = _grid(6, 5)
+    scans = list(_rates(400, seed=3, ny=6, nx=5))
+    rng = np.random.default_rng(3)
+    # missing scans, single (600 s) and longer than max_gap
+    keep = rng.random(len(scans)) > 0.15
+    keep[100:103] = False
+    # a gap longer than the 1h and 3h windows
+    keep[200:240] = False
+    scans = [s for s, k in zip(scans, keep) if k]
+
+    acc = PrecipAccumulator()
+    checks = 0
+    for k, (t, rate) in enumerate(scans):
+        acc.add(t, rate, lon, lat)
+        if k % 7 != 0 and t != scans[-1][0]:
+            continue
+        for w in WINDOWS:
+            ref, coverage = _brute_force(scans, t, w)
+            res = acc.accumulation(w)
+            np.testing.assert_allclose(res["data"], ref, rtol=1e-5, atol=1e-4)
+            assert res["coverage"] == pytest.approx(coverage)
+        checks += 1
+
+    # the 24h window has expired the first scans
+    assert scans[-1][0] - scans[0][0] > 86400
+    assert checks > 40
+
+
+def test_coarse_bucket():
+    lon, lat = _grid(6, 5)
+    scans = list(_rates(30, seed=1, ny=6, nx=5))
+    acc = PrecipAccumulator(bucket={86400: 3600})
+    fine = PrecipAccumulator()
+    for t, rate in scans:
+        acc.add(t, rate, lon, lat)
+        fine.add(t, rate, lon, lat)
+
+    assert acc.bucket == {3600: 300, 10800: 300, 86400: 3600}
+    assert acc._sums[86400].nbucket == 24
+    # all the scans within the 24h window, same accumulation
+    np.testing.assert_allclose(
+        acc.accumulation(86400)["data"], fine.accumulation(86400)["data"], rtol=1e-5
+    )
+
+
+def test_checkpoint_every(tmp_path):
+    lon, lat = _grid()
+    folder = str(tmp_path / "acc")
+    acc = PrecipAccumulator(checkpoint=folder, checkpoint_every=4)
+    scans = list(_rates(10))
+    for t, rate in scans:
+        acc.add(t, rate, lon, lat)
+
+    # saved after the 4th and the 8th scans
+    restored = PrecipAccumulator(checkpoint=folder)
+    assert restored.last_time == scans[7][0]
+
+    ref = PrecipAccumulator()
+    for t, rate in scans[:8]:
+        ref.add(t, rate, lon, lat)
+    _assert_same(ref, restored)
+
+    acc.save()
+    _assert_same(acc, PrecipAccumulator(checkpoint=folder))
+
+
+def test_interrupted_save_keeps_last_checkpoint(tmp_path, monkeypatch):
+    lon, lat = _grid()
+    folder = str(tmp_path / "acc")
+    acc = PrecipAccumulator(checkpoint=folder)
+    ref = PrecipAccumulator()
+    scans = list(_rates(6))
+    for t, rate in scans[:5]:
+        acc.add(t, rate, lon, lat)
+        ref.add(t, rate, lon, lat)
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        acc.add(*scans[5], lon, lat)
+    monkeypatch.undo()
+
+    _assert_same(ref, PrecipAccumulator(checkpoint=folder))
+
+
+def test_save_to_another_folder(tmp_path):
+    lon, lat = _grid()
+    acc = PrecipAccumulator(checkpoint=str(tmp_path / "acc"))
+    for t, rate in _rates(15):
+        acc.add(t, rate, lon, lat)
+
+    other = str(tmp_path / "copy")
+    acc.save(other)
+    _assert_same(acc, PrecipAccumulator(checkpoint=other))
+
+
+def test_windows_differ(tmp_path):
+    lon, lat = _grid()
+    folder = str(tmp_path / "acc")
+    acc = PrecipAccumulator(checkpoint=folder)
+    for t, rate in _rates(3):
+        acc.add(t, rate, lon, lat)
+
+    with pytest.raises(ValueError):
+        PrecipAccumulator(windows=[3600], checkpoint=folder)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from mtorwaradar.api.qvp_store import QvpStore
+
+PARAMS = {
+    "fields": ["DBZ_F", "ZDR_F"],
+    "desired_angle": 15.0,
+    "sweep_only": True,
+    "percentiles": [50, 10],
+    "count": True,
+}
+
+
+def _qvp(time, value=1.0, nrange=10):
+    return {
+        "time": time,
+        "mdv_time": time,
+        "elevation": 15.0,
+        "height": np.arange(nrange) * 100.0,
+        "data": {"DBZ_F": np.ma.masked_array(np.full(nrange, value))},
+    }
+
+
+def test_append_overwrites_same_time(tmp_path):
+    ncfile = str(tmp_path / "qvp.nc")
+    with QvpStore(ncfile, params=PARAMS) as store:
+        store.append([_qvp("20240101000000"), _qvp("20240101000500")])
+        store.append(_qvp("20240101000000", 2.0))
+
+    with QvpStore(ncfile, params=PARAMS) as store:
+        out = store.read()
+        assert [q["time"] for q in out] == ["20240101000000", "20240101000500"]
+        np.testing.assert_array_equal(out[0]["data"]["DBZ_F"], 2.0)
+        store.append(_qvp("20240101001000"))
+        assert len(store.read()) == 3
+
+
+def test_params_equivalent(tmp_path):
+    ncfile = str(tmp_path / "qvp.nc")
+    with QvpStore(ncfile, params=PARAMS) as store:
+        store.append(_qvp("20240101000000"))
+
+    same = dict(PARAMS, fields=["ZDR_F", "DBZ_F"], percentiles=[10.0, 50.0])
+    with QvpStore(ncfile, params=same) as store:
+        assert len(store.read()) == 1
+    # not checked without parameters
+    with QvpStore(ncfile) as store:
+        assert len(store.read()) == 1
+
+
+@pytest.mark.parametrize(
+    "key, value",
+    [
+        ("fields", ["DBZ_F"]),
+        ("desired_angle", 20.0),
+        ("sweep_only", False),
+        ("percentiles", [90]),
+        ("count", False),
+    ],
+)
+def test_params_mismatch(tmp_path, key, value):
+    ncfile = str(tmp_path / "qvp.nc")
+    with QvpStore(ncfile, params=PARAMS) as store:
+        store.append(_qvp("20240101000000"))
+
+    with pytest.raises(ValueError, match=key):
+        QvpStore(ncfile, params=dict(PARAMS, **{key: value}))
+
+
+def test_params_not_recorded(tmp_path):
+    ncfile = str(tmp_path / "qvp.nc")
+    with QvpStore(ncfile) as store:
+        store.append(_qvp("20240101000000"))
+
+    with pytest.raises(ValueError):
+        QvpStore(ncfile, params=PARAMS)
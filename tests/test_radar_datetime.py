@@ -0,0 +1,163 @@
+import datetime
+import os
+import re
+import pytest
+from mtorwaradar.util import radarDateTime
+from mtorwaradar.util.radarDateTime import MdvCatalog
+
+
+########
+## The os.listdir implementation before the catalog
+
+
+def _list_times(dirMDV, heure):
+    dt = []
+    for x in heure:
+        d = x.strftime("%Y%m%d")
+        pattern = "^" + x.strftime("%H") + ".+\\.mdv$"
+        ddir = os.path.join(dirMDV, d)
+        if not os.path.isdir(ddir):
+            continue
+        ff = [f for f in os.listdir(ddir) if re.match(pattern, f)]
+        dt = dt + [os.path.splitext(d + f)[0] for f in ff]
+
+    return [datetime.datetime.strptime(t, "%Y%m%d%H%M%S") for t in dt]
+
+
+def _hours(daty):
+    heure = list(set([x.strftime("%Y%m%d%H") for x in daty]))
+    return [datetime.datetime.strptime(t, "%Y%m%d%H") for t in heure]
+
+
+def _nearest_baseline(dirMDV, time):
+    t0 = datetime.datetime.strptime(time, "%Y-%m-%d-%H-%M")
+    daty = [t0 + datetime.timedelta(seconds=s) for s in [-300, 0, 300]]
+    dt = [t for t in _list_times(dirMDV, _hours(daty)) if daty[0] <= t <= daty[2]]
+    if len(dt) == 0:
+        return None
+
+    tr = min(dt, key=lambda x: abs(x - t0))
+    return [tr.strftime("%Y%m%d"), tr.strftime("%H%M%S")]
+
+
+def _end_baseline(dirMDV, time):
+    t0 = datetime.datetime.strptime(time, "%Y-%m-%d-%H-%M")
+    daty = [t0, t0 + datetime.timedelta(seconds=300)]
+    dt = [t for t in _list_times(dirMDV, _hours(daty)) if t0 <= t <= daty[1]]
+    if len(dt) == 0:
+        return None
+
+    tr = sorted(dt)[0]
+    return [tr.strftime("%Y%m%d"), tr.strftime("%H%M%S")]
+
+
+########
+
+
+def _touch(dirMDV, t):
+    ddir = os.path.join(str(dirMDV), t.strftime("%Y%m%d"))
+    os.makedirs(ddir, exist_ok=True)
+    mdvfile = os.path.join(ddir, t.strftime("%H%M%S") + ".mdv")
+    open(mdvfile, "w").close()
+    return ddir
+
+
+def _set_mtime(ddir, ns):
+    os.utime(ddir, ns=(ns, ns))
+
+
+@pytest.fixture
+def day_boundary(tmp_path):
+    # scans every 6 minutes around midnight, not aligned with the 5 minutes steps
+    t = datetime.datetime(2024, 1, 1, 23, 40, 17)
+    while t < datetime.datetime(2024, 1, 2, 0, 20):
+        _touch(tmp_path, t)
+        t += datetime.timedelta(minutes=6, seconds=1)
+    # a missing scan just after midnight
+    os.remove(os.path.join(str(tmp_path), "20240102", "000421.mdv"))
+    # files not matching the scan file names
+    open(os.path.join(str(tmp_path), "20240101", "latest.mdv"), "w").close()
+
+    return str(tmp_path)
+
+
+def _steps():
+    t = datetime.datetime(2024, 1, 1, 23, 30)
+    steps = list()
+    while t <= datetime.datetime(2024, 1, 2, 0, 30):
+        steps.append(t.strftime("%Y-%m-%d-%H-%M"))
+        t += datetime.timedelta(minutes=1)
+    return steps
+
+
+def test_end_time_day_boundary(day_boundary):
+    for time in _steps():
+        out = radarDateTime.mdv_end_time_file(day_boundary, time)
+        assert out == _end_baseline(day_boundary, time), time
+
+
+def test_nearest_time_day_boundary(day_boundary):
+    for time in _steps():
+        out = radarDateTime.mdv_nearest_time_file(day_boundary, time)
+        assert out == _nearest_baseline(day_boundary, time), time
+
+
+def test_reindex_on_mtime(tmp_path):
+    t0 = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    ddir = _touch(tmp_path, t0)
+    _set_mtime(ddir, 10**18)
+    catalog = MdvCatalog(str(tmp_path))
+    assert catalog.end_time(t0) == t0
+
+    # a new file, the modification time of the folder is restored:
+    # the folder is not listed again
+    t1 = t0 + datetime.timedelta(minutes=2)
+    _touch(tmp_path, t1)
+    _set_mtime(ddir, 10**18)
+    assert catalog.times_between(t0, t1) == [t0]
+
+    # the modification time changed, the folder is listed again
+    _set_mtime(ddir, 10**18 + 1)
+    assert catalog.times_between(t0, t1) == [t0, t1]
+    assert catalog.nearest_time(t1 + datetime.timedelta(seconds=30)) == t1
+
+    # a file removed
+    os.remove(os.path.join(ddir, "120000.mdv"))
+    _set_mtime(ddir, 10**18 + 2)
+    assert catalog.end_time(t0) == t1
+
+
+def test_missing_folders(tmp_path):
+    t0 = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    catalog = MdvCatalog(str(tmp_path / "missing"))
+    assert catalog.end_time(t0) is None
+    assert catalog.nearest_time(t0) is None
+    catalog.refresh()
+
+    # the date folder missing, then created, then removed
+    catalog = MdvCatalog(str(tmp_path))
+    assert catalog.end_time(t0) is None
+    ddir = _touch(tmp_path, t0)
+    assert catalog.end_time(t0) == t0
+    os.remove(os.path.join(ddir, "120000.mdv"))
+    os.rmdir(ddir)
+    assert catalog.end_time(t0) is None
+    assert "20240101" not in catalog._folders
+
+    missing = str(tmp_path / "missing")
+    assert radarDateTime.mdv_end_time_file(missing, "2024-01-01-12-00") is None
+    assert radarDateTime.mdv_nearest_time_file(missing, "2024-01-01-12-00") is None
+    seq = radarDateTime.mdv_seq_times_files(
+        str(tmp_path), "2024-01-01-12-00", "2024-01-01-13-00"
+    )
+    assert seq is None
+
+
+def test_refresh(tmp_path):
+    for day in [1, 2]:
+        _touch(tmp_path, datetime.datetime(2024, 1, day, 12, 0, 0))
+    os.makedirs(os.path.join(str(tmp_path), "tmp"))
+
+    catalog = MdvCatalog(str(tmp_path))
+    catalog.refresh()
+    assert sorted(catalog._folders) == ["20240101", "20240102"]
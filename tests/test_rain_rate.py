@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+from pyart.testing import make_empty_ppi_radar
+from mtorwaradar.qpe.precip_polar import (
+    rate_zh,
+    rate_zpoly,
+    rate_z_zdr,
+    rate_kdp,
+    rate_kdp_zdr,
+    rate_all,
+)
+from mtorwaradar.qpe.precipCalc_polar import calculate_all_rates
+from mtorwaradar.qpe.rain_rate import rr_hybrid
+from mtorwaradar.util.precision import set_precision, get_precision
+from mtorwaradar.util.utilities import ArgumentError
+
+# The low-allocation kernels (low_memory=True) compute the powers with exp/log,
+# the relative difference with the masked implementation is within the float32
+# rounding of the exponent (about 1e-5 for RATE_ZPOLY in float32)
+RTOL = 2e-5
+
+METHODS = ["RATE_Z", "RATE_ZPOLY", "RATE_Z_ZDR", "RATE_KDP", "RATE_KDP_ZDR", "RATE_HYBRID"]
+HYBRID_INPUTS = ["RATE_Z", "RATE_Z_ZDR", "RATE_KDP", "RATE_KDP_ZDR"]
+
+
+def _radar(seed, shape=(3, 72, 200)):
+    rng = np.random.default_rng(seed)
+    radar = make_empty_ppi_radar(shape[2], shape[1], shape[0])
+    size = (radar.nrays, radar.ngates)
+
+    dbz = rng.uniform(-10.0, 70.0, size)
+    zdr = rng.uniform(-1.0, 4.0, size)
+    kdp = rng.uniform(-1.0, 6.0, size)
+    # missing values, masked and NaN
+    dbz = np.ma.masked_where(rng.random(size) < 0.1, dbz)
+    zdr[rng.random(size) < 0.05] = np.nan
+    kdp = np.ma.masked_where(rng.random(size) < 0.1, kdp)
+
+    for name, data in [("DBZ_F", dbz), ("ZDR_F", zdr), ("KDP_F", kdp)]:
+        radar.add_field(name, {"data": np.ma.asarray(data, dtype=np.float32)})
+
+    return radar
+
+
+@pytest.fixture(autouse=True, params=["float32", "float64"])
+def precision(request):
+    old = get_precision()
+    set_precision(request.param)
+    yield request.param
+    set_precision(np.dtype(old).name)
+
+
+def _assert_same_rate(rt_mask, rt_low):
+    a = rt_mask.fields["rain_rate"]["data"]
+    b = rt_low.fields["rain_rate"]["data"]
+
+    assert a.dtype == b.dtype
+    np.testing.assert_array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(b))
+    valid = ~np.ma.getmaskarray(a)
+    np.testing.assert_allclose(b.data[valid], a.data[valid], rtol=RTOL)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize(
+    "fun", [rate_zh, rate_zpoly, rate_z_zdr, rate_kdp, rate_kdp_zdr]
+)
+def test_rate_low_memory(seed, fun):
+    radar = _radar(seed)
+    _assert_same_rate(fun(radar), fun(radar, low_memory=True))
+
+
+def test_rate_zh_not_inverted():
+    radar = _radar(2)
+    coef = {"alpha": 300, "beta": 1.4, "invCoef": False}
+    _assert_same_rate(
+        rate_zh(radar, coef=coef), rate_zh(radar, coef=coef, low_memory=True)
+    )
+
+
+def test_rate_all_low_memory():
+    radar = _radar(3)
+    rt_mask = rate_all(radar, methods=METHODS)
+    rt_low = rate_all(radar, methods=METHODS, low_memory=True)
+
+    for m in METHODS[:-1]:
+        _assert_same_rate(rt_mask[m], rt_low[m])
+
+    # the low_memory hybrid evaluates its conditions as False on the masked rates
+    data = [rt_mask[m].fields["rain_rate"]["data"] for m in HYBRID_INPUTS]
+    hybrid = rt_mask["RATE_HYBRID"]
+    hybrid.fields["rain_rate"]["data"] = rr_hybrid(*data, mask_false=True)
+    _assert_same_rate(hybrid, rt_low["RATE_HYBRID"])
+
+
+def test_low_memory_input_unchanged():
+    radar = _radar(4)
+    kdp = radar.fields["KDP_F"]["data"].copy()
+    rate_all(radar, methods=["RATE_KDP", "RATE_KDP_ZDR"], low_memory=True)
+
+    np.testing.assert_array_equal(radar.fields["KDP_F"]["data"], kdp)
+
+
+def _assert_equal_rate(rt_all, rt_one):
+    a = rt_all.fields["rain_rate"]["data"]
+    b = rt_one.fields["rain_rate"]["data"]
+
+    assert a.dtype == b.dtype
+    np.testing.assert_array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(b))
+    np.testing.assert_array_equal(a.filled(0), b.filled(0))
+
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_rate_all_individual(low_memory):
+    radar = _radar(5)
+    coefs = {
+        "RATE_Z": {"alpha": 300, "beta": 1.4, "invCoef": False},
+        "RATE_KDP": {"alpha": 44.0, "beta": 0.822},
+        "RATE_HYBRID": {"hybrid_aa": 5, "hybrid_bb": 30, "hybrid_cc": 80},
+    }
+    rt_all = rate_all(radar, methods=METHODS, coef=coefs, low_memory=low_memory)
+
+    rt_one = {
+        "RATE_Z": rate_zh(radar, coef=coefs["RATE_Z"], low_memory=low_memory),
+        "RATE_ZPOLY": rate_zpoly(radar, low_memory=low_memory),
+        "RATE_Z_ZDR": rate_z_zdr(radar, low_memory=low_memory),
+        "RATE_KDP": rate_kdp(radar, coef=coefs["RATE_KDP"], low_memory=low_memory),
+        "RATE_KDP_ZDR": rate_kdp_zdr(radar, low_memory=low_memory),
+    }
+    for m, rt in rt_one.items():
+        _assert_equal_rate(rt_all[m], rt)
+
+    data = [rt_one[m].fields["rain_rate"]["data"] for m in HYBRID_INPUTS]
+    hybrid = rr_hybrid(*data, mask_false=low_memory, **coefs["RATE_HYBRID"])
+    a = rt_all["RATE_HYBRID"].fields["rain_rate"]["data"]
+    np.testing.assert_array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(hybrid))
+    np.testing.assert_array_equal(a.filled(0), hybrid.filled(0))
+
+    # only the requested methods are returned
+    rt = rate_all(radar, methods=["RATE_HYBRID"], coef=coefs, low_memory=low_memory)
+    assert list(rt) == ["RATE_HYBRID"]
+    _assert_equal_rate(rt["RATE_HYBRID"], rt_all["RATE_HYBRID"])
+
+
+def test_rate_all_invalid_coef():
+    radar = _radar(6)
+    with pytest.raises(ArgumentError):
+        rate_all(radar, methods=["RATE_Z"], coef={"RATE_X": {}})
+
+    params = {
+        "labels": ["RATE_Z"],
+        "rate_coef": {"alpha": 300, "beta": 1.4, "invCoef": False},
+    }
+    with pytest.raises(ArgumentError):
+        calculate_all_rates(radar, params)
+
+
+def _rr_hybrid_baseline(rt_zh, rt_z_zdr, rt_kdp, rt_kdp_zdr, aa=10, bb=50, cc=100):
+    # rr_hybrid before the low_memory option
+    hybrid = rt_zh.copy()
+    hybrid[np.logical_not(hybrid.mask)] = 0
+    mask_aa = rt_zh <= aa
+    hybrid[mask_aa] = rt_zh[mask_aa]
+    mask_bb = np.logical_and(rt_z_zdr <= bb, np.logical_not(mask_aa))
+    hybrid[mask_bb] = rt_z_zdr[mask_bb]
+    mask_cc = np.logical_or(np.logical_not(mask_aa), np.logical_not(mask_bb))
+    mask_cc = np.logical_and(rt_z_zdr <= cc, np.logical_not(mask_cc))
+    hybrid[mask_cc] = rt_kdp_zdr[mask_cc]
+    mask_ee = np.logical_and(rt_z_zdr > bb, np.logical_not(mask_cc))
+    hybrid[mask_ee] = rt_kdp[mask_ee]
+    return hybrid
+
+
+def test_hybrid_default_baseline():
+    radar = _radar(7)
+    rt = rate_all(radar, methods=METHODS)
+    data = [rt[m].fields["rain_rate"]["data"] for m in HYBRID_INPUTS]
+
+    a = rt["RATE_HYBRID"].fields["rain_rate"]["data"]
+    b = _rr_hybrid_baseline(*data)
+    np.testing.assert_array_equal(np.ma.getmaskarray(a), np.ma.getmaskarray(b))
+    np.testing.assert_array_equal(a.filled(0), b.filled(0))
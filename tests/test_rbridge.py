@@ -0,0 +1,99 @@
+import gc
+import numpy as np
+import pytest
+from mtorwaradar.util.utilities import npmDarray_to_rFloatVector, rFloatVector_to_npmDarray
+
+
+def _robjects():
+    try:
+        import rpy2.robjects as robjects
+
+        robjects.r("1")
+    except Exception:
+        pytest.skip("rpy2 and an R runtime are required")
+
+    return robjects
+
+
+@pytest.fixture
+def robjects():
+    return _robjects()
+
+
+def _arrays():
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=(7, 5, 3))
+    return {
+        "C": a,
+        "F": np.asfortranarray(a),
+        "float32": a.astype(np.float32),
+        "strided": rng.normal(size=(14, 5, 6))[::2, :, ::2],
+        "2d": rng.normal(size=(9, 4)),
+    }
+
+
+@pytest.mark.parametrize("name", ["C", "F", "float32", "strided", "2d"])
+def test_to_r_column_major(robjects, name):
+    arr = _arrays()[name]
+    vec = npmDarray_to_rFloatVector(arr)
+
+    # previous implementation: transposed and flattened, element by element
+    ref = robjects.FloatVector(arr.transpose().reshape(arr.size))
+    assert len(vec) == arr.size
+    np.testing.assert_array_equal(np.array(vec), np.array(ref))
+
+    # dimensions set in R, same indexing as numpy
+    r_arr = robjects.r.array(vec, robjects.IntVector(arr.shape))
+    np.testing.assert_array_equal(np.array(r_arr), arr.astype(np.float64))
+
+
+@pytest.mark.parametrize("name", ["C", "F", "float32", "strided", "2d"])
+def test_to_r_row_major(robjects, name):
+    arr = _arrays()[name]
+    vec = npmDarray_to_rFloatVector(arr, order="C")
+
+    np.testing.assert_array_equal(np.array(vec), arr.astype(np.float64).flatten())
+
+
+def test_from_r_view_and_copy(robjects):
+    arr = _arrays()["C"]
+    vec = npmDarray_to_rFloatVector(arr)
+
+    view = rFloatVector_to_npmDarray(vec, arr.shape, copy=False)
+    np.testing.assert_array_equal(view, arr)
+    # the view shares the memory of the R vector
+    view[0, 0, 0] = -1.0
+    assert vec[0] == -1.0
+
+    copy = rFloatVector_to_npmDarray(vec, arr.shape)
+    copy[0, 0, 1] = -2.0
+    assert vec[arr.shape[0] * arr.shape[1]] != -2.0
+
+
+@pytest.mark.parametrize("copy", [True, False])
+def test_from_r_vector_released(robjects, copy):
+    # the R result is a local of the interpolation functions, the array
+    # must stay valid after the R object is dropped and collected
+    arr = _arrays()["C"]
+    out = rFloatVector_to_npmDarray(npmDarray_to_rFloatVector(arr), arr.shape, copy=copy)
+    out = out[1:]
+
+    gc.collect()
+    robjects.r("gc()")
+    # allocate in R to reuse the memory of a released vector
+    robjects.r("x <- lapply(1:50, function(i) rnorm(%d))" % arr.size)
+
+    np.testing.assert_array_equal(out, arr[1:])
+    robjects.r("rm(x); gc()")
+
+
+def test_from_r_array_result(robjects):
+    # an R result with dimensions, as returned by the mtorwdata functions
+    r_arr = robjects.r("array(as.numeric(1:60), dim = c(3, 4, 5))")
+    out = rFloatVector_to_npmDarray(r_arr, (3, 4, 5))
+    ref = np.arange(1.0, 61.0).reshape((3, 4, 5), order="F")
+
+    np.testing.assert_array_equal(out, ref)
+
+    out = rFloatVector_to_npmDarray(r_arr, (12, 5))
+    np.testing.assert_array_equal(out, ref.reshape((12, 5), order="F"))
@@ -0,0 +1,207 @@
+import struct
+import zlib
+import numpy as np
+import pytest
+import pyart
+from pyart.io import mdv_common
+from pyart.testing import MDV_PPI_FILE, MDV_GRID_FILE
+from mtorwaradar.mdv import readmdv
+from mtorwaradar.mdv.readmdv import MdvReader
+
+
+@pytest.fixture
+def count_parse(monkeypatch):
+    # count the number of times the MDV headers are parsed
+    calls = list()
+    init = mdv_common.MdvFile.__init__
+
+    def counted(self, *args, **kwargs):
+        calls.append(1)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(mdv_common.MdvFile, "__init__", counted)
+
+    return calls
+
+
+class _MdvWriter(mdv_common.MdvFile):
+    # 8-bit levels, the level RL8 is run length encoded, the others zlib compressed
+    RL8 = 1
+
+    def _write_a_field(self, fnum):
+        fh = self.field_headers[fnum]
+        data = self.fields_data[fnum]
+        nz = fh["nz"]
+        start = self.fileptr.tell()
+        self.fileptr.write(b"\x00" * 8 * nz)
+        offsets, nbytes = list(), list()
+        size = 0
+        for sw in range(nz):
+            raw = np.round((data[sw] - fh["bias"]) / fh["scale"])
+            raw = np.where(np.isnan(data[sw]), fh["bad_data_value"], raw)
+            raw = raw.astype(">B").tobytes()
+            if sw == self.RL8:
+                coded = _rle8(raw, 255)
+                # 20 bytes header: flag, key, nbytes_array, nbytes_full, nbytes_coded
+                info = (mdv_common.RL8_COMPRESSION, 255, len(coded) + 20, len(raw))
+                block = struct.pack(">5I", *info, len(coded)) + coded
+            else:
+                coded = zlib.compress(raw)
+                info = (mdv_common.ZLIB_COMPRESSED, len(raw), len(coded) + 24)
+                block = struct.pack(">6I", *info, len(coded), 0, 0) + coded
+            offsets.append(size)
+            nbytes.append(len(block))
+            self.fileptr.write(block)
+            size += len(block)
+        end = self.fileptr.tell()
+        self.fileptr.seek(start)
+        self._write_levels_info(nz, {"vlevel_offsets": offsets, "vlevel_nbytes": nbytes})
+        self.fileptr.seek(end)
+        fh["volume_size"] = size + 8 * nz
+
+
+def _rle8(raw, key):
+    coded = bytearray()
+    i = 0
+    while i < len(raw):
+        j = i
+        while j < len(raw) and j - i < 255 and raw[j] == raw[i]:
+            j += 1
+        if j - i > 3:
+            coded += bytes([key, j - i, raw[i]])
+            i = j
+        else:
+            coded.append(raw[i])
+            i += 1
+    return bytes(coded)
+
+
+@pytest.fixture
+def mdv_volume(tmp_path):
+    # 3 sweeps volume from the pyart PPI file, distinct data for each sweep
+    nz = 3
+    writer = _MdvWriter(MDV_PPI_FILE)
+    fh = writer.field_headers[0]
+    fh.update(
+        nz=nz,
+        encoding_type=mdv_common.ENCODING_INT8,
+        data_element_nbytes=1,
+        scale=0.5,
+        bias=-32.0,
+        bad_data_value=0.0,
+        missing_data_value=0.0,
+    )
+    writer.master_header["max_nz"] = nz
+    writer.elevations = list(writer.vlevel_headers[0]["level"][:nz])
+    for chunk in writer.chunk_headers:
+        if chunk["chunk_id"] == mdv_common.CHUNK_DSRADAR_ELEVATIONS:
+            chunk["size"] = 4 * nz
+
+    rng = np.random.default_rng(0)
+    data = -30.0 + 0.5 * rng.integers(1, 150, size=(nz, fh["ny"], fh["nx"]))
+    for sw in range(nz):
+        # runs for the RL8 level and missing gates
+        data[sw, :, : 20 * (sw + 1)] = 10.0 * sw
+        data[sw, ::7, -10:] = np.nan
+    writer.fields_data[0] = data
+
+    filename = str(tmp_path / "volume.mdv")
+    writer.write(filename)
+    writer.fileptr.close()
+
+    return filename, data
+
+
+@pytest.mark.parametrize("sweeps", [[1], [2], [2, 0], [1, 2, 1]])
+def test_radar_polar_sweeps_multi(mdv_volume, sweeps):
+    filename, data = mdv_volume
+    radar = readmdv.radarPolar(filename, "DBZ_F", sweeps=sweeps)
+    ref = pyart.io.read_mdv(filename, file_field_names=True).extract_sweeps(sweeps)
+
+    assert radar.nsweeps == len(sweeps)
+    for key in ["elevation", "azimuth", "fixed_angle", "sweep_start_ray_index"]:
+        np.testing.assert_array_equal(
+            getattr(radar, key)["data"], getattr(ref, key)["data"]
+        )
+
+    expected = np.ma.masked_invalid(np.concatenate([data[k] for k in sweeps]))
+    out = radar.fields["DBZ_F"]["data"]
+    np.testing.assert_array_equal(out.mask, expected.mask)
+    np.testing.assert_array_equal(out.filled(0), expected.filled(0))
+    if _MdvWriter.RL8 not in sweeps:
+        # pyart decodes the RL8 levels wrongly with numpy >= 2
+        np.testing.assert_array_equal(out, ref.fields["DBZ_F"]["data"])
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    # the files opened by the reader
+    files = list()
+    prepare = pyart.io.common.prepare_for_read
+
+    def recorded(filename, *args, **kwargs):
+        fl = prepare(filename, *args, **kwargs)
+        files.append(fl)
+        return fl
+
+    monkeypatch.setattr(pyart.io.common, "prepare_for_read", recorded)
+
+    return files
+
+
+def test_radar_polar_sweeps_closed(mdv_volume, opened):
+    filename, data = mdv_volume
+    radar = readmdv.radarPolar(filename, "DBZ_F", sweeps=[2])
+    assert len(opened) == 1
+    assert opened[0].closed
+    assert radar.fields["DBZ_F"]["data"].shape == data[2].shape
+
+    # the fields of all the sweeps are loaded on first access
+    radar = readmdv.radarPolar(filename, "DBZ_F")
+    assert not opened[1].closed
+    assert radar.fields["DBZ_F"]["data"].shape == (3 * data.shape[1], data.shape[2])
+
+
+def test_radar_polar_parse_once(count_parse):
+    radar = readmdv.radarPolar(MDV_PPI_FILE)
+    assert len(count_parse) == 1
+    ref = pyart.io.read_mdv(MDV_PPI_FILE, file_field_names=True)
+    for field in ref.fields:
+        np.testing.assert_array_equal(
+            radar.fields[field]["data"], ref.fields[field]["data"]
+        )
+
+
+def test_reader_headers_and_sweeps_parse_once(count_parse):
+    with MdvReader(MDV_PPI_FILE) as reader:
+        radar = reader.radar(None)
+        assert len(radar.fields) == 0
+        field = reader.field_names[0]
+        sweep = reader.level_data(field, [0])
+        sub = reader.extract_sweeps(reader.radar(field), [0])
+    # the second radar() parses the headers once more
+    assert len(count_parse) == 2
+
+    ref = pyart.io.read_mdv(MDV_PPI_FILE, file_field_names=True)
+    ref = ref.extract_sweeps([0])
+    np.testing.assert_array_equal(sweep[0], ref.fields[field]["data"])
+    np.testing.assert_array_equal(sub.fields[field]["data"], ref.fields[field]["data"])
+
+
+def test_radar_selected_fields():
+    fields = list(pyart.io.read_mdv(MDV_PPI_FILE, file_field_names=True).fields)
+    radar = readmdv.radarPolar(MDV_PPI_FILE, fields[0])
+    assert list(radar.fields) == [fields[0]]
+    radar = readmdv.radarPolar(MDV_PPI_FILE, None)
+    assert len(radar.fields) == 0
+
+
+def test_grid_parse_once(count_parse):
+    grid = readmdv.radarGrid(MDV_GRID_FILE)
+    assert len(count_parse) == 1
+    ref = pyart.io.read_grid_mdv(MDV_GRID_FILE, file_field_names=True)
+    assert set(grid.fields) == set(ref.fields)
+    for field in ref.fields:
+        np.testing.assert_array_equal(
+            grid.fields[field]["data"], ref.fields[field]["data"]
+        )
@@ -0,0 +1,173 @@
+import numpy as np
+import pytest
+from mtorwaradar.api.create_vad_loc import vadTable
+from mtorwaradar.api.create_qvp_loc import qvpTable
+from mtorwaradar.api.radargrid_extract_loc import gridExtractedTable
+from mtorwaradar.api.radarpolar_extractV_loc import polarVExtractedTable
+from mtorwaradar.util.utilities import ArgumentError
+
+########
+## The list of dictionaries builders before the tables were built from arrays
+
+
+def _vad_table_baseline(vad):
+    tab = list()
+    for v in vad:
+        for j in range(len(v["height"])):
+            x = {
+                "time": v["time"],
+                "height": v["height"][j],
+                "speed": v["speed"][j],
+                "direction": v["direction"][j],
+                "u_wind": v["u_wind"][j],
+                "v_wind": v["v_wind"][j],
+            }
+            tab = tab + [x]
+
+    return tab
+
+
+def _qvp_table_baseline(qvp):
+    tab = list()
+    for q in qvp:
+        dat = dict(q["data"])
+        fields = list(dat.keys())
+        for field in fields:
+            dat[field] = dat[field].filled(-9999)
+
+        for j in range(len(q["height"])):
+            x = {
+                "time": q["time"],
+                "elevation_angle": q["elevation"],
+                "height": q["height"][j],
+            }
+            for field in fields:
+                x[field] = dat[field][j]
+
+            tab = tab + [x]
+
+    return tab
+
+
+def _extracted_table_baseline(x, level):
+    var = list(x["data"].keys())
+
+    out = list()
+    for p in range(len(x["coords"])):
+        for e in range(len(x[level])):
+            for d in range(len(x["date"])):
+                pt = x["coords"][p]
+                tab = {
+                    "id": pt["id"],
+                    "longitude": pt["longitude"],
+                    "latitude": pt["latitude"],
+                    "dates": x["date"][d],
+                    level: x[level][e],
+                }
+                for v in var:
+                    tab[v] = x["data"][v][d][e][p]
+                out = out + [tab]
+
+    return out
+
+
+########
+
+
+def _assert_records(out, expected):
+    assert len(out) == len(expected)
+    for row, ref in zip(out, expected):
+        assert list(row.keys()) == list(ref.keys())
+        for key, val in ref.items():
+            if val is np.ma.masked:
+                # the masked values of the VAD are NaN in the table
+                val = np.nan
+            if isinstance(val, str):
+                assert row[key] == val
+            else:
+                np.testing.assert_equal(row[key], val)
+
+
+def _vad(time, nz, seed):
+    rng = np.random.default_rng(seed)
+    out = {"time": time, "height": np.arange(nz) * 100.0 + 50.0}
+    for key in ["speed", "direction", "u_wind", "v_wind"]:
+        val = np.ma.masked_array(rng.normal(size=nz) * 10.0)
+        val[rng.random(nz) < 0.3] = np.ma.masked
+        out[key] = val
+
+    return out
+
+
+def _qvp(time, nz, seed):
+    rng = np.random.default_rng(seed)
+    data = dict()
+    for field in ["DBZ_F", "ZDR_F"]:
+        val = np.ma.masked_array(rng.normal(size=nz))
+        val[rng.random(nz) < 0.3] = np.ma.masked
+        data[field] = val
+
+    return {
+        "time": time,
+        "elevation": 20.0 + seed,
+        "height": np.arange(nz) * 50.0 + 10.0,
+        "data": data,
+    }
+
+
+def _extracted(level, ndate, nlevel, npoint):
+    rng = np.random.default_rng(ndate + nlevel + npoint)
+    data = dict()
+    for field in ["DBZ_F", "RHOHV_F"]:
+        val = rng.normal(size=(ndate, nlevel, npoint))
+        val[rng.random(val.shape) < 0.3] = -9999.0
+        data[field] = val.tolist()
+
+    return {
+        "date": ["2024-01-01 00:{:02d}:00".format(5 * d) for d in range(ndate)],
+        level: (np.arange(nlevel) * 500.0 + 1000.0).tolist(),
+        "coords": [
+            {"id": "P" + str(p), "longitude": 36.8 + 0.1 * p, "latitude": -1.3 - 0.1 * p}
+            for p in range(npoint)
+        ],
+        "data": data,
+    }
+
+
+@pytest.mark.parametrize("nz", [[5, 5, 5], [3, 7, 1, 4], [4], []])
+def test_vad_table(nz):
+    vad = [_vad("2024-01-01 00:{:02d}:00".format(5 * i), n, i) for i, n in enumerate(nz)]
+    out = vadTable(vad, output="records")
+    _assert_records(out, _vad_table_baseline(vad))
+
+    df = vadTable(vad)
+    assert len(df) == sum(nz)
+    assert list(df.columns) == ["time", "height", "speed", "direction", "u_wind", "v_wind"]
+
+
+@pytest.mark.parametrize("nz", [[5, 5, 5], [3, 7, 1, 4], [4], []])
+def test_qvp_table(nz):
+    qvp = [_qvp("2024-01-01 00:{:02d}:00".format(5 * i), n, i) for i, n in enumerate(nz)]
+    out = qvpTable(qvp, output="records")
+    _assert_records(out, _qvp_table_baseline(qvp))
+
+    assert len(qvpTable(qvp)) == sum(nz)
+
+
+@pytest.mark.parametrize("shape", [(3, 2, 4), (1, 1, 1), (0, 2, 3), (2, 2, 0)])
+def test_grid_extracted_table(shape):
+    x = _extracted("altitude", *shape)
+    out = gridExtractedTable(x, output="records")
+    _assert_records(out, _extracted_table_baseline(x, "altitude"))
+
+
+@pytest.mark.parametrize("shape", [(3, 2, 4), (1, 1, 1), (0, 2, 3), (2, 2, 0)])
+def test_polarV_extracted_table(shape):
+    x = _extracted("height", *shape)
+    out = polarVExtractedTable(x, output="records")
+    _assert_records(out, _extracted_table_baseline(x, "height"))
+
+
+def test_table_output_invalid():
+    with pytest.raises(ArgumentError):
+        vadTable([_vad("2024-01-01 00:00:00", 3, 0)], output="list")
@@ -0,0 +1,101 @@
+import datetime
+import numpy as np
+import pytest
+from mtorwaradar.api.time_height import time_height_arrays
+
+
+def _column_stack_baseline(profiles, variables, data_key=None, sample=None):
+    # the assembly of vadBarb and qvpMeshgrid before time_height_arrays
+    def _source(p):
+        return p if data_key is None else p[data_key]
+
+    step = 1 if sample is None else sample
+    iz = np.arange(0, len(profiles[0]["height"]), step)
+
+    Z = profiles[0]["height"][iz]
+    dat = dict((var, _source(profiles[0])[var][iz]) for var in variables)
+    for tt in range(1, len(profiles)):
+        Z = np.column_stack((Z, profiles[tt]["height"][iz]))
+        for var in variables:
+            dat[var] = np.ma.column_stack((dat[var], _source(profiles[tt])[var][iz]))
+
+    return Z, dat
+
+
+def _profile(it, nz, seed, data_key=None):
+    rng = np.random.default_rng(seed)
+    time = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=5 * it)
+    # the heights of the profiles differ, the beam height depends on the volume
+    height = np.arange(nz) * 100.0 + 50.0 + it
+    data = dict()
+    for var in ["u_wind", "v_wind"]:
+        val = np.ma.masked_array(rng.normal(size=nz))
+        val[rng.random(nz) < 0.3] = np.ma.masked
+        data[var] = val
+
+    p = {"time": time.strftime("%Y%m%d%H%M%S"), "height": height}
+    if data_key is None:
+        p.update(data)
+    else:
+        p[data_key] = data
+
+    return p
+
+
+@pytest.mark.parametrize("sample", [None, 1, 3])
+@pytest.mark.parametrize("data_key", [None, "data"])
+def test_equal_heights_column_stack(sample, data_key):
+    profiles = [_profile(it, 10, it, data_key) for it in range(4)]
+    variables = ["u_wind", "v_wind"]
+    out = time_height_arrays(profiles, variables, data_key=data_key, sample=sample)
+    Z, dat = _column_stack_baseline(profiles, variables, data_key, sample)
+
+    np.testing.assert_array_equal(out["height"], Z)
+    for var in variables:
+        assert isinstance(out[var], np.ma.MaskedArray)
+        np.testing.assert_array_equal(out[var].mask, np.ma.getmaskarray(dat[var]))
+        np.testing.assert_array_equal(out[var].filled(0), dat[var].filled(0))
+
+    times = [datetime.datetime(2024, 1, 1, 0, 5 * it) for it in range(4)]
+    assert list(out["time"]) == times
+
+
+@pytest.mark.parametrize("sample", [None, 2])
+@pytest.mark.parametrize("data_key", [None, "data"])
+def test_ragged_profiles(sample, data_key):
+    nz = [6, 3, 8, 1]
+    profiles = [_profile(it, n, it, data_key) for it, n in enumerate(nz)]
+    out = time_height_arrays(profiles, ["u_wind", "v_wind"], data_key, sample)
+
+    step = 1 if sample is None else sample
+    iz = np.arange(0, max(nz), step)
+    assert out["height"].shape == (len(iz), len(nz))
+    for it, p in enumerate(profiles):
+        src = p if data_key is None else p[data_key]
+        kz = iz[iz < nz[it]]
+        nk = len(kz)
+        # aligned by the index of the heights, padded at the top
+        np.testing.assert_array_equal(out["height"][:nk, it], p["height"][kz])
+        assert np.all(np.isnan(out["height"][nk:, it]))
+        for var in ["u_wind", "v_wind"]:
+            col = out[var][:, it]
+            np.testing.assert_array_equal(col.mask[:nk], np.ma.getmaskarray(src[var])[kz])
+            np.testing.assert_array_equal(col[:nk].compressed(), src[var][kz].compressed())
+            assert np.all(col.mask[nk:])
+
+
+def test_default_variables():
+    profiles = [_profile(it, 5, it, "data") for it in range(2)]
+    out = time_height_arrays(profiles, data_key="data")
+    assert sorted(out.keys()) == ["height", "time", "u_wind", "v_wind"]
+
+    for p in profiles:
+        p["speed"] = np.ones(5)
+        p["elevation"] = 20.0
+    out = time_height_arrays(profiles)
+    # the 1d arrays as the height only
+    assert sorted(out.keys()) == ["height", "speed", "time"]
+
+
+def test_empty():
+    assert time_height_arrays([]) == {}
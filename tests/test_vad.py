@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import pyart
+from pyart.retrieve import vad_michelson
+from mtorwaradar.mdv.vad import VadEngine
+from mtorwaradar.api.create_vad import create_vad_data
+from mtorwaradar.util.utilities import ArgumentError, suppress_stdout
+
+Z_WANT = np.arange(0, 10001, 100.0)
+
+
+def _volume(nrays, dtype, seed=0):
+    # 3 sweeps, wind increasing with the height, no masked gates
+    angles = np.array([1.0, 4.5, 10.0])
+    radar = pyart.testing.make_empty_ppi_radar(200, nrays, len(angles))
+    radar.range["data"] = np.arange(200) * 250.0 + 125.0
+    radar.fixed_angle["data"] = angles
+    radar.elevation["data"] = np.repeat(angles, nrays)
+    radar.azimuth["data"] = np.tile(np.arange(nrays) * 360.0 / nrays + 0.5, len(angles))
+    radar.init_gate_x_y_z()
+
+    rng = np.random.default_rng(seed)
+    z = radar.gate_z["data"]
+    az = np.deg2rad(radar.azimuth["data"])[:, None]
+    el = np.deg2rad(radar.elevation["data"])[:, None]
+    u = 5.0 + z / 1000.0
+    v = -3.0 + 0.5 * z / 1000.0
+    vr = (u * np.sin(az) + v * np.cos(az)) * np.cos(el) + rng.normal(0, 1, z.shape)
+    radar.add_field(
+        "VEL_F", {"data": np.ma.masked_array(vr.astype(dtype), mask=False)}
+    )
+
+    return radar
+
+
+@pytest.mark.parametrize("nrays, dtype", [(360, np.float64), (361, np.float32)])
+def test_engine_matches_pyart(nrays, dtype):
+    radar = _volume(nrays, dtype)
+    with suppress_stdout():
+        ref = vad_michelson(radar, "VEL_F", Z_WANT)
+
+    engine = VadEngine(Z_WANT)
+    for _ in range(2):
+        # the second volume reuses the cached geometry
+        out = engine.compute(radar, "VEL_F")
+        np.testing.assert_array_equal(out["height"], ref.height)
+        for key in ["speed", "direction", "u_wind", "v_wind"]:
+            expected = np.asarray(getattr(ref, key))
+            np.testing.assert_array_equal(np.isnan(out[key]), np.isnan(expected))
+            np.testing.assert_allclose(out[key], expected, rtol=1e-6, atol=1e-6)
+
+    assert len(engine._cache) == 1
+    # the heights above the highest gate are NaN
+    assert np.isnan(out["speed"][-1])
+    assert not np.isnan(out["speed"][10])
+
+
+def test_create_vad_engine_invalid(tmp_path):
+    with pytest.raises(ArgumentError):
+        create_vad_data(
+            str(tmp_path), None, "2024-01-01-00-00", Z_WANT, "VEL_F", "UTC", engine="numpy"
+        )
@@ -0,0 +1,279 @@
+import os
+import time
+import datetime
+import threading
+import collections
+import pytest
+from mtorwaradar.util import watcher as uwatcher
+from mtorwaradar.util.watcher import MdvWatcher
+
+NOW = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class _Product:
+    # record the time steps, optionally wait for "release" before returning
+    def __init__(self, block=False):
+        self.steps = list()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self._lock = threading.Lock()
+
+    def __call__(self, step):
+        self.started.set()
+        self.release.wait(10)
+        with self._lock:
+            self.steps.append(step)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock(NOW)
+    monkeypatch.setattr(uwatcher, "_utcnow", clock)
+    monkeypatch.setattr(uwatcher, "inotify_simple", None)
+    return clock
+
+
+def _write(dirMDV, t, nbytes=100):
+    ddir = os.path.join(str(dirMDV), t.strftime("%Y%m%d"))
+    os.makedirs(ddir, exist_ok=True)
+    mdvfile = os.path.join(ddir, t.strftime("%H%M%S") + ".mdv")
+    with open(mdvfile, "ab") as fl:
+        fl.write(b"x" * nbytes)
+    return mdvfile
+
+
+def _step(t):
+    return t.strftime("%Y-%m-%d-%H-%M")
+
+
+def _wait_for(cond, timeout=10.0):
+    t0 = time.time()
+    while not cond():
+        if time.time() - t0 > timeout:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def _watcher(dirMDV, product, **kwargs):
+    pars = {"poll_interval": 0.05, "settle_time": 0.5}
+    pars.update(kwargs)
+    watcher = MdvWatcher(str(dirMDV), **pars)
+    watcher.register("test", product)
+    return watcher
+
+
+def test_settle_time(tmp_path, clock):
+    product = _Product()
+    watcher = _watcher(tmp_path, product, settle_time=1.0)
+    watcher.start()
+    try:
+        t = NOW - datetime.timedelta(minutes=1)
+        _write(tmp_path, t)
+        time.sleep(0.6)
+        # the file is still written
+        _write(tmp_path, t)
+        time.sleep(0.6)
+        assert product.steps == []
+
+        assert _wait_for(lambda: len(product.steps) == 1)
+        time.sleep(0.5)
+    finally:
+        watcher.stop()
+
+    assert product.steps == [_step(t)]
+
+
+class _FakeINotify:
+    # inotify_simple.INotify, the events are added by the test
+    def __init__(self):
+        self.events = collections.deque()
+        self.watches = dict()
+
+    def add_watch(self, path, mask):
+        wd = len(self.watches) + 1
+        self.watches[wd] = path
+        return wd
+
+    def rm_watch(self, wd):
+        self.watches.pop(wd)
+
+    def read(self, timeout=None):
+        time.sleep(timeout / 1000.0)
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def close(self):
+        pass
+
+    def close_write(self, mdvfile):
+        ddir, name = os.path.split(mdvfile)
+        wd = [k for k, v in self.watches.items() if v == ddir][0]
+        self.events.append(_Event(wd, _FakeFlags.CLOSE_WRITE, 0, name))
+
+
+class _FakeFlags:
+    CLOSE_WRITE = 8
+    MOVED_TO = 128
+    CREATE = 256
+
+
+_Event = collections.namedtuple("Event", ["wd", "mask", "cookie", "name"])
+
+
+def test_inotify_close_write(tmp_path, clock, monkeypatch):
+    notifier = _FakeINotify()
+    fake = type("inotify_simple", (), {"INotify": lambda: notifier, "flags": _FakeFlags})
+    monkeypatch.setattr(uwatcher, "inotify_simple", fake)
+
+    product = _Product()
+    t = NOW - datetime.timedelta(minutes=1)
+    os.makedirs(os.path.join(str(tmp_path), t.strftime("%Y%m%d")))
+    # without the event, the file would wait one minute
+    watcher = _watcher(tmp_path, product, settle_time=60.0)
+    watcher.start()
+    try:
+        assert _wait_for(lambda: len(notifier.watches) == 1)
+        mdvfile = _write(tmp_path, t)
+        notifier.close_write(mdvfile)
+
+        assert _wait_for(lambda: len(product.steps) == 1, timeout=5.0)
+        time.sleep(0.3)
+    finally:
+        watcher.stop()
+
+    assert product.steps == [_step(t)]
+    assert watcher._closed == set()
+
+
+def test_overflow_block(tmp_path, clock):
+    product = _Product(block=True)
+    watcher = _watcher(tmp_path, product, settle_time=0.1, queue_size=1)
+    times = [NOW - datetime.timedelta(minutes=m) for m in [15, 10, 5]]
+    watcher.start()
+    try:
+        _write(tmp_path, times[0])
+        assert product.started.wait(5)
+        _write(tmp_path, times[1])
+        _write(tmp_path, times[2])
+        # the second file is queued, the third waits for a free place
+        assert _wait_for(lambda: watcher._queue.full())
+        time.sleep(0.5)
+        assert times[2] not in watcher._done
+
+        product.release.set()
+        assert _wait_for(lambda: len(product.steps) == 3)
+        time.sleep(0.3)
+    finally:
+        product.release.set()
+        watcher.stop()
+
+    assert product.steps == [_step(t) for t in times]
+
+
+def test_overflow_drop_oldest(tmp_path, clock):
+    product = _Product(block=True)
+    watcher = _watcher(
+        tmp_path, product, settle_time=0.1, queue_size=1, overflow="drop_oldest"
+    )
+    times = [NOW - datetime.timedelta(minutes=m) for m in [15, 10, 5]]
+    watcher.start()
+    try:
+        _write(tmp_path, times[0])
+        assert product.started.wait(5)
+        _write(tmp_path, times[1])
+        _write(tmp_path, times[2])
+        # the second file is removed from the queue for the third one
+        assert _wait_for(lambda: times[2] in watcher._done)
+
+        product.release.set()
+        assert _wait_for(lambda: len(product.steps) == 2)
+        time.sleep(0.3)
+    finally:
+        product.release.set()
+        watcher.stop()
+
+    assert product.steps == [_step(times[0]), _step(times[2])]
+
+
+@pytest.mark.parametrize("backfill, expected", [(0, []), (3600, [10])])
+def test_backfill(tmp_path, clock, backfill, expected):
+    for m in [10, 120]:
+        _write(tmp_path, NOW - datetime.timedelta(minutes=m))
+
+    product = _Product()
+    watcher = _watcher(tmp_path, product, settle_time=0.1, backfill=backfill)
+    watcher.start()
+    try:
+        time.sleep(0.6)
+    finally:
+        watcher.stop()
+
+    assert product.steps == [_step(NOW - datetime.timedelta(minutes=m)) for m in expected]
+
+
+def test_stop_processes_queue(tmp_path, clock):
+    product = _Product(block=True)
+    watcher = _watcher(tmp_path, product, settle_time=0.1)
+    times = [NOW - datetime.timedelta(minutes=m) for m in [15, 10, 5]]
+    watcher.start()
+    try:
+        _write(tmp_path, times[0])
+        assert product.started.wait(5)
+        _write(tmp_path, times[1])
+        _write(tmp_path, times[2])
+        assert _wait_for(lambda: watcher._queue.qsize() == 2)
+    finally:
+        threading.Timer(0.3, product.release.set).start()
+        watcher.stop()
+
+    assert product.steps == [_step(t) for t in times]
+
+
+def test_day_rollover(tmp_path, clock):
+    clock.now = datetime.datetime(2024, 1, 1, 23, 59, 0)
+    product = _Product()
+    watcher = _watcher(tmp_path, product, settle_time=0.1)
+    t1 = datetime.datetime(2024, 1, 1, 23, 58, 30)
+    t2 = datetime.datetime(2024, 1, 2, 0, 0, 30)
+    watcher.start()
+    try:
+        _write(tmp_path, t1)
+        assert _wait_for(lambda: len(product.steps) == 1)
+
+        clock.now = datetime.datetime(2024, 1, 2, 0, 1, 0)
+        _write(tmp_path, t2)
+        assert _wait_for(lambda: len(product.steps) == 2)
+        time.sleep(0.3)
+    finally:
+        watcher.stop()
+
+    assert product.steps == [_step(t1), _step(t2)]
+
+
+def test_closed_pruned(tmp_path, clock):
+    watcher = MdvWatcher(str(tmp_path))
+    watcher._start_time = NOW - datetime.timedelta(days=1)
+    recent = os.path.join(str(tmp_path), "20240101", "115900.mdv")
+    watcher._closed = set(
+        [
+            os.path.join(str(tmp_path), "20240101", "volume.mdv"),
+            os.path.join(str(tmp_path), "20231201", "120000.mdv"),
+            recent,
+        ]
+    )
+    watcher._poll()
+
+    # the recent file may not be catalogued yet
+    assert watcher._closed == set([recent])